@@ -0,0 +1,176 @@
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.core.paginator import InvalidPage
+from django.http import Http404, HttpResponse
+from django.shortcuts import aget_object_or_404
+from django.views.decorators.csrf import csrf_exempt
+from django_filters.utils import translate_validation
+from rest_framework.exceptions import (APIException, AuthenticationFailed,
+                                       NotAuthenticated, NotFound, Throttled)
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from foodgram.models import Ingredient, Tag
+from foodgram_backend.db_router import ais_pinned, replicas, set_replica_reads
+from .filters import IngredientFilter, RecipeFilter
+from .pagination import RecipePagination
+from .serializers import (CompactRecipeSerializer, IngredientSerializer,
+                          RecipeReadSerializer, TagSerializer, is_compact,
+                          recipes_by_ids, sideload_recipe_relations)
+from .views import (IngredientViewSet, RecipeViewSet, TagViewSet,
+                    get_recipe_ids, get_recipe_queryset)
+
+authentication = api_settings.DEFAULT_AUTHENTICATION_CLASSES[0]()
+
+
+def render(data, status=200, headers=None):
+    renderer = api_settings.DEFAULT_RENDERER_CLASSES[0]()
+    return HttpResponse(
+        renderer.render(data),
+        status=status,
+        headers=headers,
+        content_type=renderer.media_type
+    )
+
+
+def async_read_view(sync_view, personalized=False):
+    def decorator(view):
+        @csrf_exempt
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method != 'GET':
+                return await sync_to_async(sync_view)(
+                    request, *args, **kwargs
+                )
+            try:
+                result = await sync_to_async(authentication.authenticate)(
+                    request
+                )
+                request.user, request.auth = result or (None, None)
+                if request.user is None:
+                    request.user = api_settings.UNAUTHENTICATED_USER()
+                await sync_to_async(_check_throttles)(sync_view, request)
+                if replicas() and not await ais_pinned(request.user):
+                    set_replica_reads(True)
+                response = render(await view(request, *args, **kwargs))
+                response.cache_compressed = not (
+                    personalized and request.user.is_authenticated
+                )
+                return response
+            except Http404 as exc:
+                return _error_response(NotFound(*exc.args))
+            except APIException as exc:
+                return _error_response(exc)
+        return wrapper
+    return decorator
+
+
+def _check_throttles(sync_view, request):
+    view = sync_view.cls(**sync_view.initkwargs)
+    view.action = sync_view.actions['get']
+    view.check_throttles(request)
+
+
+def _error_response(exc):
+    headers = None
+    if isinstance(exc, (AuthenticationFailed, NotAuthenticated)):
+        headers = {
+            'WWW-Authenticate': authentication.authenticate_header(None)
+        }
+    elif isinstance(exc, Throttled) and exc.wait is not None:
+        headers = {'Retry-After': str(exc.wait)}
+    data = exc.detail
+    if not isinstance(data, (list, dict)):
+        data = {'detail': data}
+    return render(data, status=exc.status_code, headers=headers)
+
+
+def _filter(filterset_class, request, queryset):
+    filterset = filterset_class(
+        request.GET, queryset=queryset, request=request
+    )
+    if not filterset.is_valid():
+        raise translate_validation(filterset.errors)
+    return filterset.qs
+
+
+async def _paginate(request, queryset, pagination_class):
+    paginator = pagination_class()
+    api_request = Request(request)
+    page_size = paginator.get_page_size(api_request)
+    django_paginator = paginator.django_paginator_class(queryset, page_size)
+    django_paginator.count = await queryset.acount()
+    page_number = paginator.get_page_number(api_request, django_paginator)
+    try:
+        page = django_paginator.page(page_number)
+    except InvalidPage as exc:
+        raise NotFound(paginator.invalid_page_message.format(
+            page_number=page_number, message=str(exc)
+        ))
+    page.object_list = [obj async for obj in page.object_list]
+    paginator.page, paginator.request = page, api_request
+    return paginator
+
+
+@async_read_view(RecipeViewSet.as_view(
+    {'get': 'list', 'post': 'create'}, basename='recipes', detail=False
+), personalized=True)
+async def recipe_list(request):
+    if 'ids' in request.GET:
+        ids = get_recipe_ids({'ids': request.GET['ids'].split(',')})
+        queryset = get_recipe_queryset(request).filter(id__in=ids)
+        return recipes_by_ids(
+            [recipe async for recipe in queryset], ids, {'request': request}
+        )
+    queryset = await sync_to_async(_filter)(
+        RecipeFilter, request, get_recipe_queryset(request)
+    )
+    paginator = await _paginate(request, queryset, RecipePagination)
+    recipes = paginator.page.object_list
+    context = {'request': request}
+    if not is_compact(request):
+        return paginator.get_paginated_response(
+            RecipeReadSerializer(recipes, many=True, context=context).data
+        ).data
+    data = paginator.get_paginated_response(
+        CompactRecipeSerializer(recipes, many=True, context=context).data
+    ).data
+    data.update(sideload_recipe_relations(
+        recipes, RecipeReadSerializer.get_fieldset(request)[0], context
+    ))
+    return data
+
+
+@async_read_view(RecipeViewSet.as_view(
+    {
+        'get': 'retrieve',
+        'put': 'update',
+        'patch': 'partial_update',
+        'delete': 'destroy',
+    },
+    basename='recipes',
+    detail=True
+), personalized=True)
+async def recipe_detail(request, pk):
+    recipe = await aget_object_or_404(get_recipe_queryset(request), pk=pk)
+    return RecipeReadSerializer(recipe, context={'request': request}).data
+
+
+@async_read_view(IngredientViewSet.as_view(
+    {'get': 'list'}, basename='ingredients', detail=False
+))
+async def ingredient_list(request):
+    queryset = _filter(IngredientFilter, request, Ingredient.objects.all())
+    return IngredientSerializer(
+        [ingredient async for ingredient in queryset], many=True
+    ).data
+
+
+@async_read_view(TagViewSet.as_view(
+    {'get': 'list'}, basename='tags', detail=False
+))
+async def tag_list(request):
+    return TagSerializer(
+        [tag async for tag in Tag.objects.all()], many=True
+    ).data
@@ -0,0 +1,112 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+
+from foodgram_backend import metrics
+
+TOKEN_CACHE_KEY = 'auth-token:{}'
+TOKEN_CACHE_USER_FIELDS = (
+    'id', 'email', 'username', 'first_name', 'last_name', 'avatar',
+    'is_active', 'is_staff', 'is_superuser',
+)
+# Кэши, которые не видны другим процессам: инвалидация токена при выходе
+# дошла бы только до одного воркера.
+LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+class TokenCache:
+
+    def __init__(self):
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _shared_key(key):
+        return TOKEN_CACHE_KEY.format(
+            hashlib.sha256(key.encode()).hexdigest()
+        )
+
+    def _store(self, key, value):
+        expires = time.monotonic() + settings.TOKEN_CACHE_LOCAL_TTL
+        with self._lock:
+            self._local[key] = (value, expires)
+            self._local.move_to_end(key)
+            while len(self._local) > settings.TOKEN_CACHE_SIZE:
+                self._local.popitem(last=False)
+
+    def get(self, key):
+        with self._lock:
+            value, expires = self._local.get(key, (None, 0))
+            if value is not None and expires > time.monotonic():
+                self._local.move_to_end(key)
+                metrics.incr('auth_cache.local_hits')
+                return value
+        value = cache.get(self._shared_key(key))
+        if value is None:
+            metrics.incr('auth_cache.misses')
+            return None
+        metrics.incr('auth_cache.shared_hits')
+        self._store(key, value)
+        return value
+
+    def set(self, key, value):
+        cache.set(self._shared_key(key), value, settings.TOKEN_CACHE_TTL)
+        self._store(key, value)
+
+    def invalidate(self, *keys):
+        cache.delete_many([self._shared_key(key) for key in keys])
+        with self._lock:
+            for key in keys:
+                self._local.pop(key, None)
+
+
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    # В кэше снимок полей пользователя, которые читают права и сериализаторы,
+    # без хэша пароля; на попадании пользователь собирается из снимка без
+    # запроса к базе. Остальные поля отложены: обращение к ним читает базу,
+    # а save() пишет только поля снимка. Отозванный токен может приниматься
+    # воркером не дольше TOKEN_CACHE_LOCAL_TTL.
+
+    def authenticate_credentials(self, key):
+        snapshot = token_cache.get(key)
+        if snapshot is None:
+            user, token = super().authenticate_credentials(key)
+            token_cache.set(key, tuple(
+                field.get_prep_value(getattr(user, field.attname))
+                for field in snapshot_fields(user)
+            ))
+            return user, token
+        User = get_user_model()
+        user = User.from_db(
+            DEFAULT_DB_ALIAS,
+            [field.attname for field in snapshot_fields(User)],
+            snapshot
+        )
+        if not user.is_active:
+            token_cache.invalidate(key)
+            raise AuthenticationFailed(_('User inactive or deleted.'))
+        return user, Token(key=key, user=user)
+
+
+def snapshot_fields(model):
+    # from_db ждёт значения в порядке полей модели.
+    return [
+        field for field in model._meta.concrete_fields
+        if field.name in TOKEN_CACHE_USER_FIELDS
+    ]
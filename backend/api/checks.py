@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.core.checks import Error, register
+from rest_framework.settings import api_settings
+
+from .authentication import LOCAL_CACHE_BACKENDS, CachedTokenAuthentication
+
+
+@register()
+def check_token_cache(app_configs, **kwargs):
+    classes = api_settings.DEFAULT_AUTHENTICATION_CLASSES
+    if (
+        CachedTokenAuthentication in classes
+        and settings.CACHES['default']['BACKEND'] in LOCAL_CACHE_BACKENDS
+    ):
+        return [Error(
+            'CachedTokenAuthentication требует общего кэша (REDIS_URL)',
+            id='api.E001'
+        )]
+    return []
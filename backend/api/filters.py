@@ -1,38 +1,80 @@
+from django.db import connections
+from django.db.models import (BooleanField, Exists, ExpressionWrapper,
+                              OuterRef, Q)
+from django.db.models.functions import Greatest, Upper
 from django_filters.rest_framework import (BooleanFilter, CharFilter,
-                                           FilterSet,
+                                           ChoiceFilter, FilterSet,
                                            ModelMultipleChoiceFilter)
 
-from foodgram.models import Ingredient, Recipe, Tag
+from foodgram.constants import MAX_NAME_FIELD_LENGTH, USER_SEARCH_LIMIT
+from foodgram.models import (Favorite, Ingredient, Recipe, ShoppingCart, Tag,
+                             User)
+from foodgram.rankings import ORDERINGS
 
 
 class RecipeFilter(FilterSet):
     tags = ModelMultipleChoiceFilter(
         field_name='tags__slug',
         to_field_name='slug',
-        queryset=Tag.objects.all()
+        queryset=Tag.objects.all(),
+        method='filter_tags'
+    )
+    tags_mode = ChoiceFilter(
+        choices=(('any', 'any'), ('all', 'all')),
+        method='filter_tags_mode'
     )
     is_in_shopping_cart = BooleanFilter(method='filter_in_shopping_cart')
     is_favorited = BooleanFilter(method='filter_is_favorited')
+    ordering = ChoiceFilter(
+        choices=tuple((name, name) for name in ORDERINGS),
+        method='filter_ordering'
+    )
 
     class Meta:
         model = Recipe
-        fields = ('tags', 'author', 'is_in_shopping_cart', 'is_favorited')
+        fields = (
+            'tags', 'tags_mode', 'author', 'is_in_shopping_cart',
+            'is_favorited', 'ordering'
+        )
 
-    def filter_is_favorited(self, queryset, name, value):
+    @staticmethod
+    def _has_tags(tag_ids):
+        return Exists(Recipe.tags.through.objects.filter(
+            recipe_id=OuterRef('pk'), tag_id__in=tag_ids
+        ))
+
+    def filter_tags(self, queryset, name, value):
+        # Полусоединения вместо JOIN по tags__slug: рецепт не дублируется
+        # при нескольких тегах, и distinct не нужен.
+        tag_ids = [tag.id for tag in value]
+        if not tag_ids:
+            return queryset
+        if self.form.cleaned_data.get('tags_mode') == 'all':
+            for tag_id in tag_ids:
+                queryset = queryset.filter(self._has_tags((tag_id,)))
+            return queryset
+        return queryset.filter(self._has_tags(tag_ids))
+
+    def filter_tags_mode(self, queryset, name, value):
+        return queryset
+
+    def _filter_relation(self, queryset, model, value):
         user_id = getattr(self.request.user, 'id', None)
-        if value and user_id:
-            return queryset.filter(favorites__user_id=user_id)
-        if not value and user_id:
-            return queryset.exclude(favorites__user_id=user_id)
-        return queryset.none() if value else queryset
+        if not user_id:
+            return queryset.none() if value else queryset
+        relation = Exists(
+            model.objects.filter(user_id=user_id, recipe_id=OuterRef('pk'))
+        )
+        return queryset.filter(relation if value else ~relation)
+
+    def filter_is_favorited(self, queryset, name, value):
+        return self._filter_relation(queryset, Favorite, value)
 
     def filter_in_shopping_cart(self, queryset, name, value):
-        user_id = getattr(self.request.user, 'id', None)
-        if value and user_id:
-            return queryset.filter(shoppingcarts__user_id=user_id)
-        if not value and user_id:
-            return queryset.exclude(shoppingcarts__user_id=user_id)
-        return queryset.none() if value else queryset
+        return self._filter_relation(queryset, ShoppingCart, value)
+
+    def filter_ordering(self, queryset, name, value):
+        return queryset.order_by(*ORDERINGS[value])
 
 
 class IngredientFilter(FilterSet):
@@ -41,3 +83,44 @@ class IngredientFilter(FilterSet):
     class Meta:
         model = Ingredient
         fields = ('name',)
+
+
+class UserFilter(FilterSet):
+    search_fields = ('username', 'first_name', 'last_name')
+    search = CharFilter(
+        method='filter_search', max_length=MAX_NAME_FIELD_LENGTH
+    )
+
+    class Meta:
+        model = User
+        fields = ('search',)
+
+    def filter_search(self, queryset, name, value):
+        value = value.strip()
+        if not value:
+            return queryset
+        prefix = Q()
+        for field in self.search_fields:
+            prefix |= Q(**{f'{field}__istartswith': value})
+        if connections[queryset.db].vendor != 'postgresql':
+            return queryset.filter(prefix).order_by('username', 'id')[
+                :USER_SEARCH_LIMIT
+            ]
+        # Нечёткий поиск по словам через pg_trgm. Выражения UPPER(поле)
+        # совпадают с GIN-индексами из миграции, поэтому ими обслуживается
+        # и префиксный LIKE, и оператор %>.
+        from django.contrib.postgres.lookups import TrigramWordSimilar
+        from django.contrib.postgres.search import TrigramWordSimilarity
+
+        fuzzy = Q()
+        for field in self.search_fields:
+            fuzzy |= Q(TrigramWordSimilar(Upper(field), value.upper()))
+        return queryset.filter(prefix | fuzzy).alias(
+            is_prefix=ExpressionWrapper(prefix, output_field=BooleanField()),
+            similarity=Greatest(*(
+                TrigramWordSimilarity(value.upper(), Upper(field))
+                for field in self.search_fields
+            ))
+        ).order_by('-is_prefix', '-similarity', 'username', 'id')[
+            :USER_SEARCH_LIMIT
+        ]
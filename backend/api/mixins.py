@@ -0,0 +1,36 @@
+from rest_framework.permissions import SAFE_METHODS
+
+from foodgram_backend.db_router import is_pinned, replicas, set_replica_reads
+
+
+class ReplicaReadMixin:
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if (
+            replicas()
+            and request.method in SAFE_METHODS
+            and not is_pinned(request.user)
+        ):
+            set_replica_reads(True)
+
+    def dispatch(self, request, *args, **kwargs):
+        # Сброс в finally: при необработанном исключении finalize_response
+        # не вызывается, и флаг остался бы включённым для потока.
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            set_replica_reads(False)
+
+
+class CompressedCacheMixin:
+    personalized = False
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs
+        )
+        response.cache_compressed = request.method in SAFE_METHODS and not (
+            self.personalized and request.user.is_authenticated
+        )
+        return response
@@ -1,14 +1,69 @@
+from django.db import transaction
 from djoser.serializers import UserSerializer as DjoserUserSerializer
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 
-from foodgram.constants import (MAX_POSITIVE_SMALLINT, MIN_POSITIVE_SMALLINT,
+from foodgram import outbox
+from foodgram.constants import (DEFAULT_PAGE_SIZE, MAX_BULK_RECIPES,
+                                MAX_PANTRY_INGREDIENTS, MAX_POSITIVE_SMALLINT,
+                                MAX_RECIPE_IDS, MIN_POSITIVE_SMALLINT,
                                 RECIPE_NAME_MAX_LENGTH)
 from foodgram.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
                              ShoppingCart, Subscription, Tag, User)
+from foodgram_backend import page_cache
 
 
-class UserSerializer(DjoserUserSerializer):
+def _query_list(request, name):
+    value = getattr(request, 'query_params', request.GET).get(name)
+    if not value:
+        return None
+    return {item.strip() for item in value.split(',') if item.strip()}
+
+
+def is_compact(request):
+    value = getattr(request, 'query_params', request.GET).get('compact', '')
+    return value.lower() in ('1', 'true')
+
+
+class SparseFieldsetMixin:
+    collapsed_fields = {}
+
+    @classmethod
+    def get_fieldset(cls, request):
+        names = set(cls.Meta.fields)
+        fields = _query_list(request, 'fields')
+        if fields is not None:
+            names &= fields
+        names -= _query_list(request, 'omit') or set()
+        if 'expand' not in getattr(request, 'query_params', request.GET):
+            return names, set()
+        expand = _query_list(request, 'expand') or set()
+        return names, (set(cls.collapsed_fields) - expand) & names
+
+    def _is_root(self):
+        return self.parent is None or (
+            isinstance(self.parent, serializers.ListSerializer)
+            and self.parent.parent is None
+        )
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get('request')
+        if (
+            request is None
+            or self.context.get('sideloaded')
+            or not self._is_root()
+        ):
+            return fields
+        names, collapsed = self.get_fieldset(request)
+        for name in collapsed:
+            fields[name] = self.collapsed_fields[name]()
+        return {
+            name: field for name, field in fields.items() if name in names
+        }
+
+
+class UserSerializer(SparseFieldsetMixin, DjoserUserSerializer):
     is_subscribed = serializers.SerializerMethodField()
     avatar = serializers.ImageField()
 
@@ -18,6 +73,8 @@ class UserSerializer(DjoserUserSerializer):
         read_only_fields = fields
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         request = self.context.get('request')
         return (
             request
@@ -58,6 +115,14 @@ class RecipeIngredientReadSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'measurement_unit', 'amount')
 
 
+class RecipeIngredientCompactSerializer(serializers.BaseSerializer):
+    # Пара [id ингредиента, количество]: название и единица измерения
+    # передаются один раз в подгруженном словаре ingredients.
+
+    def to_representation(self, instance):
+        return [instance.ingredient_id, instance.amount]
+
+
 class IngredientInRecipeWriteSerializer(serializers.Serializer):
     id = serializers.PrimaryKeyRelatedField(
         queryset=Ingredient.objects.all()
@@ -68,7 +133,13 @@ class IngredientInRecipeWriteSerializer(serializers.Serializer):
     )
 
 
-class RecipeReadSerializer(serializers.ModelSerializer):
+class RecipeReadSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    collapsed_fields = {
+        'author': lambda: serializers.PrimaryKeyRelatedField(read_only=True),
+        'tags': lambda: serializers.PrimaryKeyRelatedField(
+            many=True, read_only=True
+        ),
+    }
     tags = TagSerializer(many=True, read_only=True)
     author = UserSerializer(read_only=True)
     ingredients = RecipeIngredientReadSerializer(
@@ -86,6 +157,8 @@ class RecipeReadSerializer(serializers.ModelSerializer):
         )
 
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         request = self.context.get('request')
         return (
             request
@@ -94,6 +167,8 @@ class RecipeReadSerializer(serializers.ModelSerializer):
         )
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         request = self.context.get('request')
         return (
             request
@@ -102,6 +177,92 @@ class RecipeReadSerializer(serializers.ModelSerializer):
         )
 
 
+class CompactRecipeSerializer(RecipeReadSerializer):
+    tags = serializers.PrimaryKeyRelatedField(many=True, read_only=True)
+    author = serializers.PrimaryKeyRelatedField(read_only=True)
+    ingredients = RecipeIngredientCompactSerializer(
+        source='recipe_ingredients', many=True, read_only=True
+    )
+
+
+def by_id(items):
+    # Подгруженные объекты адресуются ключом словаря, поэтому id внутри
+    # объекта не повторяется.
+    return {item.pop('id'): item for item in items}
+
+
+def sideload_recipe_relations(recipes, fields, context):
+    context = {**context, 'sideloaded': True}
+    data = {}
+    if 'author' in fields:
+        authors = {recipe.author_id: recipe.author for recipe in recipes}
+        data['users'] = by_id(UserSerializer(
+            authors.values(), many=True, context=context
+        ).data)
+    if 'tags' in fields:
+        tags = {tag.id: tag for recipe in recipes for tag in recipe.tags.all()}
+        data['tags'] = by_id(TagSerializer(
+            tags.values(), many=True, context=context
+        ).data)
+    if 'ingredients' in fields:
+        ingredients = {
+            item.ingredient_id: item.ingredient
+            for recipe in recipes for item in recipe.recipe_ingredients.all()
+        }
+        data['ingredients'] = by_id(IngredientSerializer(
+            ingredients.values(), many=True, context=context
+        ).data)
+    return data
+
+
+class RecipeIdsSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=MAX_RECIPE_IDS
+    )
+
+    def validate_ids(self, value):
+        return list(dict.fromkeys(value))
+
+
+class PantrySearchSerializer(serializers.Serializer):
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=MAX_PANTRY_INGREDIENTS
+    )
+    tags = serializers.ListField(
+        child=serializers.SlugField(), required=False, default=list
+    )
+    ordering = serializers.ChoiceField(
+        choices=('coverage', 'missing'), default='coverage'
+    )
+    limit = serializers.IntegerField(
+        min_value=1, max_value=MAX_RECIPE_IDS, default=DEFAULT_PAGE_SIZE
+    )
+
+
+def recipes_by_ids(recipes, ids, context):
+    found = {recipe.id: recipe for recipe in recipes}
+    recipes = [found[recipe_id] for recipe_id in ids if recipe_id in found]
+    compact = is_compact(context['request'])
+    serializer_class = (
+        CompactRecipeSerializer if compact else RecipeReadSerializer
+    )
+    data = {
+        'results': serializer_class(recipes, many=True, context=context).data,
+        'missing': [recipe_id for recipe_id in ids if recipe_id not in found],
+    }
+    if compact:
+        data.update(sideload_recipe_relations(
+            recipes,
+            RecipeReadSerializer.get_fieldset(context['request'])[0],
+            context
+        ))
+    return data
+
+
 class RecipeWriteSerializer(serializers.ModelSerializer):
     name = serializers.CharField(max_length=RECIPE_NAME_MAX_LENGTH)
     ingredients = IngredientInRecipeWriteSerializer(many=True)
@@ -147,24 +308,29 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
             )
         return data
 
+    @transaction.atomic
     def create(self, validated_data):
         ingredients_data = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
         recipe = Recipe.objects.create(**validated_data)
         recipe.tags.set(tags)
-        self._set_ingredients(recipe, ingredients_data)
+        self._set_ingredients(recipe, ingredients_data, ())
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         ingredients_data = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
         instance.tags.set(tags)
+        old_ingredient_ids = list(
+            instance.recipe_ingredients.values_list('ingredient_id', flat=True)
+        )
         instance.recipe_ingredients.all().delete()
-        self._set_ingredients(instance, ingredients_data)
+        self._set_ingredients(instance, ingredients_data, old_ingredient_ids)
         return super().update(instance, validated_data)
 
     @staticmethod
-    def _set_ingredients(recipe, ingredients_data):
+    def _set_ingredients(recipe, ingredients_data, old_ingredient_ids):
         RecipeIngredient.objects.bulk_create([
             RecipeIngredient(
                 recipe=recipe,
@@ -173,11 +339,121 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
             )
             for ingredient in ingredients_data
         ])
+        # Прежние ингредиенты нужны обработчику, чтобы убрать рецепт из их
+        # списков в индексе.
+        outbox.publish(
+            'recipes.changed',
+            recipe.id,
+            **({'ingredients': sorted(old_ingredient_ids)}
+               if old_ingredient_ids else {})
+        )
 
     def to_representation(self, instance):
         return RecipeReadSerializer(instance, context=self.context).data
 
 
+class BulkIngredientWriteSerializer(serializers.Serializer):
+    id = serializers.IntegerField(min_value=1)
+    amount = serializers.IntegerField(
+        min_value=MIN_POSITIVE_SMALLINT,
+        max_value=MAX_POSITIVE_SMALLINT
+    )
+
+
+class BulkRecipeWriteSerializer(RecipeWriteSerializer):
+    # Ингредиенты и теги принимаются как id и проверяются по множествам,
+    # загруженным одним запросом на всю пачку.
+    ingredients = BulkIngredientWriteSerializer(many=True)
+    tags = serializers.ListField(child=serializers.IntegerField(min_value=1))
+
+    def check_relations(self, ingredient_ids, tag_ids):
+        errors = {}
+        missing = sorted(
+            {item['id'] for item in self.validated_data['ingredients']}
+            - ingredient_ids
+        )
+        if missing:
+            errors['ingredients'] = [
+                f'Ингредиенты не найдены: {", ".join(map(str, missing))}'
+            ]
+        missing = sorted(set(self.validated_data['tags']) - tag_ids)
+        if missing:
+            errors['tags'] = [
+                f'Теги не найдены: {", ".join(map(str, missing))}'
+            ]
+        return errors
+
+
+class BulkRecipesSerializer(serializers.Serializer):
+    recipes = serializers.ListField(
+        child=serializers.JSONField(),
+        allow_empty=False,
+        max_length=MAX_BULK_RECIPES
+    )
+
+
+def create_recipes(items, author, context):
+    serializers_ = [
+        BulkRecipeWriteSerializer(data=item, context=context)
+        for item in items
+    ]
+    valid = [
+        serializer for serializer in serializers_ if serializer.is_valid()
+    ]
+    ingredient_ids = set(Ingredient.objects.filter(id__in={
+        item['id']
+        for serializer in valid
+        for item in serializer.validated_data['ingredients']
+    }).values_list('id', flat=True))
+    tag_ids = set(Tag.objects.filter(id__in={
+        tag_id
+        for serializer in valid for tag_id in serializer.validated_data['tags']
+    }).values_list('id', flat=True))
+    created, errors = [], []
+    for index, serializer in enumerate(serializers_):
+        item_errors = serializer.errors or serializer.check_relations(
+            ingredient_ids, tag_ids
+        )
+        if item_errors:
+            errors.append({'index': index, 'errors': item_errors})
+            continue
+        data = serializer.validated_data
+        created.append((index, data, Recipe(
+            author=author,
+            name=data['name'],
+            image=data['image'],
+            text=data['text'],
+            cooking_time=data['cooking_time'],
+        )))
+    if not created:
+        return [], errors
+    with transaction.atomic():
+        # Картинки сохраняются в хранилище внутри bulk_create (pre_save
+        # поля), до фиксации транзакции: при откате файлы останутся без
+        # записей. Их удаляет collect_media, а файлы моложе --min-age он
+        # не трогает, чтобы не задеть ещё не зафиксированные загрузки.
+        Recipe.objects.bulk_create(recipe for *_, recipe in created)
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe_id=recipe.id, tag_id=tag_id)
+            for _, data, recipe in created for tag_id in data['tags']
+        )
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                recipe_id=recipe.id,
+                ingredient_id=item['id'],
+                amount=item['amount']
+            )
+            for _, data, recipe in created for item in data['ingredients']
+        )
+        # bulk_create не отправляет post_save и m2m_changed, поэтому
+        # событие публикуется и кэш страниц сбрасывается явно.
+        outbox.publish(
+            'recipes.changed', *(recipe.id for *_, recipe in created)
+        )
+        page_cache.invalidate_on_commit('recipes')
+    return [(index, recipe) for index, _, recipe in created], errors
+
+
 class ShortRecipeSerializer(serializers.ModelSerializer):
     class Meta:
         model = Recipe
@@ -205,6 +481,14 @@ class SubscriptionSerializer(UserSerializer):
         ).data
 
 
+class CompactSubscriptionSerializer(SubscriptionSerializer):
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(),
+        source='recent_recipe_ids',
+        read_only=True
+    )
+
+
 class SubscribeCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Subscription
@@ -222,6 +506,16 @@ class SubscribeCreateSerializer(serializers.ModelSerializer):
         data['user'] = user
         return data
 
+    @transaction.atomic
+    def create(self, validated_data):
+        subscription = super().create(validated_data)
+        outbox.publish(
+            'subscriptions.added',
+            subscription.author_id,
+            user_id=subscription.user_id
+        )
+        return subscription
+
     def to_representation(self, instance):
         return SubscriptionSerializer(
             instance.author, context=self.context
@@ -245,6 +539,17 @@ class RecipeRelationSerializer(serializers.ModelSerializer):
             )
         return data
 
+    @transaction.atomic
+    def create(self, validated_data):
+        relation = super().create(validated_data)
+        outbox.publish(
+            f'{self.topic}.added',
+            relation.recipe_id,
+            user_id=relation.user_id,
+            added_at=relation.updated_at.timestamp()
+        )
+        return relation
+
     def to_representation(self, instance):
         return ShortRecipeSerializer(
             instance.recipe, context=self.context
@@ -252,12 +557,14 @@ class RecipeRelationSerializer(serializers.ModelSerializer):
 
 
 class FavoriteSerializer(RecipeRelationSerializer):
+    topic = 'favorites'
 
     class Meta(RecipeRelationSerializer.Meta):
         model = Favorite
 
 
 class ShoppingCartSerializer(RecipeRelationSerializer):
+    topic = 'shopping_cart'
 
     class Meta(RecipeRelationSerializer.Meta):
         model = ShoppingCart
@@ -0,0 +1,173 @@
+import base64
+import binascii
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from foodgram.constants import SYNC_BATCH_SIZE
+from foodgram.models import (Favorite, Ingredient, ShoppingCart, Subscription,
+                             Tag, Tombstone)
+from .serializers import (IngredientSerializer, RecipeReadSerializer,
+                          TagSerializer)
+from .views import get_recipe_queryset
+
+# Раздел -> (только для владельца, queryset, сериализация строк).
+SECTIONS = {
+    'tags': (
+        False,
+        lambda request: Tag.objects.all(),
+        lambda rows, context: TagSerializer(rows, many=True).data
+    ),
+    'ingredients': (
+        False,
+        lambda request: Ingredient.objects.all(),
+        lambda rows, context: IngredientSerializer(rows, many=True).data
+    ),
+    'recipes': (
+        False,
+        get_recipe_queryset,
+        lambda rows, context: RecipeReadSerializer(
+            rows, many=True, context=context
+        ).data
+    ),
+    'favorites': (
+        True,
+        lambda request: Favorite.objects.filter(user=request.user),
+        lambda rows, context: [row.recipe_id for row in rows]
+    ),
+    'shopping_cart': (
+        True,
+        lambda request: ShoppingCart.objects.filter(user=request.user),
+        lambda rows, context: [row.recipe_id for row in rows]
+    ),
+    'subscriptions': (
+        True,
+        lambda request: Subscription.objects.filter(user=request.user),
+        lambda rows, context: [row.author_id for row in rows]
+    ),
+}
+
+
+class SyncExpired(APIException):
+    status_code = status.HTTP_410_GONE
+    default_detail = (
+        'Токен синхронизации устарел, требуется полная синхронизация'
+    )
+    default_code = 'sync_expired'
+
+
+# Строки и удаления раздела идут одним потоком в порядке (время, вид,
+# id): курсор — последняя отданная позиция, поэтому позднее удаление не
+# обгоняет изменение и наоборот.
+ROW, TOMBSTONE = 0, 1
+
+
+def encode_token(state):
+    return base64.urlsafe_b64encode(json.dumps(state).encode()).decode()
+
+
+def decode_token(token):
+    try:
+        state = json.loads(base64.urlsafe_b64decode(token.encode()))
+        issued_at = parse_datetime(state['at'])
+        started_at = parse_datetime(state['from'])
+        cursors = {
+            name: (parse_datetime(at), int(kind), int(pk))
+            for name, (at, kind, pk) in state['cursors'].items()
+            if name in SECTIONS
+        }
+    except (binascii.Error, KeyError, TypeError, ValueError):
+        raise ValidationError({'since': ['Некорректный токен синхронизации']})
+    if None in (
+        issued_at, started_at, *(at for at, _, _ in cursors.values())
+    ):
+        raise ValidationError({'since': ['Некорректный токен синхронизации']})
+    retention = timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS)
+    if issued_at < timezone.now() - retention:
+        raise SyncExpired()
+    return started_at, cursors
+
+
+def after(field, kind, cursor):
+    if cursor is None:
+        return Q()
+    at, cursor_kind, pk = cursor
+    if kind == cursor_kind:
+        return Q(**{f'{field}__gt': at}) | Q(**{field: at, 'id__gt': pk})
+    if kind > cursor_kind:
+        return Q(**{f'{field}__gte': at})
+    return Q(**{f'{field}__gt': at})
+
+
+class SyncView(APIView):
+    permission_classes = (AllowAny,)
+
+    def get(self, request):
+        now = timezone.now()
+        since = request.query_params.get('since')
+        if since:
+            started_at, cursors = decode_token(since)
+        else:
+            # Полной синхронизации нужны только удаления после её начала.
+            started_at, cursors = now, {}
+        # Строки из ещё не завершённых транзакций могут появиться позже
+        # с более ранним временем, поэтому свежие изменения откладываются.
+        until = now - timedelta(seconds=settings.SYNC_SETTLE_SECONDS)
+        owners = Q(user_id__isnull=True)
+        if request.user.is_authenticated:
+            owners |= Q(user_id=request.user.id)
+        context = {'request': request}
+        data, has_more = {'deleted': {}}, False
+        for name, (personal, get_queryset, serialize) in SECTIONS.items():
+            if personal and not request.user.is_authenticated:
+                continue
+            cursor = cursors.get(name)
+            rows = get_queryset(request).filter(
+                after('updated_at', ROW, cursor), updated_at__lte=until
+            ).order_by('updated_at', 'id')[:SYNC_BATCH_SIZE + 1]
+            tombstones = Tombstone.objects.filter(
+                owners,
+                after('deleted_at', TOMBSTONE, cursor),
+                model=name,
+                deleted_at__gt=started_at,
+                deleted_at__lte=until
+            ).order_by('deleted_at', 'id').values_list(
+                'deleted_at', 'id', 'object_id'
+            )[:SYNC_BATCH_SIZE + 1]
+            stream = sorted(
+                [(row.updated_at, ROW, row.id, row) for row in rows]
+                + [
+                    (deleted_at, TOMBSTONE, pk, object_id)
+                    for deleted_at, pk, object_id in tombstones
+                ],
+                key=lambda item: item[:3]
+            )
+            if len(stream) > SYNC_BATCH_SIZE:
+                stream, has_more = stream[:SYNC_BATCH_SIZE], True
+            if stream:
+                cursors[name] = stream[-1][:3]
+            data[name] = serialize(
+                [item[3] for item in stream if item[1] == ROW], context
+            )
+            deleted = [item[3] for item in stream if item[1] == TOMBSTONE]
+            if deleted:
+                data['deleted'][name] = deleted
+        data['has_more'] = has_more
+        data['next'] = encode_token({
+            'at': now.isoformat(),
+            'from': started_at.isoformat(),
+            'cursors': {
+                name: (at.isoformat(), kind, pk)
+                for name, (at, kind, pk) in cursors.items()
+            },
+        })
+        return Response(data)
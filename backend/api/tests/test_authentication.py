@@ -0,0 +1,90 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.settings import api_settings
+from rest_framework.test import APIClient
+from rest_framework.views import APIView
+
+from api.authentication import CachedTokenAuthentication, token_cache
+from foodgram.models import User
+
+CACHED_AUTHENTICATION = {
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'api.authentication.CachedTokenAuthentication',
+    ],
+}
+
+
+@override_settings(REST_FRAMEWORK=CACHED_AUTHENTICATION)
+class CachedTokenAuthenticationTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(
+            email='reader@example.com',
+            username='reader',
+            first_name='Читатель',
+            last_name='Читателев',
+            password='hash'
+        )
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        # Представления читают классы аутентификации при импорте.
+        patcher = mock.patch.object(
+            APIView,
+            'authentication_classes',
+            api_settings.DEFAULT_AUTHENTICATION_CLASSES
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        cache.clear()
+        token_cache.invalidate(self.token.key)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def get_me(self, queries):
+        # Кроме аутентификации страница делает запрос подписки на себя.
+        with self.assertNumQueries(queries):
+            response = self.client.get('/api/users/me/')
+        return response
+
+    def test_miss_reads_token_and_caches_snapshot(self):
+        self.assertEqual(self.get_me(2).status_code, 200)
+        self.assertNotIn('hash', token_cache.get(self.token.key))
+
+    def test_hit_skips_database(self):
+        self.get_me(2)
+        response = self.get_me(1)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['username'], 'reader')
+
+    def test_save_from_snapshot_keeps_password(self):
+        self.get_me(2)
+        user, _ = CachedTokenAuthentication().authenticate_credentials(
+            self.token.key
+        )
+        user.first_name = 'Другое'
+        user.save()
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.first_name, 'Другое')
+        self.assertEqual(self.user.password, 'hash')
+
+    def test_user_save_invalidates(self):
+        self.get_me(2)
+        self.user.username = 'renamed'
+        self.user.save()
+        self.assertEqual(self.get_me(2).data['username'], 'renamed')
+
+    def test_deactivation_rejects_token(self):
+        self.get_me(2)
+        self.user.is_active = False
+        self.user.save(update_fields=('is_active',))
+        self.assertEqual(self.get_me(1).status_code, 401)
+
+    def test_token_delete_rejects_token(self):
+        self.get_me(2)
+        Token.objects.filter(key=self.token.key).delete()
+        self.assertEqual(self.get_me(1).status_code, 401)
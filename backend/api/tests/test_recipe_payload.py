@@ -0,0 +1,113 @@
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from foodgram.constants import DEFAULT_PAGE_SIZE
+from foodgram.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                             Tag, User)
+
+INGREDIENTS_PER_RECIPE = 4
+
+
+class RecipePayloadTest(TestCase):
+    # Худший случай для сжатого формата: у каждого рецепта на странице свой
+    # автор и свои ингредиенты, подгружать одни и те же объекты повторно
+    # не приходится.
+
+    @classmethod
+    def setUpTestData(cls):
+        tags = Tag.objects.bulk_create(
+            Tag(name=f'Тег {index}', slug=f'tag-{index}') for index in range(3)
+        )
+        ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=f'ингредиент {index}', measurement_unit='г')
+            for index in range(DEFAULT_PAGE_SIZE * INGREDIENTS_PER_RECIPE)
+        )
+        for index in range(DEFAULT_PAGE_SIZE * 2):
+            author = User.objects.create(
+                email=f'author{index}@example.com',
+                username=f'author{index}',
+                first_name='Имя',
+                last_name='Фамилия'
+            )
+            recipe = Recipe.objects.create(
+                author=author,
+                name=f'Рецепт {index}',
+                image='recipes/dish.png',
+                text='Описание рецепта ' * 10,
+                cooking_time=10 + index
+            )
+            recipe.tags.set(tags[:2])
+            offset = index % DEFAULT_PAGE_SIZE * INGREDIENTS_PER_RECIPE
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(
+                    recipe=recipe, ingredient=ingredient, amount=5
+                )
+                for ingredient in ingredients[
+                    offset:offset + INGREDIENTS_PER_RECIPE
+                ]
+            )
+        cls.user = User.objects.create(
+            email='reader@example.com',
+            username='reader',
+            first_name='Читатель',
+            last_name='Читателев'
+        )
+        Favorite.objects.create(user=cls.user, recipe=recipe)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def get(self, query, queries):
+        with self.assertNumQueries(queries):
+            response = self.client.get(f'/api/recipes/{query}')
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_full_list(self):
+        response = self.get('', 5)
+        self.assertEqual(len(response.data['results']), DEFAULT_PAGE_SIZE)
+        self.assertEqual(
+            len(response.data['results'][0]['ingredients']),
+            INGREDIENTS_PER_RECIPE
+        )
+
+    def test_full_list_authenticated(self):
+        self.client.force_authenticate(self.user)
+        response = self.get('', 6)
+        self.assertTrue(response.data['results'][0]['is_favorited'])
+
+    def test_fields_skip_relations(self):
+        response = self.get('?fields=id,name,cooking_time', 2)
+        self.assertEqual(
+            set(response.data['results'][0]), {'id', 'name', 'cooking_time'}
+        )
+        self.assertLess(
+            len(response.content), len(self.get('', 5).content) / 4
+        )
+
+    def test_omit_skips_relations(self):
+        response = self.get('?omit=ingredients,tags,author', 2)
+        self.assertNotIn('ingredients', response.data['results'][0])
+        self.assertIn('text', response.data['results'][0])
+
+    def test_compact_is_smaller(self):
+        full = self.get('', 5)
+        compact = self.get('?compact=1', 5)
+        self.assertEqual(
+            [recipe['id'] for recipe in compact.data['results']],
+            [recipe['id'] for recipe in full.data['results']]
+        )
+        self.assertEqual(len(compact.data['users']), DEFAULT_PAGE_SIZE)
+        self.assertEqual(
+            len(compact.data['ingredients']),
+            DEFAULT_PAGE_SIZE * INGREDIENTS_PER_RECIPE
+        )
+        self.assertLess(len(compact.content), len(full.content))
+
+    def test_compact_fields(self):
+        response = self.get('?compact=1&fields=id,author', 2)
+        self.assertEqual(set(response.data), {
+            'count', 'next', 'previous', 'results', 'users'
+        })
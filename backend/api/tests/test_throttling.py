@@ -0,0 +1,81 @@
+import threading
+import time
+from unittest import mock
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from api.throttling import CostRateThrottle
+
+CAPACITY = 5
+THREADS = 20
+
+
+class SlowCache:
+    # Каждое обращение к кэшу отдаёт управление другим потокам, как
+    # сетевой запрос к Redis.
+
+    def __getattr__(self, name):
+        method = getattr(cache, name)
+
+        def call(*args, **kwargs):
+            time.sleep(0.001)
+            return method(*args, **kwargs)
+
+        return call
+
+
+@override_settings(THROTTLE_ANON_CAPACITY=CAPACITY, THROTTLE_ANON_RATE=0.0001)
+class CostRateThrottleTest(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    @staticmethod
+    def make_request():
+        request = RequestFactory().get('/api/recipes/')
+        request.user = AnonymousUser()
+        return request
+
+    def test_concurrent_requests_are_rejected(self):
+        barrier = threading.Barrier(THREADS)
+        results = []
+
+        def send():
+            throttle = CostRateThrottle()
+            request = self.make_request()
+            barrier.wait()
+            results.append(throttle.allow_request(request, None))
+
+        threads = [threading.Thread(target=send) for _ in range(THREADS)]
+        with mock.patch('api.throttling.cache', SlowCache()):
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(results.count(True), CAPACITY)
+        self.assertEqual(results.count(False), THREADS - CAPACITY)
+
+    def test_rejected_request_reports_wait(self):
+        throttle = CostRateThrottle()
+        for _ in range(CAPACITY):
+            self.assertTrue(throttle.allow_request(self.make_request(), None))
+        self.assertFalse(throttle.allow_request(self.make_request(), None))
+        self.assertGreater(throttle.wait(), 0)
+
+    def test_window_boundary_burst_is_rejected(self):
+        window = CAPACITY / 0.0001
+        throttle = CostRateThrottle()
+        with mock.patch('api.throttling.time.time') as now:
+            now.return_value = window * 10 - 1
+            for _ in range(CAPACITY):
+                self.assertTrue(
+                    throttle.allow_request(self.make_request(), None)
+                )
+            now.return_value = window * 10 + 1
+            self.assertFalse(throttle.allow_request(self.make_request(), None))
+            self.assertAlmostEqual(throttle.wait(), window / CAPACITY - 1)
+            now.return_value = window * 10 + window / CAPACITY
+            self.assertTrue(throttle.allow_request(self.make_request(), None))
+            self.assertFalse(throttle.allow_request(self.make_request(), None))
@@ -0,0 +1,94 @@
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.throttling import BaseThrottle
+
+from foodgram.constants import DEFAULT_PAGE_SIZE, THROTTLE_BYTES_PER_TOKEN
+from foodgram_backend import metrics
+
+THROTTLE_KEY = 'throttle:{}:{}'
+
+
+class CostRateThrottle(BaseThrottle):
+    # Скользящее окно из двух счётчиков в общем кэше: расход за последние
+    # capacity / rate секунд оценивается как текущий счётчик плюс доля
+    # предыдущего, пропорциональная ещё не прошедшей части окна, и не
+    # превышает capacity, в том числе на границе окон. Счётчик окна
+    # увеличивается атомарно (INCRBY в Redis), так что параллельные
+    # запросы не обходят лимит; отклонённый запрос свою стоимость
+    # возвращает. Стоимость действия задаётся во вьюсете через
+    # throttle_costs и растёт с размером страницы и тела запроса.
+
+    def __init__(self):
+        self.retry_after = None
+
+    def get_bucket(self, request):
+        if request.user and request.user.is_authenticated:
+            return (
+                f'user:{request.user.pk}',
+                settings.THROTTLE_USER_CAPACITY,
+                settings.THROTTLE_USER_RATE
+            )
+        return (
+            f'ip:{self.get_ident(request)}',
+            settings.THROTTLE_ANON_CAPACITY,
+            settings.THROTTLE_ANON_RATE
+        )
+
+    @staticmethod
+    def get_cost(request, view):
+        cost = getattr(view, 'throttle_costs', {}).get(
+            getattr(view, 'action', None), 1
+        )
+        limit = request.GET.get('limit', '')
+        if limit.isdigit():
+            cost *= max(1, math.ceil(int(limit) / DEFAULT_PAGE_SIZE))
+        size = request.META.get('CONTENT_LENGTH') or ''
+        if size.isdigit():
+            cost += int(size) // THROTTLE_BYTES_PER_TOKEN
+        return cost
+
+    def allow_request(self, request, view):
+        ident, capacity, rate = self.get_bucket(request)
+        # Запрос дороже всего окна пропускается только при пустом окне.
+        cost = min(self.get_cost(request, view), capacity)
+        window = capacity / rate
+        now = time.time()
+        number, elapsed = divmod(now, window)
+        key = THROTTLE_KEY.format(ident, int(number))
+        timeout = math.ceil(window * 2)
+        if cache.add(key, cost, timeout):
+            spent = cost
+        else:
+            try:
+                spent = cache.incr(key, cost)
+            except ValueError:
+                # Ключ истёк между add и incr: окно только что сменилось.
+                cache.add(key, cost, timeout)
+                spent = cost
+        previous = cache.get(THROTTLE_KEY.format(ident, int(number) - 1), 0)
+        remaining = 1 - elapsed / window
+        if spent + previous * remaining > capacity:
+            try:
+                cache.decr(key, cost)
+            except ValueError:
+                pass
+            if previous and spent <= capacity:
+                # Доля предыдущего окна убывает линейно до конца окна.
+                self.retry_after = (
+                    spent + previous * remaining - capacity
+                ) / previous * window
+            else:
+                self.retry_after = window - elapsed
+            metrics.incr('throttle.rejected')
+            metrics.incr(
+                f'throttle.rejected.{getattr(view, "basename", None)}.'
+                f'{getattr(view, "action", None)}'
+            )
+            return False
+        return True
+
+    def wait(self):
+        return self.retry_after
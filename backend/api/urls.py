@@ -1,7 +1,7 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from . import views
+from . import sync, views
 
 router = DefaultRouter()
 router.register('recipes', views.RecipeViewSet, basename='recipes')
@@ -11,5 +11,6 @@ router.register('users', views.AddUserViewSet, basename='users')
 
 urlpatterns = [
     path('auth/', include('djoser.urls.authtoken')),
+    path('sync/', sync.SyncView.as_view()),
     path('', include(router.urls)),
 ]
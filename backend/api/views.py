@@ -1,7 +1,9 @@
 import io
 
 from django.contrib.auth import get_user_model
-from django.db.models import Count, Sum
+from django.db import transaction
+from django.db.models import Count, Exists, F, OuterRef, Sum, Value, Window
+from django.db.models.functions import RowNumber
 from django.http import FileResponse
 from django.shortcuts import get_object_or_404
 from django.urls import reverse
@@ -15,29 +17,59 @@ from rest_framework.permissions import (AllowAny, IsAuthenticated,
                                         IsAuthenticatedOrReadOnly)
 from rest_framework.response import Response
 
-from foodgram.constants import DEFAULT_PAGE_SIZE
-from foodgram.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                             ShoppingCart, Subscription, Tag)
-from .filters import IngredientFilter, RecipeFilter
+from foodgram import ingredient_index, outbox, purge
+from foodgram.constants import DEFAULT_PAGE_SIZE, SIMILAR_RECIPES_COUNT
+from foodgram.models import (Ingredient, Recipe, RecipeIngredient,
+                             Subscription, Tag)
+
+from .filters import IngredientFilter, RecipeFilter, UserFilter
+from .mixins import CompressedCacheMixin, ReplicaReadMixin
 from .pagination import RecipePagination
 from .permissions import IsAuthorOrReadOnly
-from .serializers import (FavoriteSerializer, IngredientSerializer,
-                          RecipeReadSerializer, RecipeWriteSerializer,
-                          ShoppingCartSerializer, SubscribeCreateSerializer,
+from .serializers import (BulkRecipesSerializer, CompactRecipeSerializer,
+                          CompactSubscriptionSerializer, FavoriteSerializer,
+                          IngredientSerializer, PantrySearchSerializer,
+                          RecipeIdsSerializer, RecipeReadSerializer,
+                          RecipeWriteSerializer, ShoppingCartSerializer,
+                          ShortRecipeSerializer, SubscribeCreateSerializer,
                           SubscriptionSerializer, TagSerializer,
-                          UserAvatarSerializer)
+                          UserAvatarSerializer, UserSerializer, by_id,
+                          create_recipes, is_compact, recipes_by_ids,
+                          sideload_recipe_relations)
 
 User = get_user_model()
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+def get_recipe_queryset(request):
+    fields, collapsed = RecipeReadSerializer.get_fieldset(request)
+    queryset = Recipe.objects.for_user(request.user, fields - collapsed)
+    if 'tags' in fields:
+        queryset = queryset.prefetch_related('tags')
+    if 'ingredients' in fields:
+        queryset = queryset.prefetch_related('recipe_ingredients__ingredient')
+    if 'text' not in fields:
+        queryset = queryset.defer('text')
+    return queryset.order_by('-pub_date')
+
+
+def get_recipe_ids(data):
+    serializer = RecipeIdsSerializer(data=data)
+    serializer.is_valid(raise_exception=True)
+    return serializer.validated_data['ids']
+
+
+class TagViewSet(
+    CompressedCacheMixin, ReplicaReadMixin, viewsets.ReadOnlyModelViewSet
+):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = (IsAuthenticatedOrReadOnly,)
     pagination_class = None
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(
+    CompressedCacheMixin, ReplicaReadMixin, viewsets.ReadOnlyModelViewSet
+):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = (IsAuthenticatedOrReadOnly,)
@@ -46,26 +78,164 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     pagination_class = None
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
-    queryset = (
-        Recipe.objects
-        .select_related('author')
-        .prefetch_related('tags', 'recipe_ingredients__ingredient')
-        .order_by('-pub_date')
-    )
+class RecipeViewSet(
+    CompressedCacheMixin, ReplicaReadMixin, viewsets.ModelViewSet
+):
+    queryset = Recipe.objects.all()
+    personalized = True
     permission_classes = (IsAuthorOrReadOnly,)
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
     pagination_class = RecipePagination
+    throttle_costs = {
+        'create': 5,
+        'update': 5,
+        'partial_update': 5,
+        'by_ids': 2,
+        'by_ingredients': 5,
+        'similar': 2,
+        'download_shopping_cart': 10,
+        'bulk': 50,
+    }
+
+    def get_queryset(self):
+        return get_recipe_queryset(self.request)
 
     def get_serializer_class(self):
+        if self.action == 'list' and is_compact(self.request):
+            return CompactRecipeSerializer
         if self.action in ('list', 'retrieve'):
             return RecipeReadSerializer
         return RecipeWriteSerializer
 
+    def list(self, request, *args, **kwargs):
+        if 'ids' in request.query_params:
+            return self._list_by_ids(
+                {'ids': request.query_params['ids'].split(',')}
+            )
+        if not is_compact(request):
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        recipes = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(recipes, many=True)
+        response = self.get_paginated_response(serializer.data)
+        response.data.update(sideload_recipe_relations(
+            recipes,
+            RecipeReadSerializer.get_fieldset(request)[0],
+            self.get_serializer_context()
+        ))
+        return response
+
+    def _list_by_ids(self, data):
+        ids = get_recipe_ids(data)
+        return Response(recipes_by_ids(
+            self.get_queryset().filter(id__in=ids),
+            ids,
+            self.get_serializer_context()
+        ))
+
+    @action(
+        detail=False,
+        methods=('post',),
+        url_path='by-ids',
+        permission_classes=(AllowAny,)
+    )
+    def by_ids(self, request):
+        return self._list_by_ids(request.data)
+
+    @action(
+        detail=False,
+        url_path='by-ingredients',
+        permission_classes=(AllowAny,)
+    )
+    def by_ingredients(self, request):
+        params = request.query_params
+        serializer = PantrySearchSerializer(data={
+            'ingredients': params.get('ingredients', '').split(','),
+            'tags': params.getlist('tags'),
+            **{
+                name: params[name]
+                for name in ('ordering', 'limit') if name in params
+            },
+        })
+        serializer.is_valid(raise_exception=True)
+        search = serializer.validated_data
+        ranked = ingredient_index.rank_recipes(
+            search['ingredients'],
+            search['limit'],
+            search['ordering'],
+            search['tags']
+        )
+        recipes = {
+            recipe.id: recipe for recipe in self.get_queryset().filter(
+                id__in=[recipe_id for recipe_id, *_ in ranked]
+            )
+        }
+        ranked = [item for item in ranked if item[0] in recipes]
+        results = RecipeReadSerializer(
+            [recipes[recipe_id] for recipe_id, *_ in ranked],
+            many=True,
+            context=self.get_serializer_context()
+        ).data
+        for data, (_, matched, missing) in zip(results, ranked):
+            data['matched_ingredients'] = matched
+            data['missing_ingredients'] = missing
+        return Response({'results': results})
+
+    @action(
+        detail=False,
+        methods=('post',),
+        permission_classes=(IsAuthenticated,)
+    )
+    def bulk(self, request):
+        serializer = BulkRecipesSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        created, errors = create_recipes(
+            serializer.validated_data['recipes'],
+            request.user,
+            self.get_serializer_context()
+        )
+        return Response(
+            {
+                'created': [
+                    {'index': index, 'id': recipe.id}
+                    for index, recipe in created
+                ],
+                'errors': errors,
+            },
+            status=(
+                status.HTTP_201_CREATED if created
+                else status.HTTP_400_BAD_REQUEST
+            )
+        )
+
+    @action(detail=True, permission_classes=(AllowAny,))
+    def similar(self, request, pk=None):
+        recipe = get_object_or_404(Recipe, pk=pk)
+        neighbors = dict(
+            recipe.neighbors.order_by('-score').values_list(
+                'similar_id', 'score'
+            )[:SIMILAR_RECIPES_COUNT]
+        )
+        recipes = {
+            recipe.id: recipe for recipe in self.get_queryset().filter(
+                id__in=neighbors
+            )
+        }
+        ordered = [recipes[i] for i in neighbors if i in recipes]
+        results = RecipeReadSerializer(
+            ordered, many=True, context=self.get_serializer_context()
+        ).data
+        for data, recipe in zip(results, ordered):
+            data['similarity'] = round(neighbors[recipe.id], 4)
+        return Response({'results': results})
+
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
+    def perform_destroy(self, instance):
+        purge.schedule_recipe(instance)
+
     def _add_to_relation(self, serializer_class, pk):
         recipe = get_object_or_404(Recipe, pk=pk)
         data = {'recipe': recipe.id}
@@ -76,12 +246,20 @@ class RecipeViewSet(viewsets.ModelViewSet):
         serializer.save(user=self.request.user)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-    def _remove_from_relation(self, model, pk, not_found_error):
+    @transaction.atomic
+    def _remove_from_relation(self, serializer_class, pk, not_found_error):
         recipe = get_object_or_404(Recipe, pk=pk)
-        deleted, _ = model.objects.filter(
+        relation = serializer_class.Meta.model.objects.filter(
             user=self.request.user, recipe=recipe
-        ).delete()
-        if deleted:
+        ).first()
+        if relation is not None:
+            relation.delete()
+            outbox.publish(
+                f'{serializer_class.topic}.removed',
+                recipe.id,
+                user_id=self.request.user.id,
+                added_at=relation.updated_at.timestamp()
+            )
             return Response(status=status.HTTP_204_NO_CONTENT)
         return Response(
             {'errors': not_found_error}, status=status.HTTP_400_BAD_REQUEST
@@ -98,7 +276,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
     @favorite.mapping.delete
     def delete_favorite(self, request, pk=None):
         return self._remove_from_relation(
-            Favorite, pk, 'Рецепта нет в избранном'
+            FavoriteSerializer, pk, 'Рецепта нет в избранном'
         )
 
     @action(
@@ -112,7 +290,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
     @shopping_cart.mapping.delete
     def delete_shopping_cart(self, request, pk=None):
         return self._remove_from_relation(
-            ShoppingCart, pk, 'Рецепта нет в корзине'
+            ShoppingCartSerializer, pk, 'Рецепта нет в корзине'
         )
 
     @action(
@@ -147,7 +325,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def download_shopping_cart(self, request):
         user = request.user
         ingredients = RecipeIngredient.objects.filter(
-            recipe__shoppingcarts__user=user
+            recipe__shoppingcarts__user=user, recipe__is_hidden=False
         ).values(
             'ingredient__name',
             'ingredient__measurement_unit'
@@ -164,8 +342,37 @@ class RecipeViewSet(viewsets.ModelViewSet):
         return response
 
 
-class AddUserViewSet(DjoserUserViewSet):
+class AddUserViewSet(ReplicaReadMixin, DjoserUserViewSet):
     lookup_field = 'pk'
+    filter_backends = (DjangoFilterBackend,)
+    filterset_class = UserFilter
+    throttle_costs = {
+        'create': 5,
+        'set_password': 5,
+        'subscriptions': 2,
+    }
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        user = self.request.user
+        if self.action in ('list', 'retrieve'):
+            queryset = queryset.filter(is_active=True).order_by('id')
+        if (
+            self.action in ('list', 'retrieve')
+            and user.is_authenticated
+            and 'is_subscribed' in UserSerializer.get_fieldset(self.request)[0]
+        ):
+            queryset = queryset.annotate(
+                is_subscribed=Exists(
+                    Subscription.objects.filter(
+                        user=user, author=OuterRef('pk')
+                    )
+                )
+            )
+        return queryset
+
+    def perform_destroy(self, instance):
+        purge.schedule_user(instance)
 
     def get_permissions(self):
         if self.action == 'me':
@@ -199,7 +406,7 @@ class AddUserViewSet(DjoserUserViewSet):
     )
     def subscribe(self, request, pk=None):
         author = get_object_or_404(
-            User.objects.annotate(
+            User.objects.filter(is_active=True).annotate(
                 recipes_count=Count('recipes', distinct=True)
             ),
             pk=pk
@@ -223,9 +430,14 @@ class AddUserViewSet(DjoserUserViewSet):
             ),
             pk=pk
         )
-        deleted, _ = Subscription.objects.filter(
-            user=request.user, author=author
-        ).delete()
+        with transaction.atomic():
+            deleted, _ = Subscription.objects.filter(
+                user=request.user, author=author
+            ).delete()
+            if deleted:
+                outbox.publish(
+                    'subscriptions.removed', author.id, user_id=request.user.id
+                )
         if deleted:
             return Response(status=status.HTTP_204_NO_CONTENT)
         return Response(
@@ -240,15 +452,26 @@ class AddUserViewSet(DjoserUserViewSet):
         permission_classes=(IsAuthenticated,)
     )
     def subscriptions(self, request):
+        fields, _ = SubscriptionSerializer.get_fieldset(request)
         subscriptions = User.objects.filter(
-            subscriptions_to_author__user=request.user
-        ).annotate(
-            recipes_count=Count('recipes', distinct=True)
+            subscriptions_to_author__user=request.user, is_active=True
         ).order_by('username')
+        if 'recipes_count' in fields:
+            subscriptions = subscriptions.annotate(
+                recipes_count=Count('recipes', distinct=True)
+            )
+        if 'is_subscribed' in fields:
+            subscriptions = subscriptions.annotate(
+                is_subscribed=Value(True)
+            )
         paginator = LimitOffsetPagination()
         paginator.default_limit = DEFAULT_PAGE_SIZE
         paginator.limit_query_param = 'limit'
         page = paginator.paginate_queryset(subscriptions, request, view=self)
+        if is_compact(request):
+            return self._compact_subscriptions(
+                request, paginator, page, 'recipes' in fields
+            )
         if page is not None:
             serializer = SubscriptionSerializer(
                 page, many=True, context={'request': request})
@@ -256,3 +479,39 @@ class AddUserViewSet(DjoserUserViewSet):
         serializer = SubscriptionSerializer(
             subscriptions, many=True, context={'request': request})
         return Response(serializer.data)
+
+    @staticmethod
+    def _compact_subscriptions(request, paginator, authors, with_recipes):
+        recipes = []
+        if with_recipes:
+            recipes = Recipe.objects.filter(author__in=authors).only(
+                'id', 'name', 'image', 'cooking_time', 'author_id'
+            ).annotate(
+                position=Window(
+                    RowNumber(),
+                    partition_by=F('author_id'),
+                    order_by=F('pub_date').desc()
+                )
+            ).order_by('author_id', 'position')
+            limit = request.query_params.get('recipes_limit')
+            if limit:
+                try:
+                    recipes = recipes.filter(position__lte=int(limit))
+                except (TypeError, ValueError):
+                    pass
+        recipe_ids = {}
+        for recipe in recipes:
+            recipe_ids.setdefault(recipe.author_id, []).append(recipe.id)
+        for author in authors:
+            author.recent_recipe_ids = recipe_ids.get(author.id, [])
+        context = {'request': request}
+        response = paginator.get_paginated_response(
+            CompactSubscriptionSerializer(
+                authors, many=True, context=context
+            ).data
+        )
+        if with_recipes:
+            response.data['recipes'] = by_id(ShortRecipeSerializer(
+                recipes, many=True, context=context
+            ).data)
+        return response
@@ -1,51 +1,195 @@
+from django import forms
 from django.contrib import admin
+from django.contrib.admin.widgets import AutocompleteSelect
 from django.contrib.auth import get_user_model
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Count, IntegerField, OuterRef, Prefetch, Subquery
+from django.db.models.functions import Coalesce
+from django.utils.functional import cached_property
 
+from . import purge
+from .constants import ADMIN_ESTIMATED_COUNT_THRESHOLD
 from .models import (Favorite, Ingredient, Recipe, RecipeIngredient,
                      ShoppingCart, Subscription, Tag)
 
 User = get_user_model()
 
 
+def count_subquery(model, field):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(count=Count('*'))
+            .values('count'),
+            output_field=IntegerField()
+        ),
+        0
+    )
+
+
+class EstimatedCountPaginator(Paginator):
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql' and not queryset.query.where:
+            # Для таблицы без фильтров берётся оценка планировщика,
+            # точный COUNT(*) на миллионах строк слишком долгий.
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT reltuples::bigint FROM pg_class '
+                    'WHERE oid = %s::regclass',
+                    (queryset.model._meta.db_table,)
+                )
+                row = cursor.fetchone()
+            if row and row[0] >= ADMIN_ESTIMATED_COUNT_THRESHOLD:
+                return row[0]
+        return super().count
+
+
+class AutocompleteFilter(admin.SimpleListFilter):
+    template = 'admin/foodgram/autocomplete_filter.html'
+    field_name = None
+
+    def __init__(self, request, params, model, model_admin):
+        self.parameter_name = f'{self.field_name}__id__exact'
+        field = model._meta.get_field(self.field_name)
+        self.title = field.verbose_name
+        super().__init__(request, params, model, model_admin)
+        self.widget = field.formfield(
+            widget=AutocompleteSelect(field, model_admin.admin_site)
+        ).widget
+
+    @classmethod
+    def for_field(cls, field_name):
+        return type(
+            f'{field_name.title()}AutocompleteFilter',
+            (cls,),
+            {'field_name': field_name}
+        )
+
+    def lookups(self, request, model_admin):
+        return ()
+
+    def has_output(self):
+        return True
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(**{self.parameter_name: self.value()})
+        return queryset
+
+    def rendered_widget(self):
+        return self.widget.render(
+            self.parameter_name,
+            self.value(),
+            attrs={'data-filter-parameter': self.parameter_name}
+        )
+
+
+class ScalableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    @property
+    def media(self):
+        media = super().media
+        for list_filter in self.list_filter:
+            if isinstance(list_filter, type) and issubclass(
+                list_filter, AutocompleteFilter
+            ):
+                media += AutocompleteSelect(
+                    self.model._meta.get_field(list_filter.field_name),
+                    self.admin_site
+                ).media + forms.Media(
+                    js=('admin/foodgram/autocomplete_filter.js',)
+                )
+        return media
+
+
 @admin.register(User)
-class UserAdmin(BaseUserAdmin):
+class UserAdmin(ScalableAdmin, BaseUserAdmin):
     list_display = (
         'id', 'username', 'email', 'first_name', 'last_name', 'recipes_count',
         'subscribers_count'
     )
     search_fields = ('email', 'username')
-    list_filter = ('username', 'email')
+    list_filter = ('is_staff', 'is_active')
     ordering = ('username',)
+    actions = ('schedule_purge',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            recipes_total=count_subquery(Recipe, 'author'),
+            subscribers_total=count_subquery(Subscription, 'author')
+        )
 
     @admin.display(description='Кол-во рецептов')
     def recipes_count(self, obj):
-        return obj.recipes.count()
+        return obj.recipes_total
 
     @admin.display(description='Кол-во подписчиков')
     def subscribers_count(self, obj):
-        return obj.subscriptions_to_author.count()
+        return obj.subscribers_total
+
+    @admin.action(description='Удалить в фоне')
+    def schedule_purge(self, request, queryset):
+        for user in queryset:
+            purge.schedule_user(user)
 
 
 class RecipeIngredientInline(admin.TabularInline):
     model = RecipeIngredient
     extra = 1
     min_num = 1
+    autocomplete_fields = ('ingredient',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('ingredient')
 
 
 @admin.register(Recipe)
-class RecipeAdmin(admin.ModelAdmin):
+class RecipeAdmin(ScalableAdmin):
     list_display = (
         'name', 'author', 'favorites_count', 'display_tags',
         'display_ingredients'
     )
     search_fields = ('name', 'author__username', 'author__email')
-    list_filter = ('tags',)
+    list_filter = (
+        'is_hidden', 'tags', AutocompleteFilter.for_field('author')
+    )
+    list_select_related = ('author',)
+    autocomplete_fields = ('author',)
     inlines = (RecipeIngredientInline,)
+    actions = ('schedule_purge',)
+
+    def get_queryset(self, request):
+        # Менеджер по умолчанию прячет рецепты, ждущие удаления; в админке
+        # они нужны, а без его фильтра список может брать оценку COUNT.
+        queryset = Recipe.all_objects.all()
+        ordering = self.get_ordering(request)
+        if ordering:
+            queryset = queryset.order_by(*ordering)
+        return queryset.annotate(
+            favorites_total=count_subquery(Favorite, 'recipe')
+        ).prefetch_related(
+            'tags',
+            Prefetch(
+                'recipe_ingredients',
+                queryset=RecipeIngredient.objects.select_related(
+                    'ingredient'
+                )
+            )
+        )
 
     @admin.display(description='В избранном (раз)')
     def favorites_count(self, obj):
-        return obj.favorites.count()
+        return obj.favorites_total
 
     @admin.display(description='Теги')
     def display_tags(self, obj):
@@ -58,9 +202,14 @@ class RecipeAdmin(admin.ModelAdmin):
             for recipe_ingredient in obj.recipe_ingredients.all()
         )
 
+    @admin.action(description='Удалить в фоне')
+    def schedule_purge(self, request, queryset):
+        for recipe in queryset:
+            purge.schedule_recipe(recipe)
+
 
 @admin.register(Ingredient)
-class IngredientAdmin(admin.ModelAdmin):
+class IngredientAdmin(ScalableAdmin):
     list_display = ('name', 'measurement_unit')
     search_fields = ('name',)
     ordering = ('name', 'measurement_unit')
@@ -74,25 +223,36 @@ class TagAdmin(admin.ModelAdmin):
     ordering = ('name',)
 
 
-@admin.register(Favorite)
-class FavoriteAdmin(admin.ModelAdmin):
+class UserRecipeRelationAdmin(ScalableAdmin):
     list_display = ('id', 'user', 'recipe')
     search_fields = ('user__username', 'recipe__name')
-    list_filter = ('user', 'recipe')
-    ordering = ('user__username', 'recipe__name')
+    list_filter = (
+        AutocompleteFilter.for_field('user'),
+        AutocompleteFilter.for_field('recipe'),
+    )
+    list_select_related = ('user', 'recipe')
+    autocomplete_fields = ('user', 'recipe')
+    ordering = ('-id',)
+
+
+@admin.register(Favorite)
+class FavoriteAdmin(UserRecipeRelationAdmin):
+    pass
 
 
 @admin.register(ShoppingCart)
-class ShoppingCartAdmin(admin.ModelAdmin):
-    list_display = ('id', 'user', 'recipe')
-    search_fields = ('user__username', 'recipe__name')
-    list_filter = ('user', 'recipe')
-    ordering = ('user__username', 'recipe__name')
+class ShoppingCartAdmin(UserRecipeRelationAdmin):
+    pass
 
 
 @admin.register(Subscription)
-class SubscriptionAdmin(admin.ModelAdmin):
+class SubscriptionAdmin(ScalableAdmin):
     list_display = ('id', 'user', 'author')
     search_fields = ('user__username', 'author__username')
-    list_filter = ('user', 'author')
-    ordering = ('user__username', 'author__username')
+    list_filter = (
+        AutocompleteFilter.for_field('user'),
+        AutocompleteFilter.for_field('author'),
+    )
+    list_select_related = ('user', 'author')
+    autocomplete_fields = ('user', 'author')
+    ordering = ('-id',)
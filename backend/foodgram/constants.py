@@ -8,3 +8,39 @@ STR_LIMIT = 20
 DEFAULT_PAGE_SIZE = 6
 MIN_POSITIVE_SMALLINT = 1
 MAX_POSITIVE_SMALLINT = 32767
+IMPORT_BATCH_SIZE = 5000
+JSON_READ_CHUNK_SIZE = 64 * 1024
+EXPORT_CHUNK_SIZE = 2000
+RECIPE_IMPORT_BATCH_SIZE = 500
+IMPORT_NAME_MAX_LENGTH = 255
+IMPORT_RECORD_TYPE_MAX_LENGTH = 16
+MAX_RECIPE_IDS = 100
+TOMBSTONE_MODEL_MAX_LENGTH = 32
+SYNC_BATCH_SIZE = 500
+TAG_CHECK_CHUNK_SIZE = 1000
+INGREDIENT_INDEX_BLOCK_SIZE = 4096
+INGREDIENT_INDEX_WRITE_BATCH_SIZE = 500
+PANTRY_MAX_POSTINGS = 50000
+MAX_PANTRY_INGREDIENTS = 50
+SIMILAR_RECIPES_COUNT = 10
+SIMILARITY_BLOCK_SIZE = 1000
+SIMILARITY_CANDIDATES = 2000
+SIMILARITY_TAG_WEIGHT = 0.5
+RANKING_BATCH_SIZE = 5000
+TRENDING_MAX_EXPONENT = 512
+RANKING_SOURCE_MAX_LENGTH = 32
+ADMIN_ESTIMATED_COUNT_THRESHOLD = 100000
+PURGE_BATCH_SIZE = 1000
+PURGE_RECIPE_BATCH_SIZE = 100
+PURGE_TARGET_MAX_LENGTH = 16
+EXPLAIN_MIN_ROWS = 1000
+THROTTLE_BYTES_PER_TOKEN = 1024 * 1024
+STARTUP_TIME_BUDGET = 2.0
+OUTBOX_TOPIC_MAX_LENGTH = 64
+OUTBOX_BATCH_SIZE = 500
+OUTBOX_MAX_ATTEMPTS = 5
+OUTBOX_PUBLISH_CHUNK_SIZE = 500
+MEDIA_GC_BATCH_SIZE = 1000
+MEDIA_GC_MIN_AGE_HOURS = 24
+MAX_BULK_RECIPES = 100
+USER_SEARCH_LIMIT = 20
@@ -0,0 +1,241 @@
+import heapq
+from collections import Counter, defaultdict
+from itertools import groupby
+
+from django.db import transaction
+from django.db.models import Count
+
+from .constants import (INGREDIENT_INDEX_BLOCK_SIZE,
+                        INGREDIENT_INDEX_WRITE_BATCH_SIZE, PANTRY_MAX_POSTINGS,
+                        TAG_CHECK_CHUNK_SIZE)
+from .models import IngredientIndex, Recipe, RecipeIngredient
+
+# Список рецептов ингредиента разбит на блоки по диапазонам id рецептов:
+# изменение рецепта блокирует и перекодирует только его блок, а не весь
+# список. Внутри блока пары «разность отсортированных id рецептов, число
+# ингредиентов рецепта» записаны varint (7 бит на байт), поэтому размер
+# не ограничен разрядностью. Скрытые рецепты в индекс не попадают.
+# Опустевшие блоки не удаляются, их убирает rebuild.
+
+
+def block_of(recipe_id):
+    return recipe_id // INGREDIENT_INDEX_BLOCK_SIZE
+
+
+def _varint(value, output):
+    while value > 0x7f:
+        output.append(value & 0x7f | 0x80)
+        value >>= 7
+    output.append(value)
+
+
+def encode(postings):
+    output = bytearray()
+    previous = 0
+    for recipe_id in sorted(postings):
+        _varint(recipe_id - previous, output)
+        _varint(postings[recipe_id], output)
+        previous = recipe_id
+    return bytes(output)
+
+
+def decode(data):
+    recipe_id = value = shift = 0
+    is_count = False
+    for byte in data:
+        value |= (byte & 0x7f) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        if is_count:
+            yield recipe_id, value
+        else:
+            recipe_id += value
+        is_count = not is_count
+        value = shift = 0
+
+
+def rebuild():
+    # Строки читаются курсором по порядку (ингредиент, рецепт) и пишутся
+    # по блоку: в памяти только число ингредиентов каждого рецепта.
+    visible = RecipeIngredient.objects.filter(
+        recipe__is_hidden=False
+    ).order_by()
+    counts = dict(
+        visible.values('recipe_id').annotate(
+            total=Count('id')
+        ).values_list('recipe_id', 'total')
+    )
+    rows = visible.order_by('ingredient_id', 'recipe_id').values_list(
+        'ingredient_id', 'recipe_id'
+    )
+    ingredients, blocks = set(), []
+    with transaction.atomic():
+        IngredientIndex.objects.all().delete()
+        for (ingredient_id, block), group in groupby(
+            rows.iterator(chunk_size=10000),
+            key=lambda row: (row[0], block_of(row[1]))
+        ):
+            postings = {recipe_id: counts[recipe_id] for _, recipe_id in group}
+            blocks.append(IngredientIndex(
+                ingredient_id=ingredient_id,
+                block=block,
+                postings=encode(postings),
+                size=len(postings)
+            ))
+            ingredients.add(ingredient_id)
+            if len(blocks) >= INGREDIENT_INDEX_WRITE_BATCH_SIZE:
+                IngredientIndex.objects.bulk_create(blocks)
+                blocks = []
+        IngredientIndex.objects.bulk_create(blocks)
+    return len(ingredients)
+
+
+def _apply(changes):
+    # changes: (id ингредиента, блок) -> {id рецепта: число ингредиентов
+    # или None, если рецепт убирается из списка}.
+    if not changes:
+        return
+    with transaction.atomic():
+        # Недостающие блоки создаются заранее: параллельные изменения одного
+        # блока ждут блокировку строки, а не перезаписывают друг друга.
+        IngredientIndex.objects.bulk_create(
+            (
+                IngredientIndex(
+                    ingredient_id=ingredient_id, block=block, postings=b''
+                )
+                for (ingredient_id, block), recipes in sorted(changes.items())
+                if any(count is not None for count in recipes.values())
+            ),
+            ignore_conflicts=True
+        )
+        rows = [
+            row for row in IngredientIndex.objects.select_for_update().filter(
+                ingredient_id__in={key[0] for key in changes},
+                block__in={key[1] for key in changes}
+            ).order_by('ingredient_id', 'block')
+            if (row.ingredient_id, row.block) in changes
+        ]
+        for row in rows:
+            postings = dict(decode(row.postings))
+            for recipe_id, count in changes[
+                row.ingredient_id, row.block
+            ].items():
+                if count is None:
+                    postings.pop(recipe_id, None)
+                else:
+                    postings[recipe_id] = count
+            row.postings, row.size = encode(postings), len(postings)
+        IngredientIndex.objects.bulk_update(rows, ('postings', 'size'))
+
+
+def update_recipes(previous):
+    # previous: id рецепта -> id ингредиентов, которые могли остаться в
+    # индексе от прежней версии. Текущий состав берётся из базы, поэтому
+    # повторный вызов ничего не меняет; скрытый или удалённый рецепт
+    # убирается из всех списков.
+    stored, current = defaultdict(set), defaultdict(set)
+    for recipe_id, ingredient_id, is_hidden in RecipeIngredient.objects.filter(
+        recipe_id__in=previous
+    ).values_list('recipe_id', 'ingredient_id', 'recipe__is_hidden'):
+        stored[recipe_id].add(ingredient_id)
+        if not is_hidden:
+            current[recipe_id].add(ingredient_id)
+    changes = defaultdict(dict)
+    for recipe_id, old_ingredient_ids in previous.items():
+        block = block_of(recipe_id)
+        new_ingredient_ids = current.get(recipe_id, set())
+        for ingredient_id in (
+            set(old_ingredient_ids) | stored.get(recipe_id, set())
+        ) - new_ingredient_ids:
+            changes[ingredient_id, block][recipe_id] = None
+        for ingredient_id in new_ingredient_ids:
+            changes[ingredient_id, block][recipe_id] = len(
+                new_ingredient_ids
+            )
+    _apply(changes)
+
+
+def remove_recipes(recipe_ids):
+    changes = defaultdict(dict)
+    for recipe_id, ingredient_id in RecipeIngredient.objects.filter(
+        recipe_id__in=set(recipe_ids)
+    ).values_list('recipe_id', 'ingredient_id'):
+        changes[ingredient_id, block_of(recipe_id)][recipe_id] = None
+    _apply(changes)
+
+
+def postings(ingredient_ids, blocks=None):
+    # Блоки одного ингредиента объединяются: id ингредиента -> список пар
+    # (id рецепта, число ингредиентов).
+    rows = IngredientIndex.objects.filter(ingredient_id__in=ingredient_ids)
+    if blocks is not None:
+        rows = rows.filter(block__in=blocks)
+    merged = defaultdict(list)
+    for ingredient_id, data in rows.values_list('ingredient_id', 'postings'):
+        merged[ingredient_id].extend(decode(data))
+    return merged
+
+
+def _matches(ingredient_ids):
+    # Списки раскодируются от самых редких ингредиентов, пока их общий
+    # размер не превысит PANTRY_MAX_POSTINGS; они дают кандидатов. У частых
+    # ингредиентов читаются только блоки кандидатов, так что рецепты только
+    # из частых ингредиентов в выдачу не попадают.
+    sizes = Counter()
+    for ingredient_id, size in IngredientIndex.objects.filter(
+        ingredient_id__in=ingredient_ids
+    ).values_list('ingredient_id', 'size'):
+        sizes[ingredient_id] += size
+    decoded, budget = [], PANTRY_MAX_POSTINGS
+    for ingredient_id in sorted(sizes, key=sizes.get):
+        if decoded and sizes[ingredient_id] > budget:
+            break
+        decoded.append(ingredient_id)
+        budget -= sizes[ingredient_id]
+    matched, totals = Counter(), {}
+    for pairs in postings(decoded).values():
+        for recipe_id, count in pairs:
+            matched[recipe_id] += 1
+            totals[recipe_id] = count
+    common = set(sizes).difference(decoded)
+    if common and matched:
+        for pairs in postings(
+            common, {block_of(recipe_id) for recipe_id in matched}
+        ).values():
+            for recipe_id, _ in pairs:
+                if recipe_id in matched:
+                    matched[recipe_id] += 1
+    return matched, totals
+
+
+def rank_recipes(ingredient_ids, limit, order='coverage', tags=None):
+    matched, totals = _matches(ingredient_ids)
+    if order == 'missing':
+        def key(recipe_id):
+            return (totals[recipe_id] - matched[recipe_id], -recipe_id)
+    else:
+        def key(recipe_id):
+            return (-matched[recipe_id] / totals[recipe_id], -recipe_id)
+    if not tags:
+        return [
+            (i, matched[i], totals[i] - matched[i])
+            for i in heapq.nsmallest(limit, matched, key=key)
+        ]
+    # Теги проверяются порциями кандидатов в порядке ранжирования, окно
+    # кандидатов расширяется, пока не наберётся limit рецептов.
+    top, checked, window = [], 0, limit * 4
+    while len(top) < limit:
+        candidates = heapq.nsmallest(window, matched, key=key)
+        for start in range(checked, len(candidates), TAG_CHECK_CHUNK_SIZE):
+            chunk = candidates[start:start + TAG_CHECK_CHUNK_SIZE]
+            allowed = set(Recipe.tags.through.objects.filter(
+                recipe_id__in=chunk, tag__slug__in=tags
+            ).values_list('recipe_id', flat=True))
+            top.extend(i for i in chunk if i in allowed)
+            if len(top) >= limit:
+                break
+        if len(candidates) < window:
+            break
+        checked, window = len(candidates), window * 4
+    return [(i, matched[i], totals[i] - matched[i]) for i in top[:limit]]
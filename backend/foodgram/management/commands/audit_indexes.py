@@ -0,0 +1,233 @@
+import json
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.http import QueryDict
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api.urls import router
+from foodgram.constants import EXPLAIN_MIN_ROWS
+from foodgram.models import Ingredient, Recipe, Tag
+
+User = get_user_model()
+
+# Дополнительные параметры запросов, чтобы проверить не только маршруты,
+# но и формы SQL, которые дают фильтры и сортировки.
+SAMPLE_QUERIES = {
+    'recipes-list': (
+        'author={author}',
+        'tags={tag}',
+        'tags={tag}&tags={tag}&tags_mode=all',
+        'is_favorited=1',
+        'is_in_shopping_cart=1',
+        'ordering=popular',
+        'ordering=trending',
+        'page=2',
+    ),
+    'recipes-by-ingredients': ('ingredients={ingredient}',),
+    'ingredients-list': ('name={prefix}',),
+    'users-list': ('search={username}',),
+    'users-subscriptions': ('recipes_limit=3',),
+}
+# Маршруты, которые без параметров по смыслу читают всю таблицу.
+FULL_SCAN_ROUTES = ('tags-list', 'ingredients-list')
+# Маршруты, которые сортируют уже сгруппированный результат: список
+# покупок складывает ингредиенты одного пользователя, и порядок по
+# названию после GROUP BY индексом не получить. Строк в сортировке — не
+# больше, чем ингредиентов в корзине.
+SORTED_AGGREGATE_ROUTES = ('recipes-download-shopping-cart',)
+
+
+def postgresql_problems(cursor, sql, analyze, min_rows, scans, sorts):
+    options = 'FORMAT JSON, ANALYZE' if analyze else 'FORMAT JSON'
+    cursor.execute(f'EXPLAIN ({options}) {sql}')
+    plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    nodes = [plan[0]['Plan']]
+    while nodes:
+        node = nodes.pop()
+        nodes.extend(node.get('Plans', ()))
+        rows = node.get('Actual Rows', node['Plan Rows'])
+        if rows < min_rows:
+            continue
+        if scans and node['Node Type'] == 'Seq Scan':
+            yield f'Seq Scan {node["Relation Name"]} (строк {rows})'
+        elif sorts and node['Node Type'] in ('Sort', 'Incremental Sort'):
+            keys = ', '.join(node.get('Sort Key', ()))
+            yield f'{node["Node Type"]} {keys} (строк {rows})'
+
+
+def sqlite_problems(cursor, sql, analyze, min_rows, scans, sorts):
+    tables = set(cursor.db.introspection.table_names(cursor))
+    cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+    details = [detail.split() for *_, detail in cursor.fetchall()]
+    # В планах SQLite нет оценок числа строк, поэтому размер запроса
+    # оценивается по самой большой из прочитанных таблиц.
+    rows = 0
+    for words in details:
+        if words[0] in ('SCAN', 'SEARCH') and words[1] in tables:
+            cursor.execute(f'SELECT COUNT(*) FROM "{words[1]}"')
+            rows = max(rows, cursor.fetchone()[0])
+    if rows < min_rows:
+        return
+    for words in details:
+        if sorts and words[:3] == ['USE', 'TEMP', 'B-TREE'] or (
+            scans and words[0] == 'SCAN' and words[1] in tables
+            and 'USING' not in words
+        ):
+            yield ' '.join(words)
+
+
+EXPLAINERS = {
+    'postgresql': postgresql_problems,
+    'sqlite': sqlite_problems,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Выполняет GET-маршруты API, получает планы всех сгенерированных '
+        'запросов через EXPLAIN и отмечает полные просмотры таблиц и '
+        'сортировки без индекса'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--analyze',
+            action='store_true',
+            help='Выполнять EXPLAIN ANALYZE (только PostgreSQL)'
+        )
+        parser.add_argument(
+            '--min-rows',
+            type=int,
+            default=EXPLAIN_MIN_ROWS,
+            help='Не отмечать просмотры и сортировки меньшего числа строк'
+        )
+        parser.add_argument(
+            '--user',
+            help='Email пользователя, от имени которого выполняются запросы'
+        )
+
+    def handle(self, *args, **options):
+        recipe = Recipe.objects.order_by('-pub_date').first()
+        ingredient = Ingredient.objects.filter(
+            ingredient_recipes__isnull=False
+        ).first()
+        tag = Tag.objects.first()
+        if recipe is None or ingredient is None or tag is None:
+            raise CommandError(
+                'Для проверки нужны рецепты, ингредиенты и теги'
+            )
+        user = (
+            User.objects.get(email=options['user']) if options['user']
+            else User.objects.filter(is_active=True).order_by('id').first()
+        )
+        self.values = {
+            'author': recipe.author_id,
+            'tag': tag.slug,
+            'ingredient': ingredient.id,
+            'prefix': ingredient.name[:3],
+            'username': recipe.author.username[:3],
+        }
+        self.factory = APIRequestFactory(SERVER_NAME=self._host())
+        self.user = user
+        self.seen = set()
+        flagged = []
+        for name, view, kwargs in self._routes():
+            for query in ('', *SAMPLE_QUERIES.get(name, ())):
+                problems = self._audit(
+                    view,
+                    reverse(name, kwargs=kwargs),
+                    QueryDict(query.format(**self.values)),
+                    kwargs,
+                    query or name not in FULL_SCAN_ROUTES,
+                    name not in SORTED_AGGREGATE_ROUTES,
+                    options
+                )
+                if problems:
+                    flagged.append(name)
+        if flagged:
+            raise CommandError(
+                'Найдены запросы без индексов: '
+                + ', '.join(sorted(set(flagged)))
+            )
+        self.stdout.write(self.style.SUCCESS('Проблемных планов не найдено'))
+
+    @staticmethod
+    def _host():
+        for host in settings.ALLOWED_HOSTS:
+            if host and host != '*':
+                return host.lstrip('.')
+        return 'localhost'
+
+    def _routes(self):
+        for _, viewset, basename in router.registry:
+            lookup = viewset.lookup_url_kwarg or viewset.lookup_field
+            for route in router.get_routes(viewset):
+                actions = router.get_method_map(viewset, route.mapping)
+                if 'get' not in actions:
+                    continue
+                kwargs = {}
+                if route.detail:
+                    kwargs[lookup] = viewset.queryset.order_by(
+                        'pk'
+                    ).values_list('pk', flat=True).last()
+                yield (
+                    route.name.format(basename=basename),
+                    viewset.as_view(
+                        {'get': actions['get']}, **route.initkwargs
+                    ),
+                    kwargs
+                )
+
+    def _audit(self, view, path, query, kwargs, scans, sorts, options):
+        request = self.factory.get(path, query)
+        force_authenticate(request, self.user)
+        with ExitStack() as stack:
+            captured = {
+                alias: stack.enter_context(
+                    CaptureQueriesContext(connections[alias])
+                )
+                for alias in connections
+            }
+            response = view(request, **kwargs)
+            if hasattr(response, 'render'):
+                response.render()
+        problems = []
+        total = 0
+        for alias, queries in captured.items():
+            connection = connections[alias]
+            explain = EXPLAINERS.get(connection.vendor)
+            if explain is None:
+                raise CommandError(
+                    f'EXPLAIN для {connection.vendor} не поддерживается'
+                )
+            total += len(queries)
+            for sql in {query['sql'] for query in queries}:
+                if not sql.startswith('SELECT') or sql in self.seen:
+                    continue
+                self.seen.add(sql)
+                with connection.cursor() as cursor:
+                    for problem in explain(
+                        cursor,
+                        sql,
+                        options['analyze'],
+                        options['min_rows'],
+                        scans,
+                        sorts
+                    ):
+                        problems.append((problem, sql))
+        self.stdout.write(
+            f'{response.status_code} {request.get_full_path()}: '
+            f'запросов {total}'
+        )
+        for problem, sql in problems:
+            self.stdout.write(self.style.WARNING(f'  {problem}'))
+            self.stdout.write(f'    {sql}')
+        return problems
@@ -0,0 +1,87 @@
+import http.client
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import cycle
+from urllib.parse import quote, urlsplit
+
+from django.core.management.base import BaseCommand
+
+DEFAULT_PATHS = (
+    '/api/recipes/',
+    '/api/recipes/?limit=24',
+    '/api/tags/',
+    '/api/ingredients/?name=са',
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагружает запущенный сервер (WSGI или ASGI) параллельными '
+        'GET-запросами и выводит пропускную способность и задержки'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url',
+            default='http://localhost:8000',
+            help='Адрес сервера'
+        )
+        parser.add_argument(
+            '--path',
+            action='append',
+            dest='paths',
+            help='Путь для запросов; можно указать несколько раз'
+        )
+        parser.add_argument('--concurrency', type=int, default=200)
+        parser.add_argument('--requests', type=int, default=5000)
+        parser.add_argument(
+            '--token',
+            help='Токен для заголовка Authorization'
+        )
+
+    def handle(self, *args, **options):
+        url = urlsplit(options['url'])
+        paths = cycle(options['paths'] or DEFAULT_PATHS)
+        headers = {'Connection': 'keep-alive'}
+        if options['token']:
+            headers['Authorization'] = f'Token {options["token"]}'
+        local = threading.local()
+
+        def fetch(path):
+            if not hasattr(local, 'connection'):
+                local.connection = http.client.HTTPConnection(
+                    url.hostname, url.port or 80, timeout=30
+                )
+            started = time.perf_counter()
+            try:
+                local.connection.request('GET', path, headers=headers)
+                response = local.connection.getresponse()
+                response.read()
+                status = response.status
+            except (OSError, http.client.HTTPException):
+                local.connection.close()
+                del local.connection
+                status = None
+            return status, time.perf_counter() - started
+
+        batch = [
+            quote(next(paths), safe='/?=&') for _ in range(options['requests'])
+        ]
+        started = time.perf_counter()
+        with ThreadPoolExecutor(options['concurrency']) as executor:
+            results = list(executor.map(fetch, batch))
+        elapsed = time.perf_counter() - started
+        latencies = sorted(latency for _, latency in results)
+        errors = sum(1 for status, _ in results if status != 200)
+        quantiles = statistics.quantiles(latencies, n=100)
+        self.stdout.write(
+            f'Запросов: {len(results)}, ошибок: {errors}, '
+            f'конкурентность: {options["concurrency"]}\n'
+            f'Пропускная способность: {len(results) / elapsed:.0f} запр/с\n'
+            f'Задержка, мс: p50 {quantiles[49] * 1000:.1f}, '
+            f'p95 {quantiles[94] * 1000:.1f}, '
+            f'p99 {quantiles[98] * 1000:.1f}, '
+            f'max {latencies[-1] * 1000:.1f}'
+        )
@@ -0,0 +1,90 @@
+import base64
+import io
+import json
+import timeit
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from api.parsers import FastJSONParser
+from api.renderers import FastJSONRenderer, orjson
+from api.serializers import IngredientSerializer, RecipeReadSerializer
+from foodgram.models import Ingredient, Recipe
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает стандартные и быстрые JSON-рендерер и парсер '
+        'на реальных данных рецептов'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recipes',
+            type=int,
+            default=100,
+            help='Количество рецептов в рендеримой странице'
+        )
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument(
+            '--image-size',
+            type=int,
+            default=2 * 1024 * 1024,
+            help='Размер картинки в теле запроса на создание рецепта, байт'
+        )
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stdout.write(self.style.WARNING(
+                'orjson не установлен, быстрые классы используют stdlib'
+            ))
+        request = RequestFactory().get('/api/recipes/')
+        request.user = AnonymousUser()
+        recipes = Recipe.objects.for_user(request.user).prefetch_related(
+            'tags', 'recipe_ingredients__ingredient'
+        )[:options['recipes']]
+        payloads = {
+            'recipes': {'results': RecipeReadSerializer(
+                recipes, many=True, context={'request': request}
+            ).data},
+            'ingredients': IngredientSerializer(
+                Ingredient.objects.all(), many=True
+            ).data,
+        }
+        for name, data in payloads.items():
+            self._compare(
+                name,
+                lambda: JSONRenderer().render(data),
+                lambda: FastJSONRenderer().render(data),
+                options['repeat']
+            )
+        body = json.dumps({
+            'name': 'Рецепт',
+            'text': 'Описание ' * 200,
+            'cooking_time': 10,
+            'tags': [1, 2],
+            'ingredients': [{'id': i, 'amount': 10} for i in range(1, 20)],
+            'image': 'data:image/png;base64,' + base64.b64encode(
+                b'\0' * options['image_size']
+            ).decode(),
+        }, ensure_ascii=False).encode()
+        self._compare(
+            'parse',
+            lambda: JSONParser().parse(io.BytesIO(body)),
+            lambda: FastJSONParser().parse(io.BytesIO(body)),
+            options['repeat']
+        )
+
+    def _compare(self, name, baseline, fast, repeat):
+        if baseline() != fast():
+            raise CommandError(f'{name}: результаты различаются')
+        baseline_time = timeit.timeit(baseline, number=repeat) / repeat
+        fast_time = timeit.timeit(fast, number=repeat) / repeat
+        self.stdout.write(
+            f'{name}: stdlib {baseline_time * 1000:.2f} мс, '
+            f'fast {fast_time * 1000:.2f} мс, '
+            f'x{baseline_time / fast_time:.1f}'
+        )
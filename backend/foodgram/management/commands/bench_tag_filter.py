@@ -0,0 +1,87 @@
+import timeit
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.http import QueryDict
+
+from api.filters import RecipeFilter
+from foodgram.constants import DEFAULT_PAGE_SIZE
+from foodgram.models import Recipe, Tag
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает фильтрацию рецептов по 1–5 тегам через JOIN с distinct '
+        'и через EXISTS в режимах any и all'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-tags', type=int, default=5)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument(
+            '--page-size',
+            type=int,
+            default=DEFAULT_PAGE_SIZE,
+            help='Размер первой страницы, которую получает каждый запрос'
+        )
+
+    def handle(self, *args, **options):
+        tags = list(
+            Tag.objects.annotate(size=Count('recipe')).order_by('-size')
+            [:options['max_tags']]
+        )
+        if not tags:
+            raise CommandError('В базе нет тегов')
+        self.stdout.write(f'Рецептов: {Recipe.objects.count()}')
+        for count in range(1, len(tags) + 1):
+            selected = tags[:count]
+            for mode in ('any', 'all'):
+                joined = self._joined(selected, mode)
+                exists = self._exists(selected, mode)
+                self._compare(
+                    f'{count} тег(ов), {mode}', joined, exists, options
+                )
+
+    @staticmethod
+    def _joined(tags, mode):
+        queryset = Recipe.objects.order_by('-pub_date')
+        if mode == 'any':
+            return queryset.filter(tags__in=tags).distinct()
+        for tag in tags:
+            queryset = queryset.filter(tags=tag)
+        return queryset.distinct()
+
+    @staticmethod
+    def _exists(tags, mode):
+        params = QueryDict(mutable=True)
+        params.setlist('tags', [tag.slug for tag in tags])
+        params['tags_mode'] = mode
+        request = type('Request', (), {'user': AnonymousUser()})()
+        filterset = RecipeFilter(
+            params,
+            queryset=Recipe.objects.order_by('-pub_date'),
+            request=request
+        )
+        if not filterset.is_valid():
+            raise CommandError(str(filterset.errors))
+        return filterset.qs
+
+    def _compare(self, name, joined, exists, options):
+        page_size, repeat = options['page_size'], options['repeat']
+
+        def run(queryset):
+            return (
+                queryset.count(),
+                list(queryset.values_list('id', flat=True)[:page_size])
+            )
+
+        if run(joined) != run(exists):
+            raise CommandError(f'{name}: результаты различаются')
+        joined_time = timeit.timeit(lambda: run(joined), number=repeat)
+        exists_time = timeit.timeit(lambda: run(exists), number=repeat)
+        self.stdout.write(
+            f'{name}: найдено {run(exists)[0]}, '
+            f'JOIN {joined_time / repeat * 1000:.2f} мс, '
+            f'EXISTS {exists_time / repeat * 1000:.2f} мс'
+        )
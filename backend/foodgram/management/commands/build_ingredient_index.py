@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from foodgram.ingredient_index import rebuild
+
+
+class Command(BaseCommand):
+    help = (
+        'Перестраивает обратный индекс «ингредиент -> рецепты» '
+        'для поиска по имеющимся продуктам'
+    )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        ingredients = rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Проиндексировано ингредиентов: {ingredients} '
+            f'за {time.monotonic() - started:.1f} с'
+        ))
@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from foodgram.constants import SIMILAR_RECIPES_COUNT, SIMILARITY_BLOCK_SIZE
+from foodgram.similarity import rebuild
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает похожие рецепты по общим ингредиентам и тегам '
+        '(косинусная близость векторов tf-idf)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--count',
+            type=int,
+            default=SIMILAR_RECIPES_COUNT,
+            help='Количество похожих рецептов для каждого рецепта'
+        )
+        parser.add_argument(
+            '--block-size',
+            type=int,
+            default=SIMILARITY_BLOCK_SIZE,
+            help='Количество строк матрицы, обрабатываемых за раз'
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        for processed, total, stored in rebuild(
+            options['count'], options['block_size']
+        ):
+            self.stdout.write(
+                f'Обработано рецептов: {processed}/{total}, '
+                f'сохранено пар: {stored}, '
+                f'{time.monotonic() - started:.1f} с'
+            )
+        self.stdout.write(self.style.SUCCESS('Похожие рецепты пересчитаны'))
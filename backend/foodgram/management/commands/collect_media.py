@@ -0,0 +1,171 @@
+import os
+import shutil
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from foodgram.constants import MEDIA_GC_BATCH_SIZE, MEDIA_GC_MIN_AGE_HOURS
+from foodgram.models import Recipe, User
+
+# Поля с файлами: каталог каждого поля обходится и сверяется с таблицей.
+MEDIA_FIELDS = (
+    (Recipe, 'image'),
+    (User, 'avatar'),
+)
+SCAN_TABLE = 'media_gc_files'
+
+
+class Command(BaseCommand):
+    help = (
+        'Находит в MEDIA_ROOT файлы картинок рецептов и аватаров, на которые '
+        'не ссылается ни одна запись, и удаляет их или переносит в карантин'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать лишние файлы, ничего не удаляя'
+        )
+        parser.add_argument(
+            '--quarantine',
+            help='Переносить лишние файлы в этот каталог вместо удаления'
+        )
+        parser.add_argument(
+            '--min-age',
+            type=float,
+            default=MEDIA_GC_MIN_AGE_HOURS,
+            help=(
+                'Не трогать файлы моложе указанного числа часов: картинка '
+                'сохраняется раньше, чем фиксируется ссылающаяся запись'
+            )
+        )
+        parser.add_argument(
+            '--rate',
+            type=float,
+            help='Удалять не больше указанного количества файлов в секунду'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=MEDIA_GC_BATCH_SIZE,
+            help='Количество имён файлов, записываемых в базу за раз'
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        # Имена файлов складываются во временную таблицу порциями, а
+        # лишние находятся одним антисоединением в базе, поэтому память
+        # не зависит от числа файлов.
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {SCAN_TABLE}')
+            cursor.execute(
+                f'CREATE TEMPORARY TABLE {SCAN_TABLE} '
+                '(name varchar(255) PRIMARY KEY)'
+            )
+            try:
+                scanned = self._scan(
+                    cursor,
+                    time.time() - options['min_age'] * 60 * 60,
+                    options['batch_size']
+                )
+                removed = self._remove(self._orphans(), options)
+            finally:
+                cursor.execute(f'DROP TABLE IF EXISTS {SCAN_TABLE}')
+        action = (
+            'Найдено лишних файлов' if options['dry_run']
+            else 'Перенесено в карантин' if options['quarantine']
+            else 'Удалено файлов'
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Проверено файлов: {scanned}, {action.lower()}: {removed} '
+            f'за {time.monotonic() - started:.1f} с'
+        ))
+
+    @staticmethod
+    def _walk(directory):
+        directories = [directory]
+        while directories:
+            with os.scandir(directories.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        directories.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        yield entry
+
+    def _scan(self, cursor, max_mtime, batch_size):
+        scanned = 0
+        batch = []
+        for model, field in MEDIA_FIELDS:
+            directory = os.path.join(
+                settings.MEDIA_ROOT,
+                model._meta.get_field(field).upload_to
+            )
+            if not os.path.isdir(directory):
+                continue
+            for entry in self._walk(directory):
+                scanned += 1
+                if entry.stat(follow_symlinks=False).st_mtime > max_mtime:
+                    continue
+                batch.append(
+                    (os.path.relpath(entry.path, settings.MEDIA_ROOT),)
+                )
+                if len(batch) >= batch_size:
+                    self._insert(cursor, batch)
+                    batch = []
+        self._insert(cursor, batch)
+        return scanned
+
+    @staticmethod
+    def _insert(cursor, batch):
+        if batch:
+            cursor.executemany(
+                f'INSERT INTO {SCAN_TABLE} (name) VALUES (%s)', batch
+            )
+
+    @staticmethod
+    def _orphans():
+        conditions = []
+        for model, field in MEDIA_FIELDS:
+            quote = connection.ops.quote_name
+            conditions.append(
+                f'NOT EXISTS (SELECT 1 FROM {quote(model._meta.db_table)} '
+                f'WHERE {quote(model._meta.get_field(field).column)} = '
+                f'{SCAN_TABLE}.name)'
+            )
+        # Курсор с порционной выборкой: на PostgreSQL строки читаются с
+        # сервера по мере обработки.
+        with connection.chunked_cursor() as cursor:
+            cursor.execute(
+                f'SELECT name FROM {SCAN_TABLE} '
+                f'WHERE {" AND ".join(conditions)}'
+            )
+            while rows := cursor.fetchmany(MEDIA_GC_BATCH_SIZE):
+                for name, in rows:
+                    yield name
+
+    def _remove(self, names, options):
+        started = time.monotonic()
+        removed = 0
+        for name in names:
+            path = os.path.join(settings.MEDIA_ROOT, name)
+            if options['dry_run']:
+                self.stdout.write(name)
+            elif not os.path.exists(path):
+                continue
+            elif options['quarantine']:
+                target = os.path.join(options['quarantine'], name)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                shutil.move(path, target)
+            else:
+                os.remove(path)
+            removed += 1
+            if options['rate'] and not options['dry_run']:
+                delay = removed / options['rate'] - (
+                    time.monotonic() - started
+                )
+                if delay > 0:
+                    time.sleep(delay)
+        return removed
@@ -0,0 +1,66 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from foodgram import outbox
+from foodgram.constants import OUTBOX_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = (
+        'Доставляет накопленные события outbox обработчикам; в режиме '
+        '--loop работает отдельным процессом, если доставка в веб-воркерах '
+        'не включена через OUTBOX_INLINE'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=OUTBOX_BATCH_SIZE,
+            help='Количество событий, доставляемых в одной транзакции'
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Не завершаться, а ждать новые события'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=1,
+            help='Пауза между проверками в режиме --loop, секунд'
+        )
+        parser.add_argument(
+            '--retry-dead',
+            action='store_true',
+            help='Вернуть в очередь события, исчерпавшие попытки доставки'
+        )
+
+    def handle(self, *args, **options):
+        if options['retry_dead']:
+            self.stdout.write(
+                f'Возвращено в очередь: {outbox.retry_dead_letters()}'
+            )
+        started = time.monotonic()
+        processed = 0
+        while True:
+            events = outbox.dispatch(options['batch_size'])
+            if events:
+                processed += events
+                self.stdout.write(f'Доставлено событий: {events}')
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано событий: {processed} за {elapsed:.1f} с '
+            f'({processed / max(elapsed, 1e-9):.0f} в секунду)'
+        ))
+        dead = outbox.dead_letters().count()
+        if dead:
+            self.stdout.write(self.style.ERROR(
+                f'Недоставленных событий: {dead}, повторить: '
+                'dispatch_outbox --retry-dead'
+            ))
@@ -0,0 +1,225 @@
+import json
+import os
+import sys
+
+from django.core.management.base import BaseCommand
+from django.db.models import Prefetch
+
+from foodgram.constants import EXPORT_CHUNK_SIZE, JSON_READ_CHUNK_SIZE
+from foodgram.models import (Favorite, Recipe, RecipeIngredient, ShoppingCart,
+                             Subscription)
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает рецепты с ингредиентами, тегами и ссылками на авторов '
+        'в NDJSON; опционально избранное, списки покупок и подписки'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output',
+            help=(
+                'Файл для выгрузки; если он уже есть, выгрузка продолжается '
+                'после последней записи. По умолчанию stdout'
+            )
+        )
+        parser.add_argument(
+            '--start-id',
+            type=int,
+            help=(
+                'Минимальный id рецепта (и подписки) включительно; если '
+                'в файле --output уже есть записи из диапазона, выгрузка '
+                'продолжается после последней'
+            )
+        )
+        parser.add_argument(
+            '--end-id',
+            type=int,
+            help='Максимальный id рецепта (и подписки) включительно'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=EXPORT_CHUNK_SIZE,
+            help='Размер порции серверного курсора'
+        )
+        parser.add_argument(
+            '--with-relations',
+            action='store_true',
+            help='Выгружать избранное и списки покупок'
+        )
+        parser.add_argument(
+            '--with-subscriptions',
+            action='store_true',
+            help='Выгружать подписки'
+        )
+
+    def handle(self, *args, **options):
+        start_id, end_id = options['start_id'], options['end_id']
+        last_ids = {}
+        if options['output'] and os.path.exists(options['output']):
+            last_ids = self._resume(options['output'])
+        ranges = {}
+        for record_type in ('recipe', 'subscription'):
+            # Выгрузка диапазона продолжается после последней записи этого
+            # диапазона; записи других диапазонов в файле её не сдвигают.
+            after = start_id - 1 if start_id is not None else None
+            last_id = last_ids.get(record_type)
+            if last_id is not None and (
+                after is None or after <= last_id
+            ) and (end_id is None or last_id <= end_id):
+                after = last_id
+            ranges[record_type] = {}
+            if after is not None:
+                ranges[record_type]['id__gt'] = after
+            if end_id is not None:
+                ranges[record_type]['id__lte'] = end_id
+        output = (
+            open(options['output'], 'a', encoding='utf-8')
+            if options['output'] else sys.stdout
+        )
+        try:
+            recipes = self._export_recipes(
+                output, ranges['recipe'], options['chunk_size'],
+                options['with_relations']
+            )
+            subscriptions = 0
+            if options['with_subscriptions']:
+                subscriptions = self._export_subscriptions(
+                    output, ranges['subscription'], options['chunk_size']
+                )
+        finally:
+            if output is not sys.stdout:
+                output.close()
+        self.stderr.write(
+            self.style.SUCCESS(
+                f'Выгружено рецептов: {recipes}, подписок: {subscriptions}'
+            )
+        )
+
+    @staticmethod
+    def _resume(path):
+        # Прерванная выгрузка могла оставить недописанную строку: файл
+        # обрезается до последнего перевода строки, затем с конца читаются
+        # последние id каждого типа. Рецепты выгружаются раньше подписок,
+        # поэтому чтение заканчивается на первом найденном рецепте.
+        last_ids = {}
+        with open(path, 'rb+') as f:
+            position = f.seek(0, os.SEEK_END)
+            while position:
+                size = min(JSON_READ_CHUNK_SIZE, position)
+                position -= size
+                f.seek(position)
+                newline = f.read(size).rfind(b'\n')
+                if newline != -1:
+                    position += newline + 1
+                    break
+            f.truncate(position)
+            tail = b''
+            while position and 'recipe' not in last_ids:
+                size = min(JSON_READ_CHUNK_SIZE, position)
+                position -= size
+                f.seek(position)
+                lines = (f.read(size) + tail).split(b'\n')
+                tail = lines.pop(0) if position else b''
+                for line in reversed(lines):
+                    if not line.strip():
+                        continue
+                    record = json.loads(line)
+                    last_ids.setdefault(record['type'], record['id'])
+                    if record['type'] == 'recipe':
+                        break
+        return last_ids
+
+    @staticmethod
+    def _write(output, record):
+        output.write(json.dumps(record, ensure_ascii=False))
+        output.write('\n')
+
+    def _export_recipes(self, output, id_range, chunk_size, with_relations):
+        recipes = (
+            Recipe.objects
+            .filter(**id_range)
+            .select_related('author')
+            .only(
+                'id', 'name', 'image', 'text', 'cooking_time', 'pub_date',
+                'author__email'
+            )
+            .prefetch_related(
+                'tags',
+                Prefetch(
+                    'recipe_ingredients',
+                    queryset=RecipeIngredient.objects.select_related(
+                        'ingredient'
+                    )
+                )
+            )
+            .order_by('id')
+        )
+        if with_relations:
+            recipes = recipes.prefetch_related(
+                Prefetch(
+                    'favorites',
+                    queryset=Favorite.objects.select_related('user').only(
+                        'recipe_id', 'user__email'
+                    )
+                ),
+                Prefetch(
+                    'shoppingcarts',
+                    queryset=ShoppingCart.objects.select_related('user').only(
+                        'recipe_id', 'user__email'
+                    )
+                )
+            )
+        count = 0
+        for recipe in recipes.iterator(chunk_size=chunk_size):
+            record = {
+                'type': 'recipe',
+                'id': recipe.id,
+                'author': recipe.author.email,
+                'name': recipe.name,
+                'image': recipe.image.name,
+                'text': recipe.text,
+                'cooking_time': recipe.cooking_time,
+                'pub_date': recipe.pub_date.isoformat(),
+                'tags': [tag.slug for tag in recipe.tags.all()],
+                'ingredients': [
+                    {
+                        'name': item.ingredient.name,
+                        'measurement_unit': item.ingredient.measurement_unit,
+                        'amount': item.amount,
+                    }
+                    for item in recipe.recipe_ingredients.all()
+                ],
+            }
+            if with_relations:
+                record['favorited_by'] = [
+                    favorite.user.email for favorite in recipe.favorites.all()
+                ]
+                record['in_shopping_cart_of'] = [
+                    cart.user.email for cart in recipe.shoppingcarts.all()
+                ]
+            self._write(output, record)
+            count += 1
+        return count
+
+    def _export_subscriptions(self, output, id_range, chunk_size):
+        subscriptions = (
+            Subscription.objects
+            .filter(**id_range)
+            .values_list('id', 'user__email', 'author__email')
+            .order_by('id')
+        )
+        count = 0
+        for subscription_id, user, author in subscriptions.iterator(
+            chunk_size=chunk_size
+        ):
+            self._write(output, {
+                'type': 'subscription',
+                'id': subscription_id,
+                'user': user,
+                'author': author,
+            })
+            count += 1
+        return count
@@ -0,0 +1,78 @@
+import json
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.serializers import create_recipes
+from foodgram.constants import RECIPE_IMPORT_BATCH_SIZE
+from foodgram.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Создаёт рецепты партнёра из NDJSON в формате POST /api/recipes/ '
+        'пачками; ошибочные записи пропускаются и выводятся'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл NDJSON, по рецепту в строке')
+        parser.add_argument(
+            '--author',
+            required=True,
+            help='Email пользователя, от имени которого создаются рецепты'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=RECIPE_IMPORT_BATCH_SIZE,
+            help='Количество рецептов, проверяемых и создаваемых за раз'
+        )
+
+    def handle(self, *args, **options):
+        if not os.path.exists(options['path']):
+            raise CommandError(f'Файл не найден: {options["path"]}')
+        try:
+            self.author = User.objects.get(email=options['author'])
+        except User.DoesNotExist:
+            raise CommandError(
+                f'Пользователь не найден: {options["author"]}'
+            )
+        started = time.monotonic()
+        self.created = self.failed = 0
+        batch = []
+        with open(options['path'], encoding='utf-8') as f:
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    batch.append((line_number, json.loads(line)))
+                except json.JSONDecodeError as error:
+                    self._report(line_number, str(error))
+                    continue
+                if len(batch) >= options['batch_size']:
+                    self._flush(batch)
+                    batch = []
+        if batch:
+            self._flush(batch)
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано рецептов: {self.created}, с ошибками: {self.failed} '
+            f'за {time.monotonic() - started:.1f} с'
+        ))
+
+    def _flush(self, batch):
+        created, errors = create_recipes(
+            [record for _, record in batch], self.author, {}
+        )
+        for error in errors:
+            self._report(batch[error['index']][0], error['errors'])
+        self.created += len(created)
+        self.stdout.write(
+            f'Строки до {batch[-1][0]}: создано {len(created)}'
+        )
+
+    def _report(self, line_number, errors):
+        self.failed += 1
+        self.stdout.write(self.style.WARNING(
+            f'Строка {line_number}: {json.dumps(errors, ensure_ascii=False)}'
+        ))
@@ -1,56 +1,215 @@
 import csv
+import io
+import json
 import os
+import time
+from itertools import islice
 
 from django.conf import settings
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
 
+from foodgram.constants import IMPORT_BATCH_SIZE, JSON_READ_CHUNK_SIZE
 from foodgram.models import Ingredient
 
+FORMATS_BY_EXTENSION = {
+    '.csv': 'csv',
+    '.json': 'json',
+    '.ndjson': 'ndjson',
+    '.jsonl': 'ndjson',
+}
+
+
+def read_csv(file):
+    yield from csv.reader(file)
+
+
+def read_json(file):
+    decoder = json.JSONDecoder()
+    buffer = file.read(JSON_READ_CHUNK_SIZE).lstrip()
+    if not buffer.startswith('['):
+        raise CommandError('Ожидается JSON-массив объектов')
+    buffer = buffer[1:]
+    while True:
+        buffer = buffer.lstrip().removeprefix(',').lstrip()
+        if buffer.startswith(']'):
+            return
+        try:
+            item, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            chunk = file.read(JSON_READ_CHUNK_SIZE)
+            if not chunk:
+                raise CommandError('Некорректный JSON: массив не закрыт')
+            buffer += chunk
+            continue
+        yield item
+        buffer = buffer[end:]
+
+
+def read_ndjson(file):
+    for line in file:
+        if line.strip():
+            yield json.loads(line)
+
+
+READERS = {
+    'csv': read_csv,
+    'json': read_json,
+    'ndjson': read_ndjson,
+}
+
+
+def to_row(item):
+    if isinstance(item, dict):
+        item = (item.get('name'), item.get('measurement_unit'))
+    if not isinstance(item, (list, tuple)) or len(item) != 2:
+        return None
+    name, unit = item
+    if not isinstance(name, str) or not isinstance(unit, str):
+        return None
+    name, unit = name.strip(), unit.strip()
+    if not name or not unit:
+        return None
+    return name, unit
+
+
+def deduplicate(rows):
+    # Ключ совпадает с LOWER() в уникальном индексе, иначе PostgreSQL
+    # отклонит пакет, в котором одна строка конфликтует дважды.
+    unique = {}
+    for name, unit in rows:
+        unique[(name.lower(), unit.lower())] = (name, unit)
+    return list(unique.values())
+
 
 class Command(BaseCommand):
-    help = 'Загружает ингредиенты из backend/data/ingredients.csv'
+    help = (
+        'Загружает ингредиенты из CSV, JSON или NDJSON '
+        '(по умолчанию backend/data/ingredients.csv)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            nargs='?',
+            default=os.path.join(settings.BASE_DIR, 'data', 'ingredients.csv'),
+            help='Путь к файлу с ингредиентами'
+        )
+        parser.add_argument(
+            '--format',
+            choices=READERS,
+            help='Формат файла; по умолчанию определяется по расширению'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=IMPORT_BATCH_SIZE,
+            help='Количество строк в одной записи в базу'
+        )
+        parser.add_argument(
+            '--update',
+            action='store_true',
+            help=(
+                'Перезаписывать написание существующих ингредиентов, '
+                'совпадающих без учёта регистра'
+            )
+        )
 
-    def handle(self, *args, **kwargs):
-        data_path = os.path.join(settings.BASE_DIR, 'data')
-        file_path = os.path.join(data_path, 'ingredients.csv')
+    def handle(self, *args, **options):
+        file_path = options['path']
         if not os.path.exists(file_path):
             self.stdout.write(self.style.ERROR(f'Файл не найден: {file_path}'))
             return
-        with open(file_path, encoding='utf-8') as f:
-            reader = csv.reader(f)
-            ingredients_to_add = []
-            existing = set(
-                (name.lower(), unit.lower())
-                for name, unit in Ingredient.objects.values_list(
-                    'name', 'measurement_unit'
-                )
+        file_format = options['format'] or FORMATS_BY_EXTENSION.get(
+            os.path.splitext(file_path)[1].lower()
+        )
+        if file_format is None:
+            raise CommandError(
+                'Не удалось определить формат файла, укажите --format'
             )
-            for row in reader:
-                if len(row) != 2:
-                    self.stdout.write(
-                        self.style.WARNING(f'Пропущена строка: {row}')
-                    )
-                    continue
-                name, unit = row[0].strip(), row[1].strip()
-                if (
-                    name
-                    and unit
-                    and (name.lower(), unit.lower()) not in existing
-                ):
-                    ingredients_to_add.append(
-                        Ingredient(name=name, measurement_unit=unit)
-                    )
-        if ingredients_to_add:
-            Ingredient.objects.bulk_create(
-                ingredients_to_add,
-                ignore_conflicts=True
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть положительным')
+        write_batch = {
+            'postgresql': self._write_batch_postgresql,
+            'sqlite': self._write_batch_sqlite,
+        }.get(connection.vendor)
+        if write_batch is None:
+            raise CommandError(
+                f'Импорт не поддерживается для {connection.vendor}'
             )
+        table = connection.ops.quote_name(Ingredient._meta.db_table)
+        on_conflict = (
+            'UPDATE SET name = excluded.name, '
+            'measurement_unit = excluded.measurement_unit, '
+            'updated_at = CURRENT_TIMESTAMP '
+            f'WHERE {table}.name != excluded.name '
+            f'OR {table}.measurement_unit != excluded.measurement_unit'
+            if options['update'] else 'NOTHING'
+        )
+        insert_sql = (
+            f'INSERT INTO {table} (name, measurement_unit) {{source}} '
+            'ON CONFLICT (LOWER(name), LOWER(measurement_unit)) '
+            f'DO {on_conflict}'
+        )
+        processed = written = 0
+        started = time.monotonic()
+        with open(file_path, encoding='utf-8', newline='') as f:
+            rows = self._clean(READERS[file_format](f))
+            while batch := list(islice(rows, options['batch_size'])):
+                processed += len(batch)
+                with transaction.atomic():
+                    written += write_batch(insert_sql, deduplicate(batch))
+                elapsed = time.monotonic() - started
+                self.stdout.write(
+                    f'Обработано {processed} строк, записано {written} '
+                    f'({processed / max(elapsed, 1e-9):.0f} строк/с)'
+                )
+        if written:
             self.stdout.write(
                 self.style.SUCCESS(
-                    f'Загружено {len(ingredients_to_add)} ингредиентов'
+                    f'Загружено {written} ингредиентов '
+                    f'за {time.monotonic() - started:.1f} с'
                 )
             )
         else:
             self.stdout.write(
                 self.style.WARNING('Новых ингредиентов не найдено')
             )
+
+    def _clean(self, items):
+        for item in items:
+            row = to_row(item)
+            if row is None:
+                self.stdout.write(
+                    self.style.WARNING(f'Пропущена строка: {item}')
+                )
+                continue
+            yield row
+
+    @staticmethod
+    def _write_batch_postgresql(insert_sql, rows):
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        buffer.seek(0)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE TEMP TABLE IF NOT EXISTS ingredient_import '
+                '(name text, measurement_unit text) ON COMMIT DELETE ROWS'
+            )
+            cursor.copy_expert(
+                'COPY ingredient_import (name, measurement_unit) '
+                'FROM STDIN WITH (FORMAT csv)',
+                buffer
+            )
+            cursor.execute(insert_sql.format(
+                source='SELECT name, measurement_unit FROM ingredient_import'
+            ))
+            return cursor.rowcount
+
+    @staticmethod
+    def _write_batch_sqlite(insert_sql, rows):
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                insert_sql.format(source='VALUES (%s, %s)'), rows
+            )
+            return cursor.rowcount
@@ -0,0 +1,136 @@
+import json
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from foodgram.constants import STARTUP_TIME_BUDGET
+
+# Код, который выполняет процесс до готовности: manage.py настраивает
+# Django, воркер gunicorn дополнительно загружает URLConf со всеми вьюхами.
+TARGETS = {
+    'manage': 'import django\ndjango.setup()',
+    'wsgi': (
+        'from foodgram_backend.wsgi import application\n'
+        'from django.urls import get_resolver\n'
+        'get_resolver().url_patterns'
+    ),
+}
+
+PROBE = '''
+import json, os, resource, sys, time, tracemalloc
+if {memory}:
+    tracemalloc.start()
+started = time.perf_counter()
+{code}
+result = {{
+    'seconds': time.perf_counter() - started,
+    'rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+    'memory': {{}},
+}}
+if {memory}:
+    roots = sorted(
+        [os.getcwd(), *filter(None, sys.path)], key=len, reverse=True
+    )
+    for stat in tracemalloc.take_snapshot().statistics('filename'):
+        name = stat.traceback[0].filename
+        root = next((root for root in roots if name.startswith(root)), '')
+        package = name[len(root):].lstrip('/').split('/')[0]
+        package = package.removesuffix('.py') or name
+        memory = result['memory']
+        memory[package] = memory.get(package, 0) + stat.size
+print(json.dumps(result))
+'''
+
+
+class Command(BaseCommand):
+    help = (
+        'Измеряет время запуска и память manage.py и воркера WSGI в '
+        'отдельных процессах и показывает самые тяжёлые пакеты'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--target',
+            action='append',
+            dest='targets',
+            choices=TARGETS,
+            help='Точка входа для измерения (по умолчанию все)'
+        )
+        parser.add_argument('--top', type=int, default=15)
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=3,
+            help='Количество холодных запусков; берётся лучшее время'
+        )
+        parser.add_argument(
+            '--budget',
+            type=float,
+            default=STARTUP_TIME_BUDGET,
+            help='Допустимое время запуска, секунд'
+        )
+
+    def handle(self, *args, **options):
+        failed = []
+        for target in options['targets'] or TARGETS:
+            code = TARGETS[target]
+            runs = [
+                self._probe(code, memory=False)
+                for _ in range(options['repeat'])
+            ]
+            best = min(runs, key=lambda run: run[0]['seconds'])
+            result, import_times = best
+            memory = self._probe(code, memory=True)[0]['memory']
+            status = 'OK'
+            if result['seconds'] > options['budget']:
+                status = 'ПРЕВЫШЕН'
+                failed.append(target)
+            self.stdout.write(
+                f'{target}: {result["seconds"]:.2f} с '
+                f'(бюджет {options["budget"]:.2f} с) {status}, '
+                f'RSS {result["rss"] / 2 ** 20:.1f} МБ'
+            )
+            packages = sorted(
+                set(import_times) | set(memory),
+                key=lambda name: import_times.get(name, 0),
+                reverse=True
+            )[:options['top']]
+            for package in packages:
+                self.stdout.write(
+                    f'  {package:<32} '
+                    f'{import_times.get(package, 0) / 1000:8.1f} мс '
+                    f'{memory.get(package, 0) / 2 ** 10:10.1f} КБ'
+                )
+        if failed:
+            raise CommandError(
+                f'Превышено время запуска: {", ".join(failed)}'
+            )
+
+    @staticmethod
+    def _probe(code, memory):
+        process = subprocess.run(
+            [
+                sys.executable,
+                *(() if memory else ('-X', 'importtime')),
+                '-c',
+                PROBE.format(code=code, memory=memory),
+            ],
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            text=True
+        )
+        if process.returncode:
+            raise CommandError(process.stderr)
+        # Собственное время импорта модулей суммируется по пакетам
+        # верхнего уровня.
+        import_times = defaultdict(int)
+        for line in process.stderr.splitlines():
+            if not line.startswith('import time:'):
+                continue
+            own, _, module = line.split(':', 1)[1].split('|')
+            if own.strip().isdigit():
+                import_times[module.strip().split('.')[0]] += int(own)
+        return json.loads(process.stdout.splitlines()[-1]), import_times
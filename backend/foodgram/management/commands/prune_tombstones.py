@@ -0,0 +1,40 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from foodgram.constants import IMPORT_BATCH_SIZE
+from foodgram.models import Tombstone
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет записи об удалённых объектах старше срока хранения '
+        'токенов синхронизации'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=settings.SYNC_TOMBSTONE_RETENTION_DAYS,
+            help='Срок хранения, дней'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=IMPORT_BATCH_SIZE,
+            help='Количество записей, удаляемых одним запросом'
+        )
+
+    def handle(self, *args, **options):
+        border = timezone.now() - timedelta(days=options['days'])
+        deleted = 0
+        while ids := list(
+            Tombstone.objects.filter(deleted_at__lt=border)
+            .order_by('id')
+            .values_list('id', flat=True)[:options['batch_size']]
+        ):
+            deleted += Tombstone.objects.filter(id__in=ids).delete()[0]
+        self.stdout.write(self.style.SUCCESS(f'Удалено записей: {deleted}'))
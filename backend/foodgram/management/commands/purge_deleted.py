@@ -0,0 +1,62 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from foodgram.constants import PURGE_BATCH_SIZE, PURGE_RECIPE_BATCH_SIZE
+from foodgram.models import PurgeTask
+from foodgram.purge import Purger
+
+
+class Command(BaseCommand):
+    help = (
+        'Окончательно удаляет скрытых пользователей и рецепты порциями; '
+        'предназначена для периодического запуска, прерванное удаление '
+        'продолжается при следующем запуске'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=PURGE_BATCH_SIZE,
+            help='Количество строк, удаляемых одной транзакцией'
+        )
+        parser.add_argument(
+            '--recipe-batch-size',
+            type=int,
+            default=PURGE_RECIPE_BATCH_SIZE,
+            help='Количество рецептов пользователя, удаляемых за один шаг'
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=0,
+            help='Пауза между порциями, секунд'
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            help='Обработать не больше указанного количества задач'
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        purger = Purger(
+            options['batch_size'],
+            options['recipe_batch_size'],
+            options['pause']
+        )
+        tasks = PurgeTask.objects.order_by('created_at', 'id')
+        if options['limit'] is not None:
+            tasks = tasks[:options['limit']]
+        for task in tasks:
+            deleted = purger.deleted
+            purger.run(task)
+            self.stdout.write(
+                f'{task.get_target_display()} {task.object_id}: '
+                f'удалено строк {purger.deleted - deleted}'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Удалено строк: {purger.deleted} '
+            f'за {time.monotonic() - started:.1f} с'
+        ))
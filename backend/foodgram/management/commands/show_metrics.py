@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from foodgram_backend import metrics
+
+
+class Command(BaseCommand):
+    help = 'Выводит накопленные счётчики метрик и доли попаданий в кеш'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='Обнулить счётчики после вывода'
+        )
+
+    def handle(self, *args, **options):
+        values = metrics.read()
+        if not values:
+            self.stdout.write(self.style.WARNING('Метрик пока нет'))
+            return
+        for name, value in values.items():
+            self.stdout.write(f'{name}: {value}')
+        for name, misses in values.items():
+            prefix, _, suffix = name.rpartition('.')
+            if suffix != 'misses':
+                continue
+            hits = sum(
+                value for other, value in values.items()
+                if other.startswith(f'{prefix}.') and other.endswith('hits')
+            )
+            if hits + misses:
+                self.stdout.write(self.style.SUCCESS(
+                    f'{prefix} hit rate: {hits / (hits + misses):.1%}'
+                ))
+        if options['reset']:
+            metrics.reset()
@@ -0,0 +1,36 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from foodgram import rankings
+from foodgram.constants import RANKING_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает рейтинги рецептов по избранному и спискам покупок '
+        'и заменяет их одной транзакцией; добавления и удаления '
+        'учитываются при доставке событий outbox, пересчёт нужен после '
+        'изменения TRENDING_HALF_LIFE_HOURS или загрузки данных'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=RANKING_BATCH_SIZE,
+            help='Размер порции при чтении строк и записи рейтингов'
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        for stage, processed in rankings.recount(
+            settings.TRENDING_HALF_LIFE_HOURS * 60 * 60,
+            options['batch_size']
+        ):
+            self.stdout.write(f'{stage}: {processed}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Изменено рейтингов рецептов: {processed} '
+            f'за {time.monotonic() - started:.1f} с'
+        ))
@@ -0,0 +1,66 @@
+# Generated by Django 5.2.4 on 2026-10-19 08:52
+
+import django.db.models.functions.text
+from django.db import migrations, models
+from django.db.models.functions import Lower
+
+MAX_AMOUNT = 32767
+
+
+# Ингредиенты, различающиеся только регистром, сливаются в ингредиент с
+# наименьшим id. Если в рецепте есть оба, количества складываются в строке
+# основного ингредиента.
+def merge_case_duplicates(apps, schema_editor):
+    Ingredient = apps.get_model('foodgram', 'Ingredient')
+    RecipeIngredient = apps.get_model('foodgram', 'RecipeIngredient')
+    canonical, duplicates = {}, {}
+    for ingredient_id, lower_name, lower_unit in Ingredient.objects.annotate(
+        lower_name=Lower('name'), lower_unit=Lower('measurement_unit')
+    ).order_by('id').values_list('id', 'lower_name', 'lower_unit'):
+        key = (lower_name, lower_unit)
+        if key in canonical:
+            duplicates[ingredient_id] = canonical[key]
+        else:
+            canonical[key] = ingredient_id
+    if not duplicates:
+        return
+    # Строка основного ингредиента идёт раньше строк его дублей: у него
+    # наименьший id в группе.
+    rows = RecipeIngredient.objects.filter(
+        ingredient_id__in=[*duplicates, *duplicates.values()]
+    ).order_by('ingredient_id', 'id')
+    kept = {}
+    for row in rows:
+        target = duplicates.get(row.ingredient_id, row.ingredient_id)
+        existing = kept.get((row.recipe_id, target))
+        if existing is None:
+            if row.ingredient_id != target:
+                row.ingredient_id = target
+                row.save(update_fields=('ingredient',))
+            kept[row.recipe_id, target] = row
+        else:
+            existing.amount = min(existing.amount + row.amount, MAX_AMOUNT)
+            existing.save(update_fields=('amount',))
+            row.delete()
+    Ingredient.objects.filter(id__in=duplicates).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodgram', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='ingredient',
+            name='unique_ingredient_name_unit',
+        ),
+        migrations.RunPython(
+            merge_case_duplicates, migrations.RunPython.noop
+        ),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('name'), django.db.models.functions.text.Lower('measurement_unit'), name='unique_ingredient_name_unit_ci'),
+        ),
+    ]
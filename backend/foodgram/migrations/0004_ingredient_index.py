@@ -0,0 +1,82 @@
+# Generated by Django 5.2.4 on 2026-10-19 09:09
+
+from itertools import groupby
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+# Копия кодировщика из foodgram.ingredient_index на момент миграции:
+# миграция не должна меняться вместе с кодом приложения.
+BLOCK_SIZE = 4096
+
+
+def varint(value, output):
+    while value > 0x7f:
+        output.append(value & 0x7f | 0x80)
+        value >>= 7
+    output.append(value)
+
+
+def encode(postings):
+    output = bytearray()
+    previous = 0
+    for recipe_id in sorted(postings):
+        varint(recipe_id - previous, output)
+        varint(postings[recipe_id], output)
+        previous = recipe_id
+    return bytes(output)
+
+
+def build_index(apps, schema_editor):
+    RecipeIngredient = apps.get_model('foodgram', 'RecipeIngredient')
+    IngredientIndex = apps.get_model('foodgram', 'IngredientIndex')
+    counts = dict(
+        RecipeIngredient.objects.order_by().values('recipe_id').annotate(
+            total=Count('id')
+        ).values_list('recipe_id', 'total')
+    )
+    rows = RecipeIngredient.objects.order_by(
+        'ingredient_id', 'recipe_id'
+    ).values_list('ingredient_id', 'recipe_id').iterator(chunk_size=10000)
+    blocks = []
+    for (ingredient_id, block), group in groupby(
+        rows, key=lambda row: (row[0], row[1] // BLOCK_SIZE)
+    ):
+        postings = {recipe_id: counts[recipe_id] for _, recipe_id in group}
+        blocks.append(IngredientIndex(
+            ingredient_id=ingredient_id,
+            block=block,
+            postings=encode(postings),
+            size=len(postings)
+        ))
+        if len(blocks) >= 500:
+            IngredientIndex.objects.bulk_create(blocks)
+            blocks = []
+    IngredientIndex.objects.bulk_create(blocks)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodgram', '0003_change_tracking'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngredientIndex',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('block', models.PositiveIntegerField(verbose_name='Блок id рецептов')),
+                ('postings', models.BinaryField(verbose_name='Рецепты с числом ингредиентов')),
+                ('size', models.PositiveIntegerField(default=0, verbose_name='Количество рецептов')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='index_blocks', to='foodgram.ingredient', verbose_name='Ингредиент')),
+            ],
+            options={
+                'verbose_name': 'Блок индекса ингредиента',
+                'verbose_name_plural': 'Индекс ингредиентов',
+                'constraints': [models.UniqueConstraint(fields=('ingredient', 'block'), name='unique_ingredient_index_block')],
+            },
+        ),
+        migrations.RunPython(build_index, migrations.RunPython.noop),
+    ]
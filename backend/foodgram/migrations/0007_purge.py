@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-19 09:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodgram', '0006_recipe_rankings'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='is_hidden',
+            field=models.BooleanField(db_default=False, default=False, editable=False, verbose_name='Скрыт до удаления'),
+        ),
+        migrations.CreateModel(
+            name='PurgeTask',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('target', models.CharField(choices=[('user', 'Пользователь'), ('recipe', 'Рецепт')], max_length=16, verbose_name='Объект')),
+                ('object_id', models.PositiveBigIntegerField(verbose_name='Id объекта')),
+                ('files', models.JSONField(default=list, verbose_name='Файлы для удаления')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата постановки')),
+            ],
+            options={
+                'verbose_name': 'Удаление в фоне',
+                'verbose_name_plural': 'Удаления в фоне',
+                'constraints': [models.UniqueConstraint(fields=('target', 'object_id'), name='unique_purge_task')],
+            },
+        ),
+    ]
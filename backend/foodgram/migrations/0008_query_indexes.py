@@ -0,0 +1,47 @@
+# Generated by Django 5.2.4 on 2026-10-19 09:23
+
+from django.db import migrations, models
+
+# Поиск ингредиентов по началу названия (istartswith) сравнивает
+# UPPER(name) с шаблоном LIKE; обычный индекс для этого не подходит,
+# а выражение с классом операторов зависит от СУБД.
+PREFIX_INDEXES = {
+    'postgresql': (
+        'CREATE INDEX ingredient_name_prefix_idx ON foodgram_ingredient '
+        '(UPPER(name::text) text_pattern_ops)'
+    ),
+    'sqlite': (
+        'CREATE INDEX ingredient_name_prefix_idx ON foodgram_ingredient '
+        '(name COLLATE NOCASE)'
+    ),
+}
+
+
+def create_prefix_index(apps, schema_editor):
+    sql = PREFIX_INDEXES.get(schema_editor.connection.vendor)
+    if sql:
+        schema_editor.execute(sql)
+
+
+def drop_prefix_index(apps, schema_editor):
+    if schema_editor.connection.vendor in PREFIX_INDEXES:
+        schema_editor.execute('DROP INDEX IF EXISTS ingredient_name_prefix_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodgram', '0007_purge'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(condition=models.Q(('is_hidden', False)), fields=['-pub_date'], name='recipe_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(condition=models.Q(('is_hidden', False)), fields=['author', '-pub_date'], name='recipe_author_pub_date_idx'),
+        ),
+        migrations.RunPython(create_prefix_index, drop_prefix_index),
+    ]
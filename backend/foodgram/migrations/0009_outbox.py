@@ -0,0 +1,30 @@
+# Generated by Django 5.2.4 on 2026-10-19 09:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodgram', '0008_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('topic', models.CharField(max_length=64, verbose_name='Тема')),
+                ('object_id', models.PositiveBigIntegerField(verbose_name='Id объекта')),
+                ('payload', models.JSONField(default=dict, verbose_name='Данные')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Неудачных попыток доставки')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата события')),
+            ],
+            options={
+                'verbose_name': 'Событие outbox',
+                'verbose_name_plural': 'События outbox',
+                'ordering': ('id',),
+                'indexes': [models.Index(fields=['topic', 'object_id'], name='outbox_topic_object_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+from django.db import migrations
+
+SEARCH_FIELDS = ('username', 'first_name', 'last_name')
+
+# Поиск пользователей: на PostgreSQL GIN-индексы pg_trgm по UPPER(поле)
+# обслуживают и istartswith, и нечёткое сравнение по словам; на SQLite
+# индексы без учёта регистра нужны только для поиска по началу.
+SEARCH_INDEXES = {
+    'postgresql': (
+        'CREATE INDEX user_{field}_search_idx ON foodgram_user '
+        'USING gin (UPPER({field}::text) gin_trgm_ops)'
+    ),
+    'sqlite': (
+        'CREATE INDEX user_{field}_search_idx ON foodgram_user '
+        '({field} COLLATE NOCASE)'
+    ),
+}
+
+
+def create_search_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor not in SEARCH_INDEXES:
+        return
+    if vendor == 'postgresql':
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for field in SEARCH_FIELDS:
+        schema_editor.execute(SEARCH_INDEXES[vendor].format(field=field))
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor not in SEARCH_INDEXES:
+        return
+    for field in SEARCH_FIELDS:
+        schema_editor.execute(f'DROP INDEX IF EXISTS user_{field}_search_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodgram', '0009_outbox'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.4 on 2026-10-19 10:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodgram', '0010_user_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, verbose_name='Загрузка')),
+                ('record_type', models.CharField(max_length=16, verbose_name='Тип записей')),
+                ('position', models.BigIntegerField(default=0, verbose_name='Последний загруженный id')),
+            ],
+            options={
+                'verbose_name': 'Состояние загрузки',
+                'verbose_name_plural': 'Состояние загрузок',
+                'constraints': [models.UniqueConstraint(fields=('name', 'record_type'), name='unique_import_state')],
+            },
+        ),
+    ]
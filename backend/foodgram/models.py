@@ -2,12 +2,17 @@ from django.contrib.auth.models import AbstractUser
 from django.core.exceptions import ValidationError
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
+from django.db.models import Exists, OuterRef, Prefetch
+from django.db.models.functions import Lower, Now
 
-from .constants import (INGREDIENT_NAME_MAX_LENGTH, MAX_LENGTH_EMAIL,
+from .constants import (IMPORT_NAME_MAX_LENGTH, IMPORT_RECORD_TYPE_MAX_LENGTH,
+                        INGREDIENT_NAME_MAX_LENGTH, MAX_LENGTH_EMAIL,
                         MAX_NAME_FIELD_LENGTH, MAX_POSITIVE_SMALLINT,
                         MEASUREMENT_UNIT_MAX_LENGTH, MIN_POSITIVE_SMALLINT,
-                        RECIPE_NAME_MAX_LENGTH, STR_LIMIT,
-                        TAG_NAME_SLUG_MAX_LENGTH)
+                        OUTBOX_TOPIC_MAX_LENGTH, PURGE_TARGET_MAX_LENGTH,
+                        RANKING_SOURCE_MAX_LENGTH, RECIPE_NAME_MAX_LENGTH,
+                        STR_LIMIT, TAG_NAME_SLUG_MAX_LENGTH,
+                        TOMBSTONE_MODEL_MAX_LENGTH)
 from .validators import validate_username
 
 
@@ -60,6 +65,12 @@ class Tag(models.Model):
         unique=True,
         verbose_name='Слаг',
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        db_default=Now(),
+        db_index=True,
+        verbose_name='Дата изменения'
+    )
 
     class Meta:
         verbose_name = 'Тег'
@@ -77,14 +88,19 @@ class Ingredient(models.Model):
         max_length=MEASUREMENT_UNIT_MAX_LENGTH,
         verbose_name='Единица измерения'
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        db_default=Now(),
+        db_index=True,
+        verbose_name='Дата изменения'
+    )
 
     class Meta:
         constraints = (
             models.UniqueConstraint(
-                fields=(
-                    'name', 'measurement_unit'
-                ),
-                name='unique_ingredient_name_unit'
+                Lower('name'),
+                Lower('measurement_unit'),
+                name='unique_ingredient_name_unit_ci'
             ),
         )
         verbose_name = 'Ингредиент'
@@ -94,6 +110,45 @@ class Ingredient(models.Model):
         return f'{self.name} ({self.measurement_unit})'[:STR_LIMIT]
 
 
+class RecipeQuerySet(models.QuerySet):
+
+    def for_user(self, user, fields=None):
+        load_author = fields is None or 'author' in fields
+        if not user.is_authenticated:
+            return self.select_related('author') if load_author else self
+        flags = {
+            'is_favorited': Favorite,
+            'is_in_shopping_cart': ShoppingCart,
+        }
+        queryset = self.annotate(**{
+            name: Exists(
+                model.objects.filter(user=user, recipe=OuterRef('pk'))
+            )
+            for name, model in flags.items()
+            if fields is None or name in fields
+        })
+        if not load_author:
+            return queryset
+        return queryset.prefetch_related(
+            Prefetch(
+                'author',
+                queryset=User.objects.annotate(
+                    is_subscribed=Exists(
+                        Subscription.objects.filter(
+                            user=user, author=OuterRef('pk')
+                        )
+                    )
+                )
+            )
+        )
+
+
+class RecipeManager(models.Manager.from_queryset(RecipeQuerySet)):
+
+    def get_queryset(self):
+        return super().get_queryset().filter(is_hidden=False)
+
+
 class Recipe(models.Model):
     author = models.ForeignKey(
         User,
@@ -127,11 +182,60 @@ class Recipe(models.Model):
         auto_now_add=True,
         verbose_name='Дата публикации'
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        db_default=Now(),
+        db_index=True,
+        verbose_name='Дата изменения'
+    )
+
+    popularity = models.PositiveIntegerField(
+        default=0,
+        db_default=0,
+        editable=False,
+        verbose_name='Добавлений в избранное и покупки'
+    )
+    trending_score = models.FloatField(
+        default=0,
+        db_default=0,
+        editable=False,
+        verbose_name='Рейтинг с затуханием'
+    )
+
+    is_hidden = models.BooleanField(
+        default=False,
+        db_default=False,
+        editable=False,
+        verbose_name='Скрыт до удаления'
+    )
+
+    objects = RecipeManager()
+    all_objects = RecipeQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ('-pub_date',)
+        indexes = (
+            models.Index(
+                fields=('-pub_date',),
+                condition=models.Q(is_hidden=False),
+                name='recipe_pub_date_idx'
+            ),
+            models.Index(
+                fields=('author', '-pub_date'),
+                condition=models.Q(is_hidden=False),
+                name='recipe_author_pub_date_idx'
+            ),
+            models.Index(
+                fields=('-popularity', '-pub_date'),
+                name='recipe_popularity_idx'
+            ),
+            models.Index(
+                fields=('-trending_score', '-pub_date'),
+                name='recipe_trending_idx'
+            ),
+        )
 
     def __str__(self):
         return self.name[:STR_LIMIT]
@@ -172,6 +276,36 @@ class RecipeIngredient(models.Model):
         return f'{self.ingredient.name} — {self.amount} для {self.recipe.name}'
 
 
+class IngredientIndex(models.Model):
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='index_blocks',
+        verbose_name='Ингредиент'
+    )
+    block = models.PositiveIntegerField(verbose_name='Блок id рецептов')
+    postings = models.BinaryField(
+        verbose_name='Рецепты с числом ингредиентов'
+    )
+    size = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Количество рецептов'
+    )
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=('ingredient', 'block'),
+                name='unique_ingredient_index_block'
+            ),
+        )
+        verbose_name = 'Блок индекса ингредиента'
+        verbose_name_plural = 'Индекс ингредиентов'
+
+    def __str__(self):
+        return f'{self.ingredient_id}/{self.block}: {self.size}'
+
+
 class UserRecipeRelation(models.Model):
     user = models.ForeignKey(
         User,
@@ -183,10 +317,21 @@ class UserRecipeRelation(models.Model):
         on_delete=models.CASCADE,
         verbose_name='Рецепт'
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        db_default=Now(),
+        verbose_name='Дата изменения'
+    )
 
     class Meta:
         abstract = True
         default_related_name = '%(class)ss'
+        indexes = (
+            models.Index(
+                fields=('user', 'updated_at'),
+                name='%(class)s_user_updated_idx'
+            ),
+        )
 
     def __str__(self):
         return f'{self._meta.verbose_name}: {self.user} — {self.recipe}'
@@ -229,6 +374,11 @@ class Subscription(models.Model):
         related_name='subscriptions_to_author',
         verbose_name='Автор'
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        db_default=Now(),
+        verbose_name='Дата изменения'
+    )
 
     class Meta:
         constraints = (
@@ -237,6 +387,12 @@ class Subscription(models.Model):
                 name='unique_subscription'
             ),
         )
+        indexes = (
+            models.Index(
+                fields=('user', 'updated_at'),
+                name='subscription_user_updated_idx'
+            ),
+        )
         verbose_name = 'Подписка'
         verbose_name_plural = 'Подписки'
 
@@ -250,3 +406,179 @@ class Subscription(models.Model):
 
     def __str__(self):
         return f'{self.user} подписан на {self.author}'
+
+
+class Tombstone(models.Model):
+    model = models.CharField(
+        max_length=TOMBSTONE_MODEL_MAX_LENGTH,
+        verbose_name='Модель'
+    )
+    object_id = models.PositiveBigIntegerField(verbose_name='Объект')
+    user_id = models.PositiveBigIntegerField(
+        null=True,
+        blank=True,
+        verbose_name='Владелец'
+    )
+    deleted_at = models.DateTimeField(
+        auto_now_add=True,
+        db_default=Now(),
+        db_index=True,
+        verbose_name='Дата удаления'
+    )
+
+    class Meta:
+        verbose_name = 'Удалённый объект'
+        verbose_name_plural = 'Удалённые объекты'
+
+    def __str__(self):
+        return f'{self.model} {self.object_id}'
+
+
+class SimilarRecipe(models.Model):
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='neighbors',
+        verbose_name='Рецепт'
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Похожий рецепт'
+    )
+    score = models.FloatField(verbose_name='Сходство')
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=('recipe', 'similar'),
+                name='unique_similar_recipe'
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('recipe', '-score'),
+                name='similar_recipe_score_idx'
+            ),
+        )
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+
+    def __str__(self):
+        return f'{self.recipe_id} ~ {self.similar_id}: {self.score:.3f}'
+
+
+class RankingState(models.Model):
+    name = models.CharField(
+        max_length=RANKING_SOURCE_MAX_LENGTH,
+        primary_key=True,
+        verbose_name='Источник'
+    )
+    position = models.BigIntegerField(
+        default=0,
+        verbose_name='Позиция'
+    )
+
+    class Meta:
+        verbose_name = 'Состояние рейтинга'
+        verbose_name_plural = 'Состояние рейтингов'
+
+    def __str__(self):
+        return f'{self.name}: {self.position}'
+
+
+class ImportState(models.Model):
+    name = models.CharField(
+        max_length=IMPORT_NAME_MAX_LENGTH,
+        verbose_name='Загрузка'
+    )
+    record_type = models.CharField(
+        max_length=IMPORT_RECORD_TYPE_MAX_LENGTH,
+        verbose_name='Тип записей'
+    )
+    position = models.BigIntegerField(
+        default=0,
+        verbose_name='Последний загруженный id'
+    )
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=('name', 'record_type'),
+                name='unique_import_state'
+            ),
+        )
+        verbose_name = 'Состояние загрузки'
+        verbose_name_plural = 'Состояние загрузок'
+
+    def __str__(self):
+        return f'{self.name} {self.record_type}: {self.position}'
+
+
+class PurgeTask(models.Model):
+    USER = 'user'
+    RECIPE = 'recipe'
+    TARGETS = (
+        (USER, 'Пользователь'),
+        (RECIPE, 'Рецепт'),
+    )
+
+    target = models.CharField(
+        max_length=PURGE_TARGET_MAX_LENGTH,
+        choices=TARGETS,
+        verbose_name='Объект'
+    )
+    object_id = models.PositiveBigIntegerField(verbose_name='Id объекта')
+    files = models.JSONField(
+        default=list,
+        verbose_name='Файлы для удаления'
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Дата постановки'
+    )
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=('target', 'object_id'),
+                name='unique_purge_task'
+            ),
+        )
+        verbose_name = 'Удаление в фоне'
+        verbose_name_plural = 'Удаления в фоне'
+
+    def __str__(self):
+        return f'{self.get_target_display()} {self.object_id}'
+
+
+class OutboxEvent(models.Model):
+    topic = models.CharField(
+        max_length=OUTBOX_TOPIC_MAX_LENGTH,
+        verbose_name='Тема'
+    )
+    object_id = models.PositiveBigIntegerField(verbose_name='Id объекта')
+    payload = models.JSONField(default=dict, verbose_name='Данные')
+    attempts = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name='Неудачных попыток доставки'
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Дата события'
+    )
+
+    class Meta:
+        ordering = ('id',)
+        indexes = (
+            models.Index(
+                fields=('topic', 'object_id'),
+                name='outbox_topic_object_idx'
+            ),
+        )
+        verbose_name = 'Событие outbox'
+        verbose_name_plural = 'События outbox'
+
+    def __str__(self):
+        return f'{self.topic} {self.object_id}'
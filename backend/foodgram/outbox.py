@@ -0,0 +1,220 @@
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.db.models import F
+
+from foodgram_backend import metrics
+from . import ingredient_index, rankings
+from .constants import (OUTBOX_BATCH_SIZE, OUTBOX_MAX_ATTEMPTS,
+                        OUTBOX_PUBLISH_CHUNK_SIZE)
+from .models import OutboxEvent, Recipe
+
+logger = logging.getLogger(__name__)
+
+# Событие записывается в той же транзакции, что и изменение, и доставляется
+# обработчикам позже пачками. Доставка «хотя бы один раз»: при ошибке
+# обработчика события темы остаются в таблице и повторяются, поэтому
+# обработчики должны быть идемпотентными. После OUTBOX_MAX_ATTEMPTS
+# неудач событие остаётся в таблице как недоставленное (dead letter): оно
+# больше не выбирается, о нём пишется ошибка в лог и метрика
+# outbox.dead_letters, а вернуть его в очередь можно командой
+# dispatch_outbox --retry-dead.
+HANDLERS = defaultdict(list)
+
+_wake = threading.Event()
+_worker = None
+_worker_lock = threading.Lock()
+_dispatch_lock = threading.Lock()
+
+
+def _skip_locked():
+    return connection.features.has_select_for_update_skip_locked
+
+
+def handler(*topics):
+    def decorator(function):
+        for topic in topics:
+            HANDLERS[topic].append(function)
+        return function
+    return decorator
+
+
+def publish(topic, *object_ids, **payload):
+    # Такое же ещё не взятое в доставку событие не дублируется: строка
+    # блокируется до конца транзакции, поэтому диспетчер доставит её уже
+    # после этого изменения. Событие, которое доставляется прямо сейчас,
+    # заблокировано диспетчером и пропускается, тогда пишется новое.
+    object_ids = sorted(set(object_ids))
+    pending = set()
+    with transaction.atomic():
+        for start in range(0, len(object_ids), OUTBOX_PUBLISH_CHUNK_SIZE):
+            pending.update(
+                OutboxEvent.objects.select_for_update(
+                    skip_locked=_skip_locked()
+                ).filter(
+                    topic=topic,
+                    object_id__in=object_ids[
+                        start:start + OUTBOX_PUBLISH_CHUNK_SIZE
+                    ],
+                    payload=payload,
+                    attempts=0
+                ).values_list('object_id', flat=True)
+            )
+        events = OutboxEvent.objects.bulk_create(
+            OutboxEvent(topic=topic, object_id=object_id, payload=payload)
+            for object_id in object_ids if object_id not in pending
+        )
+    if pending:
+        metrics.incr('outbox.coalesced', len(pending))
+    transaction.on_commit(lambda: _published(len(events)))
+
+
+def _published(count):
+    metrics.incr('outbox.published', count)
+    if settings.OUTBOX_INLINE and _skip_locked():
+        wake_up()
+
+
+def _deduplicate(events):
+    unique = {}
+    for event in events:
+        key = (
+            event.topic,
+            event.object_id,
+            json.dumps(event.payload, sort_keys=True)
+        )
+        unique.pop(key, None)
+        unique[key] = event
+    return list(unique.values())
+
+
+def dispatch(batch_size=OUTBOX_BATCH_SIZE):
+    # Без SKIP LOCKED (SQLite) параллельные диспетчеры выбрали бы одни и те
+    # же события: доставка идёт только командой dispatch_outbox, одной на
+    # базу, и по очереди внутри процесса.
+    if _skip_locked():
+        return _dispatch(batch_size)
+    with _dispatch_lock:
+        return _dispatch(batch_size)
+
+
+def _dispatch(batch_size):
+    started = time.monotonic()
+    with transaction.atomic():
+        events = list(
+            OutboxEvent.objects.select_for_update(skip_locked=_skip_locked())
+            .filter(attempts__lt=OUTBOX_MAX_ATTEMPTS)
+            .order_by('id')[:batch_size]
+        )
+        if not events:
+            return 0
+        by_topic = defaultdict(list)
+        for event in events:
+            by_topic[event.topic].append(event)
+        delivered, failed = [], []
+        for topic, topic_events in by_topic.items():
+            ids = [event.id for event in topic_events]
+            try:
+                with transaction.atomic():
+                    unique = _deduplicate(topic_events)
+                    for function in HANDLERS.get(topic, ()):
+                        function(unique)
+            except Exception:
+                logger.exception('Не удалось доставить события %s', topic)
+                failed.extend(ids)
+            else:
+                delivered.extend(ids)
+        OutboxEvent.objects.filter(id__in=delivered).delete()
+        OutboxEvent.objects.filter(id__in=failed).update(
+            attempts=F('attempts') + 1
+        )
+        dead = list(OutboxEvent.objects.filter(
+            id__in=failed, attempts__gte=OUTBOX_MAX_ATTEMPTS
+        ).values_list('id', 'topic', 'object_id'))
+    if dead:
+        logger.error(
+            'События outbox не доставлены за %s попыток и отложены: %s',
+            OUTBOX_MAX_ATTEMPTS,
+            ', '.join(
+                f'#{event_id} {topic} {object_id}'
+                for event_id, topic, object_id in dead
+            )
+        )
+        metrics.incr('outbox.dead_letters', len(dead))
+    metrics.incr('outbox.batches')
+    metrics.incr('outbox.dispatched', len(delivered))
+    metrics.incr('outbox.failures', len(failed))
+    metrics.incr(
+        'outbox.dispatch_ms', round((time.monotonic() - started) * 1000)
+    )
+    return len(events)
+
+
+def dead_letters():
+    return OutboxEvent.objects.filter(attempts__gte=OUTBOX_MAX_ATTEMPTS)
+
+
+def retry_dead_letters():
+    return dead_letters().update(attempts=0)
+
+
+def wake_up():
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(
+                target=_run, name='outbox', daemon=True
+            )
+            _worker.start()
+    _wake.set()
+
+
+def _run():
+    # Поток создаётся в воркере при первой публикации, а не в мастере
+    # gunicorn, поэтому переживает preload без fork потоков.
+    while True:
+        _wake.wait(settings.OUTBOX_POLL_SECONDS)
+        _wake.clear()
+        try:
+            while dispatch():
+                pass
+        except Exception:
+            logger.exception('Ошибка доставки событий outbox')
+        finally:
+            connections.close_all()
+
+
+@handler('recipes.changed', 'recipes.deleted')
+def update_ingredient_index(events):
+    # В payload изменённого рецепта лежат его прежние ингредиенты: после
+    # записи их уже нет в RecipeIngredient, а из индекса их надо убрать.
+    previous = defaultdict(set)
+    for event in events:
+        previous[event.object_id].update(event.payload.get('ingredients', ()))
+    ingredient_index.update_recipes(previous)
+
+
+@handler('recipes.changed')
+def update_similar_recipes(events):
+    # numpy и scipy загружаются только при первой доставке.
+    from . import similarity
+
+    recipe_ids = list(Recipe.objects.filter(
+        id__in=[event.object_id for event in events]
+    ).values_list('id', flat=True))
+    if recipe_ids:
+        frequencies = similarity.document_frequencies()
+        for recipe_id in recipe_ids:
+            similarity.update_recipe(recipe_id, frequencies)
+
+
+@handler(*rankings.TOPICS)
+def update_rankings(events):
+    # Счётчики меняются в транзакции доставки, которая удаляет и сами
+    # события, поэтому при повторе событие не учитывается дважды.
+    rankings.apply_events(settings.TRENDING_HALF_LIFE_HOURS * 60 * 60, events)
@@ -0,0 +1,159 @@
+import time
+
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from . import ingredient_index, outbox
+from .constants import PURGE_BATCH_SIZE, PURGE_RECIPE_BATCH_SIZE
+from .models import (Favorite, PurgeTask, Recipe, RecipeIngredient,
+                     ShoppingCart, SimilarRecipe, Subscription, Tombstone,
+                     User)
+from .signals import TRACKED_DELETIONS
+
+# Удаление выполняется прямыми DELETE порциями по первичному ключу, без
+# Collector: связанные строки не загружаются в память, а блокировки
+# держатся только на время одной порции. Сигналы post_delete при этом не
+# отправляются, поэтому записи для синхронизации и обратный индекс
+# ингредиентов обновляются здесь явно. Запись для синхронизации о рецепте
+# создаётся уже при скрытии: клиенты не должны ждать фонового удаления.
+
+
+def schedule_recipe(recipe):
+    with transaction.atomic():
+        if not recipe.is_hidden:
+            recipe.is_hidden = True
+            recipe.save(update_fields=('is_hidden', 'updated_at'))
+            Tombstone.objects.create(model='recipes', object_id=recipe.id)
+        PurgeTask.objects.get_or_create(
+            target=PurgeTask.RECIPE, object_id=recipe.id
+        )
+        outbox.publish('recipes.deleted', recipe.id)
+
+
+def schedule_user(user):
+    with transaction.atomic():
+        user.is_active = False
+        user.save(update_fields=('is_active',))
+        recipes = Recipe.objects.filter(author=user)
+        recipe_ids = list(recipes.values_list('id', flat=True))
+        recipes.update(is_hidden=True, updated_at=timezone.now())
+        Tombstone.objects.bulk_create(
+            Tombstone(model='recipes', object_id=recipe_id)
+            for recipe_id in recipe_ids
+        )
+        PurgeTask.objects.get_or_create(
+            target=PurgeTask.USER, object_id=user.id
+        )
+        outbox.publish('recipes.deleted', *recipe_ids)
+        outbox.publish('users.deleted', user.id)
+
+
+class Purger:
+
+    def __init__(self, batch_size=PURGE_BATCH_SIZE,
+                 recipe_batch_size=PURGE_RECIPE_BATCH_SIZE, pause=0):
+        self.batch_size = batch_size
+        self.recipe_batch_size = recipe_batch_size
+        self.pause = pause
+        self.deleted = 0
+
+    def _delete(self, queryset, tombstones=False):
+        model = queryset.model
+        section, object_field, owner_field = TRACKED_DELETIONS.get(
+            model, (None, None, None)
+        )
+        fields = (object_field, owner_field) if tombstones else ()
+        while True:
+            with transaction.atomic():
+                rows = list(
+                    queryset.order_by('pk').values_list('pk', *fields)[
+                        :self.batch_size
+                    ]
+                )
+                if not rows:
+                    return
+                model.objects.filter(
+                    pk__in=[row[0] for row in rows]
+                )._raw_delete(queryset.db)
+                if tombstones:
+                    Tombstone.objects.bulk_create(
+                        Tombstone(
+                            model=section, object_id=object_id, user_id=owner
+                        )
+                        for _, object_id, owner in rows
+                    )
+            self.deleted += len(rows)
+            time.sleep(self.pause)
+
+    def _delete_recipes(self, task, recipe_ids):
+        for model in (Favorite, ShoppingCart):
+            self._delete(model.objects.filter(recipe_id__in=recipe_ids))
+        self._delete(SimilarRecipe.objects.filter(similar_id__in=recipe_ids))
+        with transaction.atomic():
+            ingredient_index.remove_recipes(recipe_ids)
+            task.files.extend(
+                name for name in Recipe.all_objects.filter(
+                    id__in=recipe_ids
+                ).values_list('image', flat=True) if name
+            )
+            for queryset in (
+                SimilarRecipe.objects.filter(recipe_id__in=recipe_ids),
+                RecipeIngredient.objects.filter(recipe_id__in=recipe_ids),
+                Recipe.tags.through.objects.filter(recipe_id__in=recipe_ids),
+                Recipe.all_objects.filter(id__in=recipe_ids),
+            ):
+                self.deleted += queryset._raw_delete(queryset.db)
+            task.save(update_fields=('files',))
+        time.sleep(self.pause)
+
+    def _purge_recipe(self, task):
+        self._delete_recipes(task, [task.object_id])
+
+    def _purge_user(self, task):
+        user_id = task.object_id
+        for model in (Favorite, ShoppingCart):
+            self._delete(model.objects.filter(user_id=user_id))
+        self._delete(Subscription.objects.filter(user_id=user_id))
+        # Подписчики удаляемого автора получают записи об удалении подписки.
+        self._delete(
+            Subscription.objects.filter(author_id=user_id), tombstones=True
+        )
+        self._delete(Token.objects.filter(user_id=user_id))
+        recipes = Recipe.all_objects.filter(author_id=user_id).order_by('id')
+        while recipe_ids := list(
+            recipes.values_list('id', flat=True)[:self.recipe_batch_size]
+        ):
+            self._delete_recipes(task, recipe_ids)
+        user = User.objects.filter(id=user_id).first()
+        if user is not None:
+            if user.avatar:
+                task.files.append(user.avatar.name)
+                task.save(update_fields=('files',))
+            # Тяжёлые связи уже удалены, оставшиеся (группы, права,
+            # журнал админки) удаляются штатно.
+            user.delete()
+
+    def run(self, task):
+        {
+            PurgeTask.USER: self._purge_user,
+            PurgeTask.RECIPE: self._purge_recipe,
+        }[task.target](task)
+        self._delete_files(task.files)
+        task.delete()
+
+    def _delete_files(self, names):
+        # Один файл может быть картинкой нескольких рецептов или аватаром
+        # (например, после загрузки дампа): удаляются только те, на которые
+        # больше никто не ссылается.
+        for start in range(0, len(names), self.batch_size):
+            batch = set(names[start:start + self.batch_size])
+            batch -= set(Recipe.all_objects.filter(
+                image__in=batch
+            ).values_list('image', flat=True))
+            batch -= set(User.objects.filter(
+                avatar__in=batch
+            ).values_list('avatar', flat=True))
+            for name in batch:
+                default_storage.delete(name)
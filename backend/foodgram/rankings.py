@@ -0,0 +1,185 @@
+from collections import Counter
+
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .constants import TRENDING_MAX_EXPONENT
+from .models import Favorite, OutboxEvent, RankingState, Recipe, ShoppingCart
+
+# Рейтинг с затуханием хранится в масштабе фиксированной эпохи:
+# вклад события равен 2 ** ((t - epoch) / half_life). Порядок рецептов
+# совпадает с порядком по затухающей сумме на текущий момент, поэтому
+# старые оценки не нужно пересчитывать при каждом запуске. Добавления и
+# удаления учитывает обработчик outbox, полный пересчёт по таблицам
+# избранного и списков покупок запускается командой update_rankings.
+# Изменения рейтингов выполняются под блокировкой строки эпохи.
+SOURCES = {
+    'favorites': Favorite,
+    'shopping_cart': ShoppingCart,
+}
+EPOCH = 'epoch'
+TOPICS = tuple(
+    f'{source}.{action}'
+    for source in SOURCES for action in ('added', 'removed')
+)
+
+ORDERINGS = {
+    'popular': ('-popularity', '-pub_date'),
+    'trending': ('-trending_score', '-pub_date'),
+}
+
+
+def _locked_state(name):
+    RankingState.objects.get_or_create(name=name)
+    return RankingState.objects.select_for_update().get(name=name)
+
+
+def rebase(half_life):
+    now = int(timezone.now().timestamp())
+    with transaction.atomic():
+        epoch = _locked_state(EPOCH)
+        if epoch.position == 0:
+            epoch.position = now
+            epoch.save()
+        elif (now - epoch.position) / half_life > TRENDING_MAX_EXPONENT:
+            Recipe.objects.update(trending_score=F('trending_score') * (
+                2 ** ((epoch.position - now) / half_life)
+            ))
+            epoch.position = now
+            epoch.save()
+    return epoch.position
+
+
+def _weight(added_at, epoch, half_life):
+    return 2 ** ((added_at - epoch) / half_life)
+
+
+def _deltas(events):
+    # Момент добавления берётся из payload: у удаления это момент
+    # добавления удалённой строки, его вклад и вычитается.
+    return [
+        (
+            event.object_id,
+            -1 if event.topic.endswith('.removed') else 1,
+            event.payload.get('added_at', event.created_at.timestamp())
+        )
+        for event in events
+    ]
+
+
+def apply_events(half_life, events):
+    with transaction.atomic():
+        epoch = rebase(half_life)
+        counts, weights = Counter(), Counter()
+        for recipe_id, sign, added_at in _deltas(events):
+            counts[recipe_id] += sign
+            weights[recipe_id] += sign * _weight(added_at, epoch, half_life)
+        recipes = list(
+            Recipe.objects.select_for_update()
+            .filter(id__in=counts)
+            .order_by('id')
+            .only('id', 'popularity', 'trending_score')
+        )
+        for recipe in recipes:
+            recipe.popularity = max(recipe.popularity + counts[recipe.id], 0)
+            recipe.trending_score += weights[recipe.id]
+        Recipe.objects.bulk_update(recipes, ('popularity', 'trending_score'))
+
+
+def _snapshot(half_life, batch_size, staged):
+    # Строки избранного, ещё не доставленные события рейтингов и текущие
+    # рейтинги читаются из одного снимка базы: событие пишется в одной
+    # транзакции со строкой, поэтому события снимка уже учтены строками.
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SET TRANSACTION ISOLATION LEVEL REPEATABLE READ'
+                )
+        epoch = RankingState.objects.get(name=EPOCH).position
+        covered = list(OutboxEvent.objects.filter(topic__in=TOPICS))
+        current = {
+            recipe_id: (popularity, trending_score)
+            for recipe_id, popularity, trending_score
+            in Recipe.objects.order_by().values_list(
+                'id', 'popularity', 'trending_score'
+            ).iterator(chunk_size=batch_size)
+        }
+        for name, model in SOURCES.items():
+            rows = model.objects.order_by().values_list(
+                'recipe_id', 'updated_at'
+            ).iterator(chunk_size=batch_size)
+            processed = 0
+            for processed, (recipe_id, added_at) in enumerate(rows, 1):
+                count, weight = staged.get(recipe_id, (0, 0))
+                staged[recipe_id] = (count + 1, weight + _weight(
+                    added_at.timestamp(), epoch, half_life
+                ))
+                if processed % batch_size == 0:
+                    yield name, processed
+            yield name, processed
+    return epoch, covered, current
+
+
+def _swap(half_life, batch_size, epoch, covered, current, staged):
+    # Между снимком и заменой обработчик мог доставить события: значения
+    # из снимка заменяются пересчитанными, а всё, что добавлено к ним
+    # после снимка, кроме уже учтённых строками событий, сохраняется.
+    with transaction.atomic():
+        pending = set()
+        for start in range(0, len(covered), batch_size):
+            pending.update(
+                OutboxEvent.objects.select_for_update().filter(
+                    id__in=[
+                        event.id for event in covered[start:start + batch_size]
+                    ]
+                ).order_by('id').values_list('id', flat=True)
+            )
+        scale = _weight(epoch, rebase(half_life), half_life)
+        # Доставленные после снимка события снимка есть и в строках, и в
+        # текущих значениях.
+        for recipe_id, sign, added_at in _deltas(
+            event for event in covered if event.id not in pending
+        ):
+            count, weight = staged.get(recipe_id, (0, 0))
+            staged[recipe_id] = (
+                count - sign,
+                weight - sign * _weight(added_at, epoch, half_life)
+            )
+        changed = []
+        for recipe_id, popularity, trending_score in (
+            Recipe.objects.order_by().values_list(
+                'id', 'popularity', 'trending_score'
+            ).iterator(chunk_size=batch_size)
+        ):
+            count, weight = staged.get(recipe_id, (0, 0))
+            old_count, old_weight = current.get(recipe_id, (0, 0))
+            recipe = Recipe(
+                id=recipe_id,
+                popularity=max(popularity + count - old_count, 0),
+                trending_score=trending_score + (weight - old_weight) * scale
+            )
+            if (recipe.popularity, recipe.trending_score) != (
+                popularity, trending_score
+            ):
+                changed.append(recipe)
+        Recipe.objects.bulk_update(
+            changed, ('popularity', 'trending_score'), batch_size=batch_size
+        )
+        OutboxEvent.objects.filter(id__in=pending).delete()
+    return len(changed)
+
+
+def recount(half_life, batch_size):
+    # Рейтинги пересчитываются в памяти и заменяются одной транзакцией, без
+    # обнуления: во время пересчёта сортировка работает по прежним
+    # значениям. Последним отдаётся число изменённых рецептов.
+    rebase(half_life)
+    staged = {}
+    epoch, covered, current = yield from _snapshot(
+        half_life, batch_size, staged
+    )
+    yield 'recipes', _swap(
+        half_life, batch_size, epoch, covered, current, staged
+    )
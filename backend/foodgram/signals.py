@@ -0,0 +1,103 @@
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import outbox
+from .models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                     ShoppingCart, Subscription, Tag, Tombstone, User)
+
+# Поля пользователя, которые отдаются в рецепте как автор.
+AUTHOR_FIELDS = frozenset(
+    ('email', 'username', 'first_name', 'last_name', 'avatar')
+)
+
+# Модель -> (раздел синхронизации, поле с id объекта, поле с id владельца).
+TRACKED_DELETIONS = {
+    Tag: ('tags', 'id', None),
+    Ingredient: ('ingredients', 'id', None),
+    Recipe: ('recipes', 'id', None),
+    Favorite: ('favorites', 'recipe_id', 'user_id'),
+    ShoppingCart: ('shopping_cart', 'recipe_id', 'user_id'),
+    Subscription: ('subscriptions', 'author_id', 'user_id'),
+}
+
+
+def create_tombstone(sender, instance, **kwargs):
+    section, object_field, owner_field = TRACKED_DELETIONS[sender]
+    Tombstone.objects.create(
+        model=section,
+        object_id=getattr(instance, object_field),
+        user_id=getattr(instance, owner_field) if owner_field else None
+    )
+
+
+for model in TRACKED_DELETIONS:
+    post_delete.connect(
+        create_tombstone, sender=model, dispatch_uid=f'tombstone_{model}'
+    )
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def touch_recipes(sender, instance, **kwargs):
+    lookup = 'tags' if sender is Tag else 'ingredients'
+    Recipe.objects.filter(**{lookup: instance}).update(
+        updated_at=timezone.now()
+    )
+
+
+# Изменения моделей публикуются в outbox в той же транзакции; кэш
+# страниц, индекс ингредиентов и похожие рецепты обновляют обработчики.
+@receiver(post_save, sender=Recipe)
+def publish_recipe_change(sender, instance, **kwargs):
+    outbox.publish('recipes.changed', instance.id)
+
+
+@receiver(pre_delete, sender=Recipe)
+def publish_recipe_deletion(sender, instance, **kwargs):
+    outbox.publish(
+        'recipes.deleted',
+        instance.id,
+        ingredients=sorted(
+            RecipeIngredient.objects.filter(recipe=instance).values_list(
+                'ingredient_id', flat=True
+            )
+        )
+    )
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def publish_recipe_tags_change(sender, instance, action, reverse, pk_set,
+                               **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        outbox.publish('recipes.changed', instance.id)
+    elif pk_set:
+        outbox.publish('recipes.changed', *pk_set)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def publish_tag_change(sender, instance, **kwargs):
+    outbox.publish('tags.changed', instance.id)
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def publish_ingredient_change(sender, instance, **kwargs):
+    outbox.publish('ingredients.changed', instance.id)
+
+
+@receiver(post_save, sender=User)
+def publish_user_change(sender, instance, created, update_fields, **kwargs):
+    if created or update_fields == frozenset(('last_login',)):
+        return
+    outbox.publish('users.changed', instance.id)
+    # Автор встроен в рецепт, поэтому синхронизация должна отдать его
+    # рецепты заново.
+    if update_fields is None or update_fields & AUTHOR_FIELDS:
+        Recipe.objects.filter(author=instance).update(
+            updated_at=timezone.now()
+        )
@@ -0,0 +1,195 @@
+from collections import Counter
+from itertools import chain
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from scipy import sparse
+
+from .constants import (SIMILAR_RECIPES_COUNT, SIMILARITY_BLOCK_SIZE,
+                        SIMILARITY_CANDIDATES, SIMILARITY_TAG_WEIGHT)
+from .ingredient_index import postings
+from .models import (IngredientIndex, Recipe, RecipeIngredient, SimilarRecipe,
+                     Tag)
+
+# Признаки рецепта: ингредиенты и теги с весами idf. Теги занимают столбцы
+# после ингредиентов и учитываются с пониженным весом.
+
+
+def _pairs(queryset):
+    return np.fromiter(
+        chain.from_iterable(queryset.iterator(chunk_size=10000)),
+        dtype=np.int64
+    ).reshape(-1, 2)
+
+
+def _idf(document_frequency, total):
+    return np.log((1 + total) / (1 + document_frequency)) + 1
+
+
+def _lookup(frequencies, ids):
+    table = np.ones(
+        max(max(frequencies, default=0), int(ids.max(initial=0))) + 1
+    )
+    table[list(frequencies)] = list(frequencies.values())
+    return table[ids]
+
+
+def document_frequencies():
+    total = Recipe.objects.count()
+    ingredients = dict(
+        IngredientIndex.objects.values('ingredient_id').annotate(
+            total=Sum('size')
+        ).values_list('ingredient_id', 'total')
+    )
+    tags = dict(
+        Tag.objects.annotate(
+            size=Count('recipe', filter=Q(recipe__is_hidden=False))
+        ).values_list('id', 'size')
+    )
+    return total, ingredients, tags
+
+
+def feature_matrix(recipe_ids, frequencies):
+    total, ingredient_frequency, tag_frequency = frequencies
+    ingredients = RecipeIngredient.objects.order_by().values_list(
+        'recipe_id', 'ingredient_id'
+    )
+    tags = Recipe.tags.through.objects.order_by().values_list(
+        'recipe_id', 'tag_id'
+    )
+    if recipe_ids is not None:
+        ingredients = ingredients.filter(recipe_id__in=recipe_ids)
+        tags = tags.filter(recipe_id__in=recipe_ids)
+    else:
+        # Скрытые рецепты не попадают в похожие, как и в индекс.
+        ingredients = ingredients.filter(recipe__is_hidden=False)
+        tags = tags.filter(recipe__is_hidden=False)
+    ingredients, tags = _pairs(ingredients), _pairs(tags)
+    if recipe_ids is None:
+        recipe_ids = np.union1d(ingredients[:, 0], tags[:, 0])
+    recipe_ids = np.unique(np.asarray(recipe_ids, dtype=np.int64))
+    tag_offset = int(ingredients[:, 1].max(initial=0)) + 1
+    weights = np.concatenate((
+        _idf(_lookup(ingredient_frequency, ingredients[:, 1]), total),
+        SIMILARITY_TAG_WEIGHT
+        * _idf(_lookup(tag_frequency, tags[:, 1]), total),
+    ))
+    rows = np.searchsorted(
+        recipe_ids, np.concatenate((ingredients[:, 0], tags[:, 0]))
+    )
+    columns = np.concatenate((ingredients[:, 1], tags[:, 1] + tag_offset))
+    width = tag_offset + int(tags[:, 1].max(initial=0)) + 1
+    matrix = sparse.csr_matrix(
+        (weights, (rows, columns)), shape=(len(recipe_ids), width)
+    )
+    norms = np.sqrt(matrix.multiply(matrix).sum(axis=1)).A1
+    norms[norms == 0] = 1
+    return recipe_ids, sparse.diags(1 / norms) @ matrix
+
+
+def _top(columns, scores, count):
+    if len(scores) > count:
+        best = np.argpartition(-scores, count)[:count]
+        columns, scores = columns[best], scores[best]
+    order = np.argsort(-scores, kind='stable')
+    return columns[order], scores[order]
+
+
+def rebuild(count=SIMILAR_RECIPES_COUNT, block_size=SIMILARITY_BLOCK_SIZE):
+    recipe_ids, matrix = feature_matrix(None, document_frequencies())
+    transposed = matrix.T.tocsr()
+    stored = 0
+    for start in range(0, len(recipe_ids), block_size):
+        block_ids = recipe_ids[start:start + block_size]
+        scores = (matrix[start:start + block_size] @ transposed).tocsr()
+        neighbors = []
+        for row, recipe_id in enumerate(block_ids):
+            begin, end = scores.indptr[row], scores.indptr[row + 1]
+            columns, values = scores.indices[begin:end], scores.data[begin:end]
+            keep = columns != start + row
+            columns, values = _top(columns[keep], values[keep], count)
+            neighbors.extend(
+                SimilarRecipe(
+                    recipe_id=int(recipe_id),
+                    similar_id=int(recipe_ids[column]),
+                    score=float(score)
+                )
+                for column, score in zip(columns, values)
+            )
+        with transaction.atomic():
+            SimilarRecipe.objects.filter(
+                recipe_id__in=block_ids.tolist()
+            ).delete()
+            SimilarRecipe.objects.bulk_create(neighbors, batch_size=1000)
+        stored += len(neighbors)
+        yield start + len(block_ids), len(recipe_ids), stored
+
+
+def _candidates(recipe_id, frequencies):
+    total, ingredient_frequency, _ = frequencies
+    ingredient_ids = RecipeIngredient.objects.filter(
+        recipe_id=recipe_id
+    ).values_list('ingredient_id', flat=True)
+    shared = Counter()
+    for ingredient_id, pairs in postings(ingredient_ids).items():
+        weight = float(_idf(ingredient_frequency.get(ingredient_id, 1), total))
+        for candidate_id, _ in pairs:
+            shared[candidate_id] += weight * weight
+    shared.pop(recipe_id, None)
+    return [i for i, _ in shared.most_common(SIMILARITY_CANDIDATES)]
+
+
+def update_recipe(recipe_id, frequencies, count=SIMILAR_RECIPES_COUNT):
+    # frequencies считаются один раз на пачку рецептов: полный агрегат на
+    # каждый рецепт делал массовую запись квадратичной.
+    referencing = list(SimilarRecipe.objects.filter(
+        similar_id=recipe_id
+    ).values_list('recipe_id', flat=True))
+    candidate_ids = set(_candidates(recipe_id, frequencies))
+    candidate_ids.update(referencing)
+    candidate_ids.discard(recipe_id)
+    recipe_ids, matrix = feature_matrix(
+        [recipe_id, *candidate_ids], frequencies
+    )
+    own = int(np.searchsorted(recipe_ids, recipe_id))
+    scores = (matrix @ matrix[own].T).toarray().ravel()
+    similarity = dict(zip(recipe_ids.tolist(), scores.tolist()))
+    del similarity[recipe_id]
+    columns, values = _top(
+        np.fromiter(similarity, dtype=np.int64, count=len(similarity)),
+        np.fromiter(
+            similarity.values(), dtype=np.float64, count=len(similarity)
+        ),
+        count
+    )
+    neighbors = [
+        (int(i), float(score))
+        for i, score in zip(columns, values) if score > 0
+    ]
+    with transaction.atomic():
+        SimilarRecipe.objects.filter(recipe_id=recipe_id).delete()
+        SimilarRecipe.objects.bulk_create(
+            SimilarRecipe(recipe_id=recipe_id, similar_id=i, score=score)
+            for i, score in neighbors
+        )
+        # Рецепт мог стать ближе или дальше для соседей: обновляются их
+        # списки, в которые он входит или должен войти.
+        affected = set(referencing) | {i for i, _ in neighbors}
+        SimilarRecipe.objects.filter(
+            recipe_id__in=affected, similar_id=recipe_id
+        ).delete()
+        SimilarRecipe.objects.bulk_create(
+            SimilarRecipe(
+                recipe_id=i, similar_id=recipe_id, score=similarity[i]
+            )
+            for i in affected if similarity.get(i, 0) > 0
+        )
+        for neighbor_id in affected.difference(referencing):
+            extra = SimilarRecipe.objects.filter(
+                recipe_id=neighbor_id
+            ).order_by('-score', 'similar_id').values_list(
+                'id', flat=True
+            )[count:]
+            SimilarRecipe.objects.filter(id__in=list(extra)).delete()
+    return neighbors
@@ -0,0 +1,18 @@
+'use strict';
+{
+    const $ = django.jQuery;
+
+    $(function() {
+        $('select[data-filter-parameter]').on('change', function() {
+            const params = new URLSearchParams(window.location.search);
+            const name = this.dataset.filterParameter;
+            if (this.value) {
+                params.set(name, this.value);
+            } else {
+                params.delete(name);
+            }
+            params.delete('p');
+            window.location.search = params.toString();
+        });
+    });
+}
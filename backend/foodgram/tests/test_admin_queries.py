@@ -0,0 +1,96 @@
+from django.contrib import admin
+from django.test import TestCase
+from django.urls import reverse
+
+from foodgram.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                             ShoppingCart, Subscription, Tag, User)
+
+# Запросов на страницу списка, включая сессию и пользователя. Данных
+# в каждой таблице несколько строк, так что N+1 сразу превысит бюджет.
+QUERY_BUDGETS = {
+    'auth.Group': 5,
+    'authtoken.TokenProxy': 5,
+    'foodgram.User': 4,
+    'foodgram.Recipe': 7,
+    'foodgram.Ingredient': 4,
+    'foodgram.Tag': 6,
+    'foodgram.Favorite': 4,
+    'foodgram.ShoppingCart': 4,
+    'foodgram.Subscription': 4,
+}
+
+
+class AdminChangelistQueriesTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.superuser = User.objects.create_superuser(
+            email='admin@example.com',
+            username='admin',
+            password='password',
+            first_name='Админ',
+            last_name='Админов'
+        )
+        tags = Tag.objects.bulk_create(
+            Tag(name=f'Тег {index}', slug=f'tag-{index}') for index in range(3)
+        )
+        ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=f'ингредиент {index}', measurement_unit='г')
+            for index in range(5)
+        )
+        for index in range(5):
+            author = User.objects.create(
+                email=f'author{index}@example.com',
+                username=f'author{index}',
+                first_name='Имя',
+                last_name='Фамилия'
+            )
+            recipe = Recipe.objects.create(
+                author=author,
+                name=f'Рецепт {index}',
+                image='recipes/dish.png',
+                text='Описание',
+                cooking_time=10,
+                is_hidden=index == 0
+            )
+            recipe.tags.set(tags)
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(
+                    recipe=recipe, ingredient=ingredient, amount=5
+                )
+                for ingredient in ingredients
+            )
+            Favorite.objects.create(user=cls.superuser, recipe=recipe)
+            ShoppingCart.objects.create(user=author, recipe=recipe)
+            Subscription.objects.create(user=cls.superuser, author=author)
+
+    def setUp(self):
+        self.client.force_login(self.superuser)
+
+    def test_changelists_fit_query_budget(self):
+        for model in admin.site._registry:
+            opts = model._meta
+            with self.subTest(model=opts.label):
+                url = reverse(
+                    f'admin:{opts.app_label}_{opts.model_name}_changelist'
+                )
+                with self.assertNumQueries(QUERY_BUDGETS[opts.label]):
+                    response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+
+    def test_recipe_changelist_shows_hidden_recipes(self):
+        response = self.client.get(
+            reverse('admin:foodgram_recipe_changelist')
+        )
+        self.assertEqual(
+            len(response.context['cl'].result_list),
+            Recipe.all_objects.count()
+        )
+        response = self.client.get(
+            reverse('admin:foodgram_recipe_changelist'),
+            {'is_hidden__exact': 1}
+        )
+        self.assertEqual(
+            [recipe.name for recipe in response.context['cl'].result_list],
+            ['Рецепт 0']
+        )
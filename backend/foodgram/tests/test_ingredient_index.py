@@ -0,0 +1,109 @@
+from unittest import mock
+
+from django.test import TestCase
+
+from foodgram import ingredient_index, outbox, purge
+from foodgram.constants import INGREDIENT_INDEX_BLOCK_SIZE
+from foodgram.models import (Ingredient, IngredientIndex, Recipe,
+                             RecipeIngredient, User)
+
+
+class IngredientIndexTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(
+            email='cook@example.com',
+            username='cook',
+            first_name='Повар',
+            last_name='Поваров'
+        )
+        cls.salt, cls.rice, cls.milk = Ingredient.objects.bulk_create(
+            Ingredient(name=name, measurement_unit='г')
+            for name in ('соль', 'рис', 'молоко')
+        )
+
+    def create_recipe(self, recipe_id, *ingredients):
+        recipe = Recipe.objects.create(
+            id=recipe_id,
+            author=self.author,
+            name=f'Рецепт {recipe_id}',
+            image='recipes/dish.png',
+            text='Сварить',
+            cooking_time=10
+        )
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=5)
+            for ingredient in ingredients
+        )
+        ingredient_index.update_recipes({recipe.id: ()})
+        return recipe
+
+    @staticmethod
+    def snapshot():
+        return {
+            (row.ingredient_id, row.block): dict(
+                ingredient_index.decode(row.postings)
+            )
+            for row in IngredientIndex.objects.all()
+            if row.size
+        }
+
+    def test_encoding_round_trip(self):
+        postings = {1: 3, 300: 2, 2 ** 40: 1, 2 ** 62: 70000}
+        self.assertEqual(
+            dict(ingredient_index.decode(ingredient_index.encode(postings))),
+            postings
+        )
+
+    def test_updates_touch_only_recipe_block(self):
+        first = self.create_recipe(1, self.salt, self.rice)
+        far = self.create_recipe(
+            INGREDIENT_INDEX_BLOCK_SIZE * 3, self.salt, self.milk
+        )
+        self.assertEqual(
+            IngredientIndex.objects.filter(ingredient=self.salt).count(), 2
+        )
+        old = list(first.recipe_ingredients.values_list(
+            'ingredient_id', flat=True
+        ))
+        first.recipe_ingredients.filter(ingredient=self.rice).delete()
+        RecipeIngredient.objects.create(
+            recipe=first, ingredient=self.milk, amount=1
+        )
+        ingredient_index.update_recipes({first.id: old})
+        incremental = self.snapshot()
+        ingredient_index.rebuild()
+        self.assertEqual(incremental, self.snapshot())
+        self.assertEqual(
+            [recipe_id for recipe_id, *_ in ingredient_index.rank_recipes(
+                [self.milk.id], 10
+            )],
+            [far.id, first.id]
+        )
+
+    def test_hidden_recipe_leaves_index(self):
+        hidden = self.create_recipe(1, self.salt, self.rice)
+        visible = self.create_recipe(2, self.salt)
+        purge.schedule_recipe(hidden)
+        outbox.dispatch()
+        self.assertEqual(
+            ingredient_index.rank_recipes([self.salt.id, self.rice.id], 10),
+            [(visible.id, 1, 0)]
+        )
+        ingredient_index.rebuild()
+        self.assertEqual(
+            ingredient_index.rank_recipes([self.salt.id, self.rice.id], 10),
+            [(visible.id, 1, 0)]
+        )
+
+    def test_common_ingredients_only_count_for_candidates(self):
+        self.create_recipe(1, self.salt)
+        both = self.create_recipe(2, self.salt, self.rice)
+        self.create_recipe(INGREDIENT_INDEX_BLOCK_SIZE * 2, self.salt)
+        with mock.patch.object(ingredient_index, 'PANTRY_MAX_POSTINGS', 1):
+            with self.assertNumQueries(3):
+                ranked = ingredient_index.rank_recipes(
+                    [self.salt.id, self.rice.id], 10
+                )
+        self.assertEqual(ranked, [(both.id, 2, 0)])
@@ -0,0 +1,113 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from foodgram import ingredient_index, outbox
+from foodgram.constants import OUTBOX_MAX_ATTEMPTS
+from foodgram.models import (Ingredient, OutboxEvent, Recipe, RecipeIngredient,
+                             Tag, User)
+from foodgram_backend import page_cache
+
+
+class OutboxTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(
+            email='cook@example.com',
+            username='cook',
+            first_name='Повар',
+            last_name='Поваров'
+        )
+        cls.tag = Tag.objects.create(name='Завтрак', slug='breakfast')
+        cls.salt, cls.rice = Ingredient.objects.bulk_create(
+            Ingredient(name=name, measurement_unit='г')
+            for name in ('соль', 'рис')
+        )
+        cls.recipe = Recipe.objects.create(
+            author=cls.user,
+            name='Каша',
+            image='recipes/porridge.png',
+            text='Сварить',
+            cooking_time=10
+        )
+        RecipeIngredient.objects.create(
+            recipe=cls.recipe, ingredient=cls.salt, amount=5
+        )
+        OutboxEvent.objects.all().delete()
+
+    def setUp(self):
+        cache.clear()
+
+    def test_pending_duplicates_are_coalesced_across_transactions(self):
+        outbox.publish('recipes.changed', self.recipe.id)
+        outbox.publish('recipes.changed', self.recipe.id)
+        outbox.publish(
+            'recipes.changed', self.recipe.id, ingredients=[self.rice.id]
+        )
+        self.assertEqual(OutboxEvent.objects.count(), 2)
+        OutboxEvent.objects.update(attempts=1)
+        outbox.publish('recipes.changed', self.recipe.id)
+        self.assertEqual(OutboxEvent.objects.count(), 3)
+
+    def test_pages_on_commit_and_handlers_update_index_and_rankings(self):
+        versions = page_cache.version_keys(('recipes',))
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.patch(
+                f'/api/recipes/{self.recipe.id}/',
+                {
+                    'name': 'Рисовая каша',
+                    'text': 'Сварить',
+                    'cooking_time': 20,
+                    'tags': [self.tag.id],
+                    'ingredients': [{'id': self.rice.id, 'amount': 100}],
+                },
+                format='json'
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(cache.get_many(versions)), 1)
+        client.post(f'/api/recipes/{self.recipe.id}/favorite/')
+        while outbox.dispatch():
+            pass
+        self.assertEqual(
+            ingredient_index.rank_recipes([self.rice.id], 10),
+            [(self.recipe.id, 1, 0)]
+        )
+        self.assertEqual(ingredient_index.rank_recipes([self.salt.id], 10), [])
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.popularity, 1)
+        self.assertGreater(self.recipe.trending_score, 0)
+        self.assertFalse(OutboxEvent.objects.exists())
+
+    @override_settings(OUTBOX_INLINE=True)
+    def test_inline_delivery_needs_skip_locked(self):
+        with mock.patch.object(outbox, 'wake_up') as wake_up:
+            with self.captureOnCommitCallbacks(execute=True):
+                outbox.publish('recipes.changed', self.recipe.id)
+        self.assertEqual(
+            wake_up.called,
+            connection.features.has_select_for_update_skip_locked
+        )
+
+    def test_failing_events_become_dead_letters(self):
+        failing = mock.Mock(side_effect=RuntimeError)
+        outbox.publish('tests.failing', 1)
+        with mock.patch.dict(outbox.HANDLERS, {'tests.failing': [failing]}):
+            for _ in range(OUTBOX_MAX_ATTEMPTS - 1):
+                with self.assertLogs('foodgram.outbox', 'ERROR'):
+                    outbox.dispatch()
+            with self.assertLogs('foodgram.outbox', 'ERROR') as logs:
+                outbox.dispatch()
+            self.assertIn('tests.failing 1', logs.output[-1])
+            self.assertEqual(outbox.dispatch(), 0)
+            self.assertEqual(outbox.dead_letters().count(), 1)
+            self.assertEqual(outbox.retry_dead_letters(), 1)
+            failing.side_effect = None
+            self.assertEqual(outbox.dispatch(), 1)
+        self.assertEqual(failing.call_count, OUTBOX_MAX_ATTEMPTS + 1)
+        self.assertFalse(OutboxEvent.objects.exists())
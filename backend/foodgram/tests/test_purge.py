@@ -0,0 +1,65 @@
+import shutil
+import tempfile
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+
+from foodgram.models import PurgeTask, Recipe, Tombstone, User
+from foodgram.purge import Purger, schedule_recipe
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class PurgeTest(TestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.author = User.objects.create(
+            email='cook@example.com',
+            username='cook',
+            first_name='Повар',
+            last_name='Поваров'
+        )
+        self.image = default_storage.save(
+            'recipes/dish.png', ContentFile(b'image')
+        )
+        self.recipe, self.copy = (
+            Recipe.objects.create(
+                author=self.author,
+                name=name,
+                image=self.image,
+                text='Сварить',
+                cooking_time=10
+            )
+            for name in ('Каша', 'Каша из дампа')
+        )
+
+    def test_hiding_creates_tombstone(self):
+        updated_at = self.recipe.updated_at
+        schedule_recipe(self.recipe)
+        self.recipe.refresh_from_db()
+        self.assertTrue(self.recipe.is_hidden)
+        self.assertGreater(self.recipe.updated_at, updated_at)
+        self.assertTrue(Tombstone.objects.filter(
+            model='recipes', object_id=self.recipe.id
+        ).exists())
+        schedule_recipe(self.recipe)
+        self.assertEqual(Tombstone.objects.count(), 1)
+
+    def test_shared_image_is_kept(self):
+        schedule_recipe(self.recipe)
+        Purger().run(PurgeTask.objects.get())
+        self.assertFalse(
+            Recipe.all_objects.filter(id=self.recipe.id).exists()
+        )
+        self.assertEqual(Tombstone.objects.count(), 1)
+        self.assertTrue(default_storage.exists(self.image))
+        schedule_recipe(self.copy)
+        Purger().run(PurgeTask.objects.get())
+        self.assertFalse(default_storage.exists(self.image))
@@ -0,0 +1,90 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from foodgram import outbox, rankings
+from foodgram.models import OutboxEvent, Recipe, User
+
+HALF_LIFE = settings.TRENDING_HALF_LIFE_HOURS * 60 * 60
+
+
+class RankingsTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [
+            User.objects.create(
+                email=f'reader{index}@example.com',
+                username=f'reader{index}',
+                first_name='Читатель',
+                last_name='Читателев'
+            )
+            for index in range(2)
+        ]
+        cls.recipe = Recipe.objects.create(
+            author=cls.users[0],
+            name='Каша',
+            image='recipes/porridge.png',
+            text='Сварить',
+            cooking_time=10
+        )
+        OutboxEvent.objects.all().delete()
+
+    def setUp(self):
+        cache.clear()
+        self.clients = []
+        for user in self.users:
+            client = APIClient()
+            client.force_authenticate(user)
+            self.clients.append(client)
+
+    def relation(self, client, action, method='post'):
+        response = getattr(client, method)(
+            f'/api/recipes/{self.recipe.id}/{action}/'
+        )
+        self.assertIn(response.status_code, (201, 204))
+
+    def dispatch(self):
+        while outbox.dispatch():
+            pass
+
+    def scores(self):
+        self.recipe.refresh_from_db()
+        return self.recipe.popularity, self.recipe.trending_score
+
+    def test_incremental_matches_recount(self):
+        self.relation(self.clients[0], 'favorite')
+        self.relation(self.clients[1], 'favorite')
+        self.relation(self.clients[1], 'shopping_cart')
+        self.relation(self.clients[0], 'favorite', 'delete')
+        self.dispatch()
+        popularity, trending_score = self.scores()
+        self.assertEqual(popularity, 2)
+        list(rankings.recount(HALF_LIFE, 1))
+        self.assertEqual(self.scores()[0], popularity)
+        self.assertAlmostEqual(self.scores()[1], trending_score)
+
+    def test_recount_keeps_values_and_later_events(self):
+        self.relation(self.clients[0], 'favorite')
+        self.dispatch()
+        self.relation(self.clients[0], 'shopping_cart')
+        recount = rankings.recount(HALF_LIFE, 1)
+        for stage, _ in recount:
+            self.assertEqual(self.scores()[0], 1)
+            if stage == 'shopping_cart':
+                break
+        # События снимка и более поздние доставляются до замены рейтингов.
+        self.relation(self.clients[1], 'favorite')
+        self.dispatch()
+        self.assertEqual(self.scores()[0], 3)
+        list(recount)
+        self.assertEqual(self.scores()[0], 3)
+
+    def test_recount_drops_covered_events(self):
+        self.relation(self.clients[0], 'favorite')
+        list(rankings.recount(HALF_LIFE, 1))
+        self.assertEqual(self.scores()[0], 1)
+        self.assertFalse(OutboxEvent.objects.filter(
+            topic__in=rankings.TOPICS
+        ).exists())
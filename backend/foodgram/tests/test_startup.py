@@ -0,0 +1,58 @@
+import json
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.test import SimpleTestCase
+
+from foodgram.constants import STARTUP_TIME_BUDGET
+from foodgram.management.commands.profile_startup import TARGETS
+
+HEAVY_MODULES = ('numpy', 'scipy')
+
+
+class StartupTest(SimpleTestCase):
+
+    @staticmethod
+    def run_python(*args):
+        return subprocess.run(
+            [sys.executable, *args],
+            cwd=settings.BASE_DIR,
+            env={
+                **os.environ,
+                'DJANGO_SETTINGS_MODULE': 'foodgram_backend.settings',
+            },
+            capture_output=True,
+            text=True,
+            check=True
+        )
+
+    def test_check_fits_import_budget(self):
+        process = self.run_python('-X', 'importtime', 'manage.py', 'check')
+        # Собственное время каждого модуля в микросекундах.
+        total = 0
+        modules = set()
+        for line in process.stderr.splitlines():
+            if not line.startswith('import time:'):
+                continue
+            own, _, module = line.split(':', 1)[1].split('|')
+            if own.strip().isdigit():
+                total += int(own)
+                modules.add(module.strip().split('.')[0])
+        self.assertTrue(modules)
+        self.assertLess(total / 10 ** 6, STARTUP_TIME_BUDGET)
+        self.assertFalse(modules & set(HEAVY_MODULES))
+
+    def test_heavy_modules_are_not_loaded(self):
+        for target, code in TARGETS.items():
+            with self.subTest(target=target):
+                process = self.run_python('-c', (
+                    f'{code}\n'
+                    'import json, sys\n'
+                    f'print(json.dumps([name for name in {HEAVY_MODULES} '
+                    'if name in sys.modules]))'
+                ))
+                self.assertEqual(
+                    json.loads(process.stdout.splitlines()[-1]), []
+                )
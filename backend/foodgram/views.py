@@ -1,4 +1,4 @@
-from django.shortcuts import get_object_or_404, redirect
+from django.shortcuts import aget_object_or_404, get_object_or_404, redirect
 
 from foodgram.models import Recipe
 
@@ -6,3 +6,8 @@ from foodgram.models import Recipe
 def short_link_redirect(request, recipe_id):
     get_object_or_404(Recipe, id=recipe_id)
     return redirect(f'/recipes/{recipe_id}/')
+
+
+async def ashort_link_redirect(request, recipe_id):
+    await aget_object_or_404(Recipe.objects.only('id'), id=recipe_id)
+    return redirect(f'/recipes/{recipe_id}/')
@@ -0,0 +1,55 @@
+import gzip
+import hashlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSED_CACHE_KEY = 'compressed:{}:{}'
+
+COMPRESSORS = {}
+if zstandard:
+    COMPRESSORS['zstd'] = zstandard.ZstdCompressor(level=3).compress
+if brotli:
+    COMPRESSORS['br'] = lambda data: brotli.compress(data, quality=5)
+COMPRESSORS['gzip'] = lambda data: gzip.compress(data, 6, mtime=0)
+
+
+def parse_accept_encoding(header):
+    accepted = {}
+    for item in header.split(','):
+        coding, _, params = item.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        key, _, value = params.strip().partition('=')
+        if key.strip() == 'q':
+            try:
+                quality = float(value)
+            except ValueError:
+                quality = 0.0
+        accepted[coding] = quality
+    return accepted
+
+
+def negotiate(header, encodings=None):
+    accepted = parse_accept_encoding(header)
+    best, best_quality = None, 0.0
+    for encoding in encodings or COMPRESSORS:
+        quality = accepted.get(encoding, accepted.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compressed_cache_key(content, encoding):
+    return COMPRESSED_CACHE_KEY.format(
+        encoding, hashlib.blake2b(content, digest_size=16).hexdigest()
+    )
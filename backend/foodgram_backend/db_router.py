@@ -0,0 +1,59 @@
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+PRIMARY_PIN_KEY = 'db-primary-pin:{}'
+
+_replica_reads = ContextVar('replica_reads', default=False)
+
+
+def replicas():
+    return settings.DB_REPLICA_ALIASES
+
+
+def set_replica_reads(enabled):
+    _replica_reads.set(enabled)
+
+
+def pin_primary(user_id):
+    cache.set(
+        PRIMARY_PIN_KEY.format(user_id), True, settings.REPLICA_PIN_SECONDS
+    )
+
+
+async def apin_primary(user_id):
+    await cache.aset(
+        PRIMARY_PIN_KEY.format(user_id), True, settings.REPLICA_PIN_SECONDS
+    )
+
+
+def is_pinned(user):
+    return user.is_authenticated and bool(
+        cache.get(PRIMARY_PIN_KEY.format(user.pk))
+    )
+
+
+async def ais_pinned(user):
+    return user.is_authenticated and bool(
+        await cache.aget(PRIMARY_PIN_KEY.format(user.pk))
+    )
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        if _replica_reads.get():
+            return random.choice(replicas())
+        return None
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS or db not in replicas()
@@ -0,0 +1,77 @@
+import atexit
+import threading
+import time
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+METRIC_KEY = 'metrics:{}'
+METRIC_NAMES_KEY = 'metrics:names'
+
+_pending = defaultdict(int)
+_lock = threading.Lock()
+_last_flush = time.monotonic()
+
+
+def _add(name, amount):
+    global _last_flush
+    with _lock:
+        _pending[name] += amount
+        if time.monotonic() - _last_flush < settings.METRICS_FLUSH_INTERVAL:
+            return None
+        pending = dict(_pending)
+        _pending.clear()
+        _last_flush = time.monotonic()
+    return pending
+
+
+def incr(name, amount=1):
+    pending = _add(name, amount)
+    if pending:
+        _flush(pending)
+
+
+async def aincr(name, amount=1):
+    # Сброс в кэш синхронный, в асинхронном коде он уходит в поток.
+    pending = _add(name, amount)
+    if pending:
+        await sync_to_async(_flush)(pending)
+
+
+def flush():
+    with _lock:
+        pending = dict(_pending)
+        _pending.clear()
+    _flush(pending)
+
+
+atexit.register(flush)
+
+
+def _flush(pending):
+    if not pending:
+        return
+    for name, amount in pending.items():
+        key = METRIC_KEY.format(name)
+        if not cache.add(key, amount, timeout=None):
+            try:
+                cache.incr(key, amount)
+            except ValueError:
+                cache.set(key, amount, timeout=None)
+    names = cache.get(METRIC_NAMES_KEY, set())
+    if not names.issuperset(pending):
+        cache.set(METRIC_NAMES_KEY, names | set(pending), timeout=None)
+
+
+def read():
+    names = sorted(cache.get(METRIC_NAMES_KEY, ()))
+    values = cache.get_many([METRIC_KEY.format(name) for name in names])
+    return {name: values.get(METRIC_KEY.format(name), 0) for name in names}
+
+
+def reset():
+    names = cache.get(METRIC_NAMES_KEY, ())
+    cache.delete_many([METRIC_KEY.format(name) for name in names])
+    cache.delete(METRIC_NAMES_KEY)
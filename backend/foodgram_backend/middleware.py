@@ -0,0 +1,226 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.text import compress_sequence
+from rest_framework.permissions import SAFE_METHODS
+
+from . import metrics, page_cache
+from .compression import COMPRESSORS, compressed_cache_key, negotiate
+from .db_router import apin_primary, pin_primary, replicas
+
+COMPRESSIBLE_TYPES = ('application/json', 'text/')
+
+
+def _wrote(request, response):
+    user = getattr(request, 'user', None)
+    return (
+        replicas()
+        and request.method not in SAFE_METHODS
+        and response.status_code < 400
+        and user is not None
+        and user.is_authenticated
+    )
+
+
+class PrimaryPinMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.get_response(request)
+        if _wrote(request, response):
+            pin_primary(request.user.pk)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if _wrote(request, response):
+            await apin_primary(request.user.pk)
+        return response
+
+
+class CompressionMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.get_response(request)
+        encoding = self._negotiate(request, response)
+        if encoding is None:
+            return response
+        if response.streaming:
+            return self._compress_stream(response)
+        key = self._cache_key(response, encoding)
+        content = cache.get(key) if key else None
+        if content is None:
+            content = COMPRESSORS[encoding](response.content)
+            if key:
+                cache.set(key, content, settings.COMPRESSION_CACHE_TTL)
+        return self._apply(response, encoding, content)
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        encoding = self._negotiate(request, response)
+        if encoding is None:
+            return response
+        if response.streaming:
+            return self._compress_stream(response)
+        key = self._cache_key(response, encoding)
+        content = await cache.aget(key) if key else None
+        if content is None:
+            content = COMPRESSORS[encoding](response.content)
+            if key:
+                await cache.aset(key, content, settings.COMPRESSION_CACHE_TTL)
+        return self._apply(response, encoding, content)
+
+    @staticmethod
+    def _negotiate(request, response):
+        if (
+            not request.path.startswith('/api/')
+            or response.status_code != 200
+            or response.has_header('Content-Encoding')
+            or not response.get('Content-Type', '').startswith(
+                COMPRESSIBLE_TYPES
+            )
+        ):
+            return None
+        if response.streaming:
+            if response.is_async:
+                return None
+        elif len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return None
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return negotiate(
+            request.META.get('HTTP_ACCEPT_ENCODING', ''),
+            ('gzip',) if response.streaming else None
+        )
+
+    @staticmethod
+    def _cache_key(response, encoding):
+        if getattr(response, 'cache_compressed', False):
+            return compressed_cache_key(response.content, encoding)
+        return None
+
+    @staticmethod
+    def _compress_stream(response):
+        response.streaming_content = compress_sequence(
+            response.streaming_content
+        )
+        del response.headers['Content-Length']
+        response.headers['Content-Encoding'] = 'gzip'
+        return response
+
+    @staticmethod
+    def _apply(response, encoding, content):
+        if len(content) >= len(response.content):
+            return response
+        response.content = content
+        response.headers['Content-Length'] = str(len(content))
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+
+class PageCacheMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        groups = page_cache.cached_groups(request)
+        if groups is None:
+            return self.get_response(request)
+        if not page_cache.is_anonymous(request):
+            return self._private(self.get_response(request))
+        keys = page_cache.version_keys(groups)
+        versions = cache.get_many(keys)
+        if len(versions) < len(keys):
+            for key, version in page_cache.new_versions(keys).items():
+                cache.add(key, version, timeout=None)
+            versions = cache.get_many(keys)
+        key = page_cache.page_key(request, versions)
+        cached = cache.get(key)
+        if cached is not None:
+            metrics.incr('page_cache.hits')
+            return self._public(self._restore(cached))
+        metrics.incr('page_cache.misses')
+        response = self.get_response(request)
+        if not page_cache.is_cacheable(response):
+            return self._private(response)
+        cache.set(key, page_cache.dump(response), settings.PAGE_CACHE_TTL)
+        return self._public(response)
+
+    async def __acall__(self, request):
+        groups = page_cache.cached_groups(request)
+        if groups is None:
+            return await self.get_response(request)
+        if not page_cache.is_anonymous(request):
+            return self._private(await self.get_response(request))
+        keys = page_cache.version_keys(groups)
+        versions = await cache.aget_many(keys)
+        if len(versions) < len(keys):
+            for key, version in page_cache.new_versions(keys).items():
+                await cache.aadd(key, version, timeout=None)
+            versions = await cache.aget_many(keys)
+        key = page_cache.page_key(request, versions)
+        cached = await cache.aget(key)
+        if cached is not None:
+            await metrics.aincr('page_cache.hits')
+            return self._public(self._restore(cached))
+        await metrics.aincr('page_cache.misses')
+        response = await self.get_response(request)
+        if not page_cache.is_cacheable(response):
+            return self._private(response)
+        await cache.aset(
+            key, page_cache.dump(response), settings.PAGE_CACHE_TTL
+        )
+        return self._public(response)
+
+    @staticmethod
+    def _restore(cached):
+        status, content, headers = cached
+        response = HttpResponse(content, status=status)
+        for name, value in headers:
+            response[name] = value
+        return response
+
+    @staticmethod
+    def _public(response):
+        # Ответ зависит только от URL, поэтому его можно сжать один раз и
+        # отдать из кэша nginx; Vary отделяет его от ответов с токеном.
+        response.cache_compressed = True
+        patch_cache_control(
+            response, public=True, max_age=settings.PAGE_CACHE_MAX_AGE
+        )
+        patch_vary_headers(response, ('Authorization',))
+        return response
+
+    @staticmethod
+    def _private(response):
+        patch_cache_control(response, private=True)
+        patch_vary_headers(response, ('Authorization',))
+        return response
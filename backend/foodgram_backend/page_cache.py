@@ -0,0 +1,78 @@
+import hashlib
+import time
+from functools import partial
+
+from django.core.cache import cache
+from django.db import transaction
+
+PAGE_CACHE_KEY = 'page:{}'
+PAGE_VERSION_KEY = 'page-version:{}'
+
+# Префикс пути -> группы данных, от которых зависит ответ. Изменение
+# тегов, ингредиентов и авторов инвалидирует и группу recipes.
+CACHED_PATHS = (
+    ('/api/recipes/', ('recipes',)),
+    ('/api/tags/', ('tags',)),
+    ('/api/ingredients/', ('ingredients',)),
+    ('/s/', ('recipes',)),
+)
+CACHED_STATUSES = (200, 301, 302)
+
+
+def cached_groups(request):
+    if request.method != 'GET':
+        return None
+    for prefix, groups in CACHED_PATHS:
+        if request.path.startswith(prefix):
+            return groups
+    return None
+
+
+def is_anonymous(request):
+    return 'HTTP_AUTHORIZATION' not in request.META
+
+
+def version_keys(groups):
+    return [PAGE_VERSION_KEY.format(group) for group in groups]
+
+
+def new_versions(keys):
+    version = time.time_ns()
+    return {key: version for key in keys}
+
+
+def page_key(request, versions):
+    # Версии групп входят в ключ: после изменения данных старые страницы
+    # больше не читаются и вытесняются по TTL.
+    data = '\n'.join((
+        request.get_host(),
+        request.get_full_path(),
+        request.META.get('HTTP_ACCEPT', ''),
+        *(str(versions[key]) for key in sorted(versions)),
+    ))
+    return PAGE_CACHE_KEY.format(
+        hashlib.blake2b(data.encode(), digest_size=16).hexdigest()
+    )
+
+
+def is_cacheable(response):
+    return (
+        response.status_code in CACHED_STATUSES
+        and not response.streaming
+        and not response.cookies
+        and 'private' not in response.get('Cache-Control', '')
+    )
+
+
+def dump(response):
+    return response.status_code, response.content, list(response.items())
+
+
+def invalidate(*groups):
+    cache.set_many(new_versions(version_keys(groups)), timeout=None)
+
+
+def invalidate_on_commit(*groups):
+    # Версии меняются сразу после фиксации записи, ещё в запросе: ответ
+    # на следующий запрос клиента уже не будет прочитан из кэша.
+    transaction.on_commit(partial(invalidate, *groups))
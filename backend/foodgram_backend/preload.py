@@ -0,0 +1,16 @@
+import gc
+from importlib import import_module
+
+from django.conf import settings
+from django.db import connections
+from django.urls import get_resolver
+
+
+def warm_up():
+    # Всё, что воркер иначе загрузил бы на первом запросе, загружается в
+    # мастере до fork и делится между воркерами через copy-on-write.
+    get_resolver().url_patterns
+    for module in settings.PRELOAD_MODULES:
+        import_module(module)
+    connections.close_all()
+    gc.freeze()
@@ -1,6 +1,7 @@
 import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -22,25 +23,36 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
-    'django_extensions',
     'rest_framework',
     'rest_framework.authtoken',
     'djoser',
     'django_filters',
-    'foodgram.apps.FoodgramConfig'
+    'foodgram.apps.FoodgramConfig',
+    'api.apps.ApiConfig',
 ]
 
+if DEBUG:
+    INSTALLED_APPS.append('django_extensions')
+
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'foodgram_backend.middleware.CompressionMiddleware',
+    'foodgram_backend.middleware.PageCacheMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'foodgram_backend.middleware.PrimaryPinMiddleware',
 ]
 
-ROOT_URLCONF = 'foodgram_backend.urls'
+SERVER_MODE = os.getenv('SERVER_MODE', 'wsgi')
+
+ROOT_URLCONF = (
+    'foodgram_backend.urls_async' if SERVER_MODE == 'asgi'
+    else 'foodgram_backend.urls'
+)
 
 TEMPLATES = [
     {
@@ -62,6 +74,21 @@ WSGI_APPLICATION = 'foodgram_backend.wsgi.application'
 
 USE_SQLITE = os.getenv('USE_SQLITE', 'false').lower() == 'true'
 
+# Под ASGI синхронные запросы к базе выполняются в пуле потоков, и
+# постоянные соединения копятся до исчерпания лимита сервера, поэтому
+# они отключаются.
+DB_CONN_MAX_AGE = int(
+    os.getenv('DB_CONN_MAX_AGE', 0 if SERVER_MODE == 'asgi' else 60)
+)
+if SERVER_MODE == 'asgi' and DB_CONN_MAX_AGE:
+    raise ImproperlyConfigured(
+        'DB_CONN_MAX_AGE должен быть 0 при SERVER_MODE=asgi'
+    )
+
+DB_REPLICAS = [
+    replica for replica in os.getenv('DB_REPLICAS', '').split(',') if replica
+]
+
 if USE_SQLITE:
     DATABASES = {
         'default': {
@@ -69,6 +96,12 @@ if USE_SQLITE:
             'NAME': BASE_DIR / 'db.sqlite3',
         }
     }
+    for index, replica in enumerate(DB_REPLICAS):
+        DATABASES[f'replica_{index}'] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': replica,
+            'TEST': {'MIRROR': 'default'},
+        }
 else:
     DATABASES = {
         'default': {
@@ -78,6 +111,38 @@ else:
             'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
             'HOST': os.getenv('DB_HOST', ''),
             'PORT': os.getenv('DB_PORT', 5432),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+        }
+    }
+    for index, replica in enumerate(DB_REPLICAS):
+        host, _, port = replica.partition(':')
+        DATABASES[f'replica_{index}'] = {
+            **DATABASES['default'],
+            'HOST': host,
+            'PORT': port or DATABASES['default']['PORT'],
+            'TEST': {'MIRROR': 'default'},
+        }
+
+DB_REPLICA_ALIASES = [alias for alias in DATABASES if alias != 'default']
+
+DATABASE_ROUTERS = ['foodgram_backend.db_router.ReplicaRouter']
+
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', 5))
+
+REDIS_URL = os.getenv('REDIS_URL')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
         }
     }
 
@@ -117,16 +182,75 @@ DJOSER = {
         'user': ['rest_framework.permissions.AllowAny'],
         'user_list': ['rest_framework.permissions.AllowAny'],
         'current_user': ['rest_framework.permissions.IsAuthenticated']
-    }
+    },
+    'HIDE_USERS': False,
 }
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication' if REDIS_URL
+        else 'rest_framework.authentication.TokenAuthentication',
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 6,
+    'DEFAULT_THROTTLE_CLASSES': [
+        'api.throttling.CostRateThrottle',
+    ],
+    'NUM_PROXIES': int(os.getenv('NUM_PROXIES', 1)),
 }
 
+THROTTLE_ANON_CAPACITY = int(os.getenv('THROTTLE_ANON_CAPACITY', 60))
+
+THROTTLE_ANON_RATE = float(os.getenv('THROTTLE_ANON_RATE', 1))
+
+THROTTLE_USER_CAPACITY = int(os.getenv('THROTTLE_USER_CAPACITY', 120))
+
+THROTTLE_USER_RATE = float(os.getenv('THROTTLE_USER_RATE', 2))
+
+TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', 10000))
+
+TOKEN_CACHE_LOCAL_TTL = int(os.getenv('TOKEN_CACHE_LOCAL_TTL', 10))
+
+TOKEN_CACHE_TTL = int(os.getenv('TOKEN_CACHE_TTL', 300))
+
+METRICS_FLUSH_INTERVAL = int(os.getenv('METRICS_FLUSH_INTERVAL', 10))
+
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', 1024))
+
+COMPRESSION_CACHE_TTL = int(os.getenv('COMPRESSION_CACHE_TTL', 24 * 60 * 60))
+
+PAGE_CACHE_TTL = int(os.getenv('PAGE_CACHE_TTL', 60))
+
+PAGE_CACHE_MAX_AGE = int(os.getenv('PAGE_CACHE_MAX_AGE', 5))
+
+PRELOAD_MODULES = [
+    module for module in os.getenv('PRELOAD_MODULES', '').split(',')
+    if module
+]
+
+SYNC_TOMBSTONE_RETENTION_DAYS = int(
+    os.getenv('SYNC_TOMBSTONE_RETENTION_DAYS', 30)
+)
+
+SYNC_SETTLE_SECONDS = int(os.getenv('SYNC_SETTLE_SECONDS', 2))
+
+TRENDING_HALF_LIFE_HOURS = int(os.getenv('TRENDING_HALF_LIFE_HOURS', 48))
+
+# Доставка событий в потоке веб-воркера только по явному включению: её
+# обработчики загружают numpy и scipy. По умолчанию события доставляет
+# отдельный процесс dispatch_outbox --loop.
+OUTBOX_INLINE = os.getenv('OUTBOX_INLINE', 'false').lower() == 'true'
+
+OUTBOX_POLL_SECONDS = int(os.getenv('OUTBOX_POLL_SECONDS', 5))
+
 STATIC_URL = '/static/'
 STATIC_ROOT = '/app/static'
 
@@ -0,0 +1,9 @@
+from .settings import *  # noqa: F401,F403
+from .settings import DATABASES
+
+# Реплика для тестов маршрутизации: зеркало основной тестовой базы. Чтения
+# направляются на неё только при DB_REPLICA_ALIASES = ['replica'].
+DATABASES['replica'] = {
+    **DATABASES['default'],
+    'TEST': {'MIRROR': 'default'},
+}
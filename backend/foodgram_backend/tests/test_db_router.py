@@ -0,0 +1,87 @@
+from unittest import skipUnless
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from foodgram.models import Ingredient, Recipe, RecipeIngredient, User
+from foodgram_backend.db_router import ReplicaRouter
+
+
+# Реплика объявлена в foodgram_backend.test_settings как зеркало основной
+# базы: данные общие, поэтому источник чтений виден по запросам к каждому
+# соединению. Транзакции TestCase зеркалу не видны, поэтому тесты
+# транзакционные.
+@skipUnless(
+    'replica' in settings.DATABASES,
+    'запускать с --settings=foodgram_backend.test_settings'
+)
+@override_settings(DB_REPLICA_ALIASES=['replica'])
+class ReplicaRouterTest(TransactionTestCase):
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(
+            email='cook@example.com',
+            username='cook',
+            first_name='Повар',
+            last_name='Поваров'
+        )
+        ingredient = Ingredient.objects.create(
+            name='соль', measurement_unit='г'
+        )
+        self.recipe = Recipe.objects.create(
+            author=self.user,
+            name='Каша',
+            image='recipes/porridge.png',
+            text='Сварить',
+            cooking_time=10
+        )
+        RecipeIngredient.objects.create(
+            recipe=self.recipe, ingredient=ingredient, amount=5
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def request(self, method, path):
+        with (
+            CaptureQueriesContext(connections[DEFAULT_DB_ALIAS]) as primary,
+            CaptureQueriesContext(connections['replica']) as replica,
+        ):
+            response = getattr(self.client, method)(path)
+        return response, primary.captured_queries, replica.captured_queries
+
+    def test_router_targets(self):
+        router = ReplicaRouter()
+        self.assertIsNone(router.db_for_read(Recipe))
+        self.assertEqual(router.db_for_write(Recipe), DEFAULT_DB_ALIAS)
+        self.assertFalse(router.allow_migrate('replica', 'foodgram'))
+
+    def test_reads_go_to_replica(self):
+        response, primary, replica = self.request('get', '/api/recipes/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'][0]['name'], 'Каша')
+        self.assertTrue(replica)
+        self.assertEqual(primary, [])
+
+    def test_writes_go_to_primary(self):
+        response, primary, replica = self.request(
+            'post', f'/api/recipes/{self.recipe.id}/favorite/'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(any(
+            query['sql'].startswith('INSERT') for query in primary
+        ))
+        self.assertEqual(replica, [])
+
+    def test_reads_after_write_are_pinned_to_primary(self):
+        self.request('post', f'/api/recipes/{self.recipe.id}/favorite/')
+        response, primary, replica = self.request('get', '/api/recipes/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['results'][0]['is_favorited'])
+        self.assertTrue(primary)
+        self.assertEqual(replica, [])
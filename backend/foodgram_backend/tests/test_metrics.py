@@ -0,0 +1,34 @@
+import threading
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from foodgram_backend import metrics
+
+
+@override_settings(METRICS_FLUSH_INTERVAL=0)
+class MetricsTest(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_async_flush_leaves_event_loop(self):
+        threads = []
+        flush = metrics._flush
+
+        def record(pending):
+            threads.append(threading.current_thread())
+            flush(pending)
+
+        async def count():
+            loop_thread = threading.current_thread()
+            await metrics.aincr('tests.async')
+            return loop_thread
+
+        with mock.patch.object(metrics, '_flush', record):
+            loop_thread = async_to_sync(count)()
+        self.assertEqual(len(threads), 1)
+        self.assertIsNot(threads[0], loop_thread)
+        self.assertEqual(metrics.read()['tests.async'], 1)
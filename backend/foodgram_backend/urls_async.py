@@ -0,0 +1,13 @@
+from django.urls import path
+
+from api import async_views
+from foodgram.views import ashort_link_redirect
+from .urls import urlpatterns as sync_urlpatterns
+
+urlpatterns = [
+    path('api/recipes/', async_views.recipe_list),
+    path('api/recipes/<int:pk>/', async_views.recipe_detail),
+    path('api/ingredients/', async_views.ingredient_list),
+    path('api/tags/', async_views.tag_list),
+    path('s/<int:recipe_id>/', ashort_link_redirect),
+] + sync_urlpatterns